@@ -1,73 +1,156 @@
 #!/usr/bin/env python
 
 import asyncio
-import dataclasses
-import json
+import logging
 import os
-import traceback
-from sys import stderr
+import random
+import time
 
-import msgspec
-from websockets.asyncio.client import connect, ClientConnection
 from websockets.exceptions import ConnectionClosed
 
 from bot import Bot
+from bot_logging import setup_logging
 from game_message import TeamGameState
+from protocol import encode_command, make_decoder
+from replay import recorder
+from scheduler import TickScheduler
+from telemetry import telemetry
+from transport import Transport
+from worker import PlannerWorker
 
+log = logging.getLogger(__name__)
 
-async def run():
-    uri = "ws://127.0.0.1:8765"
-
-    async with connect(uri, max_size=None) as websocket:
-        bot = Bot()
-        if "TOKEN" in os.environ:
-            await websocket.send(
-                json.dumps({"type": "REGISTER", "token": os.environ["TOKEN"]})
-            )
-        else:
-            await websocket.send(
-                json.dumps({"type": "REGISTER", "teamName": "MyPythonicBot"})
-            )
+# "inline" plans on the event loop thread, "thread" / "process" offload planning (see worker.py)
+EXECUTION_MODE = os.environ.get("EXECUTION_MODE", "inline")
 
-        await game_loop(websocket=websocket, bot=bot)
 
+async def run():
+    # Connects and registers (with TOKEN if set), and again whenever the connection drops (see transport.py)
+    try:
+        async with Transport(token=os.environ.get("TOKEN")) as websocket:
+            # Seeded so that a recorded match can be replayed with the same random choices (see replay.py)
+            random.seed(recorder().seed)
+            bot = Bot()
+            await game_loop(websocket=websocket, bot=bot)
+    except ConnectionClosed:
+        # The server couldn't be reached at all (the transport logged why): nothing to play
+        log.info("No connection to the server, exiting.")
+
+
+async def game_loop(websocket: Transport, bot: Bot):
+    if EXECUTION_MODE != "inline":
+        await offloaded_game_loop(websocket, PlannerWorker(EXECUTION_MODE, bot, seed=recorder().seed))
+        return
+
+    decode = make_decoder()
+    scheduler = TickScheduler()
+    trace = telemetry()
+    record = recorder()
 
-async def game_loop(websocket: ClientConnection, bot: Bot):
     while True:
+        trace.begin()
         try:
-            message = await websocket.recv()
+            with trace.stage("recv"):
+                message = await websocket.recv(decode=False)
         except ConnectionClosed:
             # Connection is closed, the game is probably over
-            print("Websocket was closed.")
+            log.info("Websocket was closed.")
             break
+        arrival = time.perf_counter()
+        record.frame(message, arrival)
 
-        game_message: TeamGameState = msgspec.json.decode(message, type=TeamGameState)
+        with trace.stage("decode"):
+            game_message: TeamGameState = decode(message)
+        trace.tick(game_message.tick)
         if game_message.lastTickErrors:
-            print(
-                f"Errors during last tick : {game_message.lastTickErrors}", file=stderr
-            )
+            log.warning("Errors during last tick : %s", game_message.lastTickErrors)
 
-        print(f"Playing tick {game_message.tick}")
+        log.info("Playing tick %d", game_message.tick)
 
-        actions = []
+        # Best plan available at the deadline (exceptions are caught and reported by the scheduler)
+        with trace.stage("plan"):
+            actions = scheduler.plan(bot, game_message, arrival)
 
-        # Just so your bot doesn't completely crash. ;)
+        with trace.stage("encode"):
+            payload = encode_command(game_message.tick, actions)
         try:
-            actions = bot.get_next_move(game_message)
-        except Exception:
-            print("Exception while getting next moves:")
-            print(traceback.format_exc())
-
-        payload = {
-            "type": "COMMAND",
-            "tick": game_message.tick,
-            "actions": [dataclasses.asdict(action) for action in actions],
-        }
-
-        await websocket.send(msgspec.json.encode(payload))
+            with trace.stage("send"):
+                await websocket.send(payload, arrival)
+        except ConnectionClosed:
+            # Closed while we were planning: the game is over
+            log.info("Websocket was closed.")
+            trace.end()
+            break
+        scheduler.sent(arrival)
+        record.command(payload)
+        trace.end()
+        if game_message.tick % 100 == 0:
+            log.info("Tick timings: %s", scheduler.report())
+
+    log.info("Tick timings: %s", scheduler.report())
+    trace.close()
+    record.close()
+
+
+async def offloaded_game_loop(websocket: Transport, worker: PlannerWorker):
+    """Game loop where the bot plans in a worker, so the event loop keeps receiving frames (and pings).
+
+    Only the newest frame is kept: if the worker falls behind, older frames are dropped instead of queued.
+    Telemetry is recorded by the worker (from the time the frame waited for it to the encoded payload).
+    """
+    latest = None
+    new_frame = asyncio.Event()
+    closed = False
+    dropped = 0
+    record = recorder()
+
+    async def receive():
+        nonlocal latest, closed, dropped
+        while True:
+            try:
+                message = await websocket.recv(decode=False)
+            except ConnectionClosed:
+                # Connection is closed, the game is probably over
+                log.info("Websocket was closed.")
+                closed = True
+                new_frame.set()
+                return
+            if latest is not None:
+                dropped += 1
+            latest = (message, time.perf_counter())
+            record.frame(*latest)
+            new_frame.set()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            if latest is None:
+                if closed:
+                    break
+                await new_frame.wait()
+                new_frame.clear()
+                continue
+            message, arrival = latest
+            latest = None
+            try:
+                payload = await worker.plan(message, time.perf_counter() - arrival)
+            except Exception:
+                log.exception("Exception in the planning worker:")
+                continue
+            try:
+                await websocket.send(payload, arrival)
+            except ConnectionClosed:
+                break
+            record.command(payload)
+    finally:
+        receiver.cancel()
+        worker.close()
+        record.close()
+        log.info("Stale frames dropped: %d", dropped)
 
 
 if __name__ == "__main__":
+    setup_logging()
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(run())
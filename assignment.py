@@ -0,0 +1,142 @@
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from pathfinding import distance_fields
+
+# Above this many spores and targets (the smaller of the two, which the exact solver's work grows with
+# the square of) greedy takes over. A tick rarely has more idle spores than that; all the spores of a
+# state at once do (117 spores x 261 clustered targets take ~10 ms exact, 0.5 ms greedy)
+ASSIGNMENT_EXACT_LIMIT = int(os.environ.get("ASSIGNMENT_EXACT_LIMIT", "64"))
+# Cheapest targets of each spore the greedy assignment looks at first
+GREEDY_CANDIDATES = 8
+# Ticks of walking one biomass spent on the way is worth
+BIOMASS_WEIGHT = 1
+
+
+def hungarian(cost: np.ndarray, deadline: Optional[float] = None) -> Optional[np.ndarray]:
+    """Minimum-cost assignment of rows to columns (Hungarian method, shortest augmenting paths, O(n^2 m)).
+
+    Returns the column of each row, -1 for rows left out when there are more rows than columns, or None
+    when the deadline (perf_counter) passes before every row is placed.
+    """
+    n, m = cost.shape
+    if n == 0 or m == 0:
+        return np.full(n, -1, dtype=np.intp)
+    if n > m:
+        columns = hungarian(cost.T, deadline)
+        if columns is None:
+            return None
+        rows = np.full(n, -1, dtype=np.intp)
+        rows[columns] = np.arange(m)
+        return rows
+
+    cost = cost.astype(np.float64)
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.intp)  # row (1-based) matched to each column, 0 for none
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        match[0] = i
+        j0 = 0
+        min_reduced = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            free = ~used
+            free[0] = False
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (reduced < min_reduced[1:])
+            min_reduced[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, min_reduced, np.inf)
+            j1 = int(np.argmin(candidates))
+            delta = candidates[j1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_reduced[free] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+
+    rows = np.full(n, -1, dtype=np.intp)
+    matched = np.flatnonzero(match[1:])
+    rows[match[1:][matched] - 1] = matched
+    return rows
+
+
+def greedy(cost: np.ndarray, candidates: int = GREEDY_CANDIDATES) -> np.ndarray:
+    """Fast approximate assignment: cheapest (row, column) pairs first, each row and column used once."""
+    n, m = cost.shape
+    rows = np.full(n, -1, dtype=np.intp)
+    if n == 0 or m == 0:
+        return rows
+    taken = np.zeros(m, dtype=bool)
+    k = min(candidates, m)
+    nearest = np.argpartition(cost, k - 1, axis=1)[:, :k] if k < m else np.tile(np.arange(m), (n, 1))
+    pair_rows = np.repeat(np.arange(n), k)
+    pair_columns = nearest.ravel()
+    for p in np.argsort(cost[pair_rows, pair_columns], kind="stable"):
+        row, column = pair_rows[p], pair_columns[p]
+        if rows[row] < 0 and not taken[column]:
+            rows[row] = column
+            taken[column] = True
+    # Rows whose candidates all went to others take the cheapest column left
+    for row in np.flatnonzero(rows < 0):
+        if taken.all():
+            break
+        left = np.where(taken, np.inf, cost[row])
+        rows[row] = int(np.argmin(left))
+        taken[rows[row]] = True
+    return rows
+
+
+def assign(cost: np.ndarray, exact_limit: int = ASSIGNMENT_EXACT_LIMIT,
+           deadline: Optional[float] = None) -> np.ndarray:
+    """Column of each row (-1 if none): exact up to `exact_limit` rows or columns, greedy above or once the
+    deadline has passed."""
+    if min(cost.shape) <= exact_limit:
+        rows = hungarian(cost, deadline)
+        if rows is not None:
+            return rows
+    return greedy(cost)
+
+
+def travel_costs(game_message: TeamGameState, spores: list[Spore], targets: list[Position]) -> np.ndarray:
+    """Ticks of walking plus biomass spent on tiles we don't own, from every spore to every target."""
+    spore_xs = np.array([spore.position.x for spore in spores], dtype=np.intp)
+    spore_ys = np.array([spore.position.y for spore in spores], dtype=np.intp)
+    txs = np.array([target.x for target in targets], dtype=np.intp)
+    tys = np.array([target.y for target in targets], dtype=np.intp)
+    distances = np.abs(spore_xs[:, None] - txs[None, :]) + np.abs(spore_ys[:, None] - tys[None, :])
+    # Spores sharing a field (most of them: those on ground a spawner reaches for free) share one lookup
+    groups = {}
+    for row, field in enumerate(distance_fields(game_message).from_spores(game_message, spores)):
+        groups.setdefault(field.sources, (field, []))[1].append(row)
+    biomass = np.empty_like(distances)
+    for field, rows in groups.values():
+        biomass[rows] = field.costs_at(txs, tys)
+    return distances + BIOMASS_WEIGHT * biomass
+
+
+def assign_targets(game_message: TeamGameState, spores: list[Spore], targets: list[Position],
+                   deadline: Optional[float] = None) -> dict[str, Position]:
+    """Target of each spore, so that no two spores go to the same tile and the total cost (travel_costs) is
+    minimal. Past the deadline the assignment is greedy (see assign).
+    """
+    if not spores or not targets:
+        return {}
+    cost = travel_costs(game_message, spores, targets)
+    columns = assign(cost, deadline=deadline)
+    return {spore.id: targets[column] for spore, column in zip(spores, columns.tolist()) if column >= 0}
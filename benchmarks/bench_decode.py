@@ -0,0 +1,76 @@
+"""Compares the default msgspec decode with the compact (array) decode on a large state.
+
+    python -m benchmarks.bench_decode [--state recorded_state.json] [--size 300] [--runs 20]
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import msgspec
+import numpy as np
+
+from benchmarks.fixtures import load_state, synthetic_state_bytes
+from compact_message import CompactDecoder
+from game_message import TeamGameState
+from grid_view import GridView
+
+
+def _time(decode, message: bytes, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        decode(message)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _memory(decode, message: bytes) -> tuple[int, int]:
+    """(peak bytes allocated while decoding, bytes still held by the decoded state)."""
+    tracemalloc.start()
+    state = decode(message)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return peak, retained
+
+
+def _with_arrays(decode):
+    """Decode, then get the grids as arrays like the bot does every tick (GridView + biomass array)."""
+    def decode_with_arrays(message: bytes):
+        state = decode(message)
+        GridView.from_message(state)
+        np.asarray(state.world.biomassGrid, dtype=np.int32)
+        return state
+    return decode_with_arrays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--state", help="recorded TeamGameState JSON (default: synthetic state)")
+    parser.add_argument("--size", type=int, default=300, help="width and height of the synthetic map")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    message = load_state(args.state) if args.state else synthetic_state_bytes(args.size, args.size)
+    print(f"state: {len(message) / 1e6:.1f} MB of JSON")
+
+    modes = {
+        "default": msgspec.json.Decoder(TeamGameState).decode,
+        "compact": CompactDecoder().decode,
+    }
+    modes.update({f"{name}+arrays": _with_arrays(decode) for name, decode in list(modes.items())})
+    results = {}
+    for name, decode in modes.items():
+        decode(message)  # warm up (compact mode parses the static nutrient grid once)
+        timings = _time(decode, message, args.runs)
+        peak, retained = _memory(decode, message)
+        results[name] = statistics.median(timings)
+        print(f"{name:>15}: median {results[name] * 1e3:8.2f} ms   min {min(timings) * 1e3:8.2f} ms   "
+              f"peak {peak / 1e6:7.1f} MB   retained {retained / 1e6:7.1f} MB")
+    print(f"decode speedup: {results['default'] / results['compact']:.1f}x   "
+          f"decode + arrays speedup: {results['default+arrays'] / results['compact+arrays']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
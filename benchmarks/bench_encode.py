@@ -0,0 +1,81 @@
+"""Time to encode a COMMAND, per 1000 actions: the old `dataclasses.asdict` path against `encode_command`.
+
+    python -m benchmarks.bench_encode [--actions 1000] [--runs 200]
+
+The actions are a mix of every action type, with their nested Positions. Both paths must give the same bytes.
+"""
+import argparse
+import dataclasses
+import random
+import statistics
+import time
+
+import msgspec
+
+from game_message import *
+from protocol import encode_command
+
+
+def asdict_command(tick: int, actions: list[Action]) -> bytes:
+    """How the COMMAND used to be encoded."""
+    payload = {
+        "type": "COMMAND",
+        "tick": tick,
+        "actions": [dataclasses.asdict(action) for action in actions],
+    }
+    return msgspec.json.encode(payload)
+
+
+def random_actions(count: int, seed: int = 0) -> list[Action]:
+    rng = random.Random(seed)
+    directions = [Position(0, -1), Position(0, 1), Position(-1, 0), Position(1, 0)]
+    actions = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            position = Position(rng.randrange(300), rng.randrange(300))
+            actions.append(SporeMoveToAction(sporeId=f"spore-{i}", position=position))
+        elif kind < 0.8:
+            actions.append(SporeMoveAction(sporeId=f"spore-{i}", direction=rng.choice(directions)))
+        elif kind < 0.9:
+            actions.append(SporeSplitAction(sporeId=f"spore-{i}", biomassForMovingSpore=rng.randint(1, 20),
+                                            direction=rng.choice(directions)))
+        elif kind < 0.95:
+            actions.append(SpawnerProduceSporeAction(spawnerId=f"spawner-{i}", biomass=rng.randint(1, 20)))
+        else:
+            actions.append(SporeCreateSpawnerAction(sporeId=f"spore-{i}"))
+    return actions
+
+
+def _time(encode, actions: list[Action], runs: int) -> list[float]:
+    timings = []
+    for tick in range(runs):
+        start = time.perf_counter()
+        encode(tick, actions)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    actions = random_actions(args.actions)
+    if asdict_command(1, actions) != encode_command(1, actions):
+        raise SystemExit("encode_command output differs from the asdict encoding")
+
+    per_thousand = 1000 / args.actions
+    results = {}
+    for name, encode in (("asdict", asdict_command), ("encode_command", encode_command)):
+        encode(0, actions)  # warm up
+        timings = _time(encode, actions, args.runs)
+        results[name] = statistics.median(timings) * per_thousand
+        print(f"{name:>15}: median {results[name] * 1e3:7.3f} ms   min {min(timings) * per_thousand * 1e3:7.3f} ms"
+              f"   per 1000 actions")
+    print(f"identical bytes, speedup: {results['asdict'] / results['encode_command']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Throughput of the planner's forward model in simulated ticks per second, and what a search costs.
+
+    python -m benchmarks.bench_planner [--fixture medium] [--ticks 3000] [--horizon 3] [--nodes 300]
+
+For each fixture: time to build the model from the state, simulated ticks per second (ticks played and
+undone in groups of `--horizon`, like the search does), then a full search with `--nodes` nodes.
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import time
+
+import msgspec
+
+from benchmarks.fixtures import fixture_states
+from bot import Bot
+from game_message import TeamGameState
+from planner import PLANNER_HORIZON, PLANNER_NODES, BeamPlanner, ForwardModel, _Plan
+
+
+def simulated_ticks_per_second(model: ForwardModel, ticks: int, horizon: int) -> float:
+    played = 0
+    start = time.perf_counter()
+    while played < ticks:
+        model.push()
+        for _ in range(horizon):
+            model.tick(model.toward_targets())
+        model.pop()
+        played += horizon
+    return played / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", action="append", help="only these fixtures (default: all)")
+    parser.add_argument("--ticks", type=int, default=3000, help="simulated ticks for the throughput")
+    parser.add_argument("--horizon", type=int, default=PLANNER_HORIZON)
+    parser.add_argument("--nodes", type=int, default=PLANNER_NODES)
+    parser.add_argument("--runs", type=int, default=10, help="searches timed per fixture")
+    args = parser.parse_args()
+
+    fixtures = fixture_states()
+    if args.fixture:
+        fixtures = {name: fixtures[name] for name in args.fixture}
+    decode = msgspec.json.Decoder(TeamGameState).decode
+
+    print(f"{'fixture':>10} {'spores':>7} {'build ms':>9} {'ticks/s':>9} {'search ms':>10} {'nodes':>6} {'gain':>7}")
+    for name, message in fixtures.items():
+        game_message = decode(message)
+        my_team = game_message.world.teamInfos[game_message.yourTeamId]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            actions = Bot().strategie(game_message, my_team)
+
+        builds = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            model = ForwardModel.from_message(game_message)
+            builds.append(time.perf_counter() - start)
+        # Spores walk to the strategy's destinations, like in the search
+        _Plan(model, game_message, actions)
+        rate = simulated_ticks_per_second(model, args.ticks, args.horizon)
+
+        searches = []
+        for _ in range(args.runs):
+            planner = BeamPlanner(nodes=args.nodes, horizon=args.horizon)
+            start = time.perf_counter()
+            planner.refine(game_message, actions)
+            searches.append(time.perf_counter() - start)
+        print(f"{name:>10} {len(my_team.spores):7d} {statistics.median(builds) * 1e3:9.2f} {rate:9.0f} "
+              f"{statistics.median(searches) * 1e3:10.1f} {planner.last_nodes:6d} {planner.last_gain:7.0f}")
+
+
+if __name__ == "__main__":
+    main()
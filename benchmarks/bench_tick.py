@@ -0,0 +1,197 @@
+"""Times each stage of a tick on the fixture states and compares with the stored baseline.
+
+    python -m benchmarks.bench_tick [--runs 30] [--fixture medium] [--cold] [--save-baseline]
+
+Every run starts from a freshly decoded state (not timed). By default the per-game caches (world state,
+distance fields, target rankings, ...) carry over from the previous run like they do from one tick to the
+next; --cold starts every run from empty caches, like the first tick of a new process, and is compared with
+a baseline of its own.
+Exits with 1 when a full tick goes past the budget or a stage is slower than the baseline.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import economy
+import entity_store
+import grid_view
+import pathfinding
+import site_selection
+import spatial_index
+import target_cache
+import territory
+import world_state
+from benchmarks.fixtures import fixture_states
+from bot import Bot, _gen_targets_from_spawners, should_create_spawner, should_move_spore
+from economy import Economy
+from entity_store import EntityStore
+from pathfinding import DistanceFieldCache, distance_fields
+from protocol import encode_command, make_decoder
+from scheduler import TICK_BUDGET_S, TickScheduler
+from target_cache import TargetCache
+from territory import Territory
+from world_state import WorldState
+
+BASELINE = Path(__file__).parent / "baseline.json"
+# A stage is flagged when its fastest run is this much slower than the baseline's: the p50 moves by as much
+# from one process to the next on an idle machine, the fastest run much less
+TOLERANCE = 0.25
+# ...and at least this much slower in absolute terms (sub-millisecond stages are noisy)
+MIN_SLOWDOWN_S = 0.0005
+
+
+def _stages(decode, bot: Bot) -> dict:
+    """name: (setup, timed stage). setup gets the raw message and returns what the stage takes."""
+
+    def ready(message: bytes):
+        # What every stage finds at the start of a tick: the state decoded, per-tick views and index built
+        game_message = decode(message)
+        world_state.world_state(game_message)
+        spatial_index.spatial_index(game_message)
+        distance_fields(game_message)
+        return game_message, game_message.world.teamInfos[game_message.yourTeamId]
+
+    def with_team(stage):
+        return lambda state: stage(*state)
+
+    def moves(state):
+        game_message, my_team = state
+        return should_move_spore(my_team.spores, game_message, my_team)
+
+    def planned(message: bytes):
+        game_message = decode(message)
+        return game_message.tick, bot.get_next_move(game_message)
+
+    scheduler = TickScheduler()
+
+    def tick(message: bytes):
+        # Like a real tick: planning runs against the deadline (the lookahead search fills what is left of it)
+        arrival = time.perf_counter()
+        game_message = decode(message)
+        return encode_command(game_message.tick, scheduler.plan(bot, game_message, arrival))
+
+    return {
+        "decode": (lambda message: message, decode),
+        "should_create_spawner": (ready, with_team(should_create_spawner)),
+        "_gen_targets_from_spawners": (ready, with_team(_gen_targets_from_spawners)),
+        "should_move_spore": (ready, moves),
+        "strategie": (ready, with_team(bot.strategie)),
+        "encode": (planned, lambda planned: encode_command(*planned)),
+        "tick": (lambda message: message, tick),
+    }
+
+
+def _reset(cold: bool):
+    # Same random choices and no leftover destinations from the previous run
+    random.seed(0)
+    entity_store._store = EntityStore()
+    if cold:
+        # Like the first tick of a new process: every per-process cache starts empty (the map analysis still
+        # comes from its disk cache, as it does for a map seen in an earlier match)
+        world_state._world = WorldState()
+        grid_view._static, grid_view._static_tick, grid_view._last_view = None, -1, None
+        spatial_index._last_index = None
+        territory._territory = Territory()
+        economy._economy = Economy()
+        pathfinding._cache = DistanceFieldCache()
+        target_cache._cache = TargetCache()
+        site_selection._bounds = None
+
+
+def _measure(setup, stage, message: bytes, runs: int, cold: bool) -> dict:
+    timings = []
+    for _ in range(runs):
+        _reset(cold)
+        state = setup(message)
+        # Nothing left for the collector: a collection the previous runs made due doesn't land in this one
+        gc.collect()
+        start = time.perf_counter()
+        stage(state)
+        timings.append(time.perf_counter() - start)
+    _reset(cold)
+    state = setup(message)
+    tracemalloc.start()
+    stage(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return {"min": min(timings), "p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "peak": peak}
+
+
+def run(fixtures: dict[str, bytes], runs: int, cold: bool) -> dict:
+    results = {}
+    # The bot prints a lot: keep it out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, message in fixtures.items():
+            # The tick stage of the previous fixture left the collector to its scheduler
+            gc.enable()
+            # The decoder the bot plays with (DECODE_MODE)
+            decode = make_decoder()
+            bot = Bot()
+            results[name] = {}
+            for stage, (setup, timed) in _stages(decode, bot).items():
+                timed(setup(message))  # warm up
+                results[name][stage] = _measure(setup, timed, message, runs, cold)
+    return results
+
+
+def report(results: dict, baseline: dict, budget: float = TICK_BUDGET_S) -> list[str]:
+    """Prints the results next to the baseline; returns what needs attention."""
+    flagged = []
+    for name, stages in results.items():
+        print(f"\n{name}")
+        print(f"{'stage':>28} {'min ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>9} "
+              f"{'vs baseline':>12}")
+        for stage, result in stages.items():
+            before = baseline.get(name, {}).get(stage)
+            change = ""
+            if before and "min" in before:
+                ratio = result["min"] / before["min"] if before["min"] else 1.0
+                change = f"{ratio:.2f}x"
+                if ratio > 1 + TOLERANCE and result["min"] - before["min"] > MIN_SLOWDOWN_S:
+                    change += " !"
+                    flagged.append(f"{name}/{stage}: fastest run {ratio:.2f}x the baseline's")
+            print(f"{stage:>28} {result['min'] * 1e3:9.2f} {result['p50'] * 1e3:9.2f} {result['p95'] * 1e3:9.2f} "
+                  f"{result['p99'] * 1e3:9.2f} {result['peak'] / 1e6:9.2f} {change:>12}")
+        if stages["tick"]["p99"] > budget:
+            flagged.append(f"{name}: tick p99 {stages['tick']['p99'] * 1e3:.1f} ms is over the "
+                           f"{budget * 1e3:.0f} ms budget")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--fixture", action="append", help="only these fixtures (default: all)")
+    parser.add_argument("--cold", action="store_true", help="start every run from empty caches")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results in {BASELINE.name}")
+    args = parser.parse_args()
+
+    fixtures = fixture_states()
+    if args.fixture:
+        fixtures = {name: fixtures[name] for name in args.fixture}
+    results = run(fixtures, args.runs, args.cold)
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    # Cold runs have a baseline of their own: they pay for everything warm runs find cached
+    compared = baseline.setdefault("cold", {}) if args.cold else baseline
+    flagged = report(results, compared)
+
+    if args.save_baseline:
+        compared.update(results)
+        BASELINE.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"\nbaseline saved to {BASELINE}")
+    elif flagged:
+        print("\n" + "\n".join(flagged))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Game states used by the benchmarks.
+
+Recorded states live in benchmarks/fixtures/*.json. The ones below are recorded from local games
+(simulator.py) with fixed seeds; states saved from a real server can be dropped in the same folder.
+
+    python -m benchmarks.fixtures    # (re)record them
+"""
+import random
+from pathlib import Path
+
+import msgspec
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# name: (map size, teams, tick to record, seed)
+RECORDED = {
+    "small": (40, 2, 200, 7),
+    "medium": (100, 4, 200, 7),
+}
+# Too slow to record with the current bot: generated instead
+SYNTHETIC = {
+    "large": (300, 4),
+}
+
+
+def synthetic_state(width: int, height: int, teams: int = 4, spores_per_team: int = 200,
+                    spawners_per_team: int = 6, seed: int = 0) -> dict:
+    """A TeamGameState-shaped dict with random territory, for when no recorded state is at hand."""
+    rng = random.Random(seed)
+    team_ids = [f"team-{i:02d}-{rng.getrandbits(64):016x}" for i in range(teams)]
+    neutral = ""
+    owners = [neutral] * 4 + team_ids
+    ownership = [[rng.choice(owners) for _ in range(width)] for _ in range(height)]
+    biomass = [[rng.randint(1, 5) if owner else 0 for owner in row] for row in ownership]
+    nutrients = [[rng.choice((0, 0, 0, 1, 2, 5, 10, 25)) for _ in range(width)] for _ in range(height)]
+
+    def position():
+        return {"x": rng.randrange(width), "y": rng.randrange(height)}
+
+    spores, spawners, team_infos = [], [], {}
+    for team_id in team_ids:
+        # About half of the spores can afford the next spawner (it costs 2 ** spawners - 1, like in simulator.py)
+        team_spores = [{"id": f"spore-{rng.getrandbits(64):016x}", "teamId": team_id, "position": position(),
+                        "biomass": rng.randint(1, 2 ** (spawners_per_team + 1))} for _ in range(spores_per_team)]
+        team_spawners = [{"id": f"spawner-{rng.getrandbits(64):016x}", "teamId": team_id, "position": position()}
+                         for _ in range(spawners_per_team)]
+        # Like in a game, the tile under a spore or a spawner belongs to its team
+        for thing in team_spores + team_spawners:
+            x, y = thing["position"]["x"], thing["position"]["y"]
+            ownership[y][x] = team_id
+            biomass[y][x] = max(biomass[y][x], 1)
+        spores.extend(team_spores)
+        spawners.extend(team_spawners)
+        team_infos[team_id] = {"teamId": team_id, "isAlive": True, "nutrients": rng.randint(0, 500),
+                               "spores": team_spores, "spawners": team_spawners,
+                               "nextSpawnerCost": 2 ** spawners_per_team - 1}
+    return {
+        "tick": 500,
+        "yourTeamId": team_ids[0],
+        "lastTickErrors": [],
+        "constants": {"neutralTeamId": neutral, "maxTicks": 1000},
+        "teamIds": team_ids,
+        "world": {
+            "map": {"width": width, "height": height, "nutrientGrid": nutrients},
+            "biomassGrid": biomass,
+            "ownershipGrid": ownership,
+            "spores": spores,
+            "spawners": spawners,
+            "teamInfos": team_infos,
+        },
+    }
+
+
+def load_state(path) -> bytes:
+    """Raw JSON of a recorded TeamGameState."""
+    return Path(path).read_bytes()
+
+
+def synthetic_state_bytes(width: int, height: int, **kwargs) -> bytes:
+    return msgspec.json.encode(synthetic_state(width, height, **kwargs))
+
+
+def record_state(size: int, teams: int, tick: int, seed: int) -> bytes:
+    """Raw JSON of the state at `tick` of a local game between Bots, seen by the team with the most spores."""
+    from bot import Bot
+    from simulator import LocalGame
+
+    random.seed(seed)  # the bot picks destinations at random
+    game = LocalGame([f"team-{i}" for i in range(teams)], size, size, seed=seed, neutral_spores=size // 2)
+    bots = {team_id: Bot() for team_id in game.teams}
+    states = game.states()
+    while game.tick < tick and not game.is_over():
+        game.step({team_id: bots[team_id].get_next_move(state) for team_id, state in states.items()})
+        states = game.states()
+    state = max(states.values(), key=lambda s: len(s.world.teamInfos[s.yourTeamId].spores))
+    return msgspec.json.encode(state)
+
+
+def fixture_states() -> dict[str, bytes]:
+    """Every benchmark state by name: the recorded ones on disk, then the synthetic ones."""
+    states = {path.stem: load_state(path) for path in sorted(FIXTURES_DIR.glob("*.json"))}
+    for name, (size, teams) in SYNTHETIC.items():
+        states[name] = synthetic_state_bytes(size, size, teams=teams)
+    return states
+
+
+def main():
+    import contextlib
+    import os
+
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for name, (size, teams, tick, seed) in RECORDED.items():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            state = record_state(size, teams, tick, seed)
+        path = FIXTURES_DIR / f"{name}.json"
+        path.write_bytes(state)
+        print(f"{path}: {len(state) / 1e3:.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
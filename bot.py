@@ -1,292 +1,240 @@
+import logging
+import os
 import random
-from typing import Optional
+import time
+from typing import Iterator, Optional
+from assignment import assign_targets
+from economy import economy
+from entity_store import entity_store
 from game_message import *
-import heapq
-
-spore_destinations = dict()
-
-# Debug toggle for movement decisions
-DEBUG_MOVE = True
-
-
-def _dbg(*args):
-    if DEBUG_MOVE:
-        try:
-            print(*args)
-        except Exception:
-            # Never let logging break the bot
-            pass
-
-
-def should_create_spawner(game_message: TeamGameState, my_team: TeamInfo) -> list[SporeCreateSpawnerAction]:
-    """Create a spawner if we currently have none.
-
-    Strategy (minimal to satisfy requirement):
-    - If the team has zero spawners, pick the largest-biomass spore that can afford the
-      current `nextSpawnerCost` and issue one `SporeCreateSpawnerAction` for it.
-    - Otherwise, do nothing.
+from grid_view import grid_view
+from move_evaluator import check_moves
+from parallel_targets import parallel_targets
+from planner import BeamPlanner
+from site_selection import best_sites
+from spatial_index import spatial_index
+from target_cache import EMPTY, Targets, target_cache
+from telemetry import phase
+from territory import territory
+from world_state import world_state
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Frontier tiles the fallback hands out when there is no nutrient tile left to take
+FALLBACK_TARGETS = 64
+# The strategy runs in cycles of PHASE_PERIOD ticks; from tick PHASE_SWITCH of each cycle, spores roam at random
+PHASE_PERIOD = int(os.environ.get("PHASE_PERIOD", "125"))
+PHASE_SWITCH = int(os.environ.get("PHASE_SWITCH", "100"))
+# "economy": spore sizes planned from our income (see economy.Economy); "fixed": SPORE_BIOMASS per spawner
+# while we have more than PRODUCTION_THRESHOLD nutrients
+PRODUCTION_MODE = os.environ.get("PRODUCTION_MODE", "economy")
+SPORE_BIOMASS = int(os.environ.get("SPORE_BIOMASS", "10"))
+PRODUCTION_THRESHOLD = int(os.environ.get("PRODUCTION_THRESHOLD", "15"))
+
+
+def should_create_spawner(game_message: TeamGameState, my_team: TeamInfo,
+                          deadline: Optional[float] = None) -> list[Action]:
+    """Create a spawner on the best site a spore can afford to reach (see site_selection).
+
+    - A site is worth the nutrients we don't own around it, minus the walk and the biomass spent to get there.
+    - If the best pair has the spore standing on its site, the spore creates the spawner now; otherwise it is
+      sent there (a move, and its destination in the entity store) and builds once it arrives.
     """
-    # If we already have a spawner, do nothing
     if len(my_team.spawners) > 8:
         return []
 
-    cost = my_team.nextSpawnerCost
-    
-    # Define the minimum distance (radius) required between spawners
-    MIN_DISTANCE = 5
-
-    # 1. Filter: Find spores that have enough biomass AND are far enough from existing spawners
-    candidates = []
-    for sp in my_team.spores:
-        if sp.biomass < cost:
-            continue
-
-        too_close = False
-        for spawner in my_team.spawners:
-            # Calculate squared Euclidean distance to avoid slow square roots
-            dist_sq = (sp.position.x - spawner.position.x)**2 + (sp.position.y - spawner.position.y)**2
-            
-            if dist_sq < (MIN_DISTANCE ** 2):
-                too_close = True
-                break
-        
-        # Only consider this spore if it is far enough from ALL spawners
-        if not too_close:
-            candidates.append(sp)
-
-    if not candidates:
-        _dbg(f"should_create_spawner: no spore meets cost {cost} and distance > {MIN_DISTANCE}")
+    pairs = best_sites(game_message, my_team, deadline=deadline)
+    if not pairs:
+        log.debug("should_create_spawner: no spore can afford %d", my_team.nextSpawnerCost)
         return []
 
-    # 2. Selection: Choose the fattest spore from the valid candidates
-    candidate = max(candidates, key=lambda s: s.biomass)
-
-    _dbg(
-        f"should_create_spawner: creating spawner using spore {candidate.id} at ({candidate.position.x},{candidate.position.y}) with biomass {candidate.biomass}, cost={cost}"
+    best = pairs[0]
+    if best.distance:
+        log.debug("should_create_spawner: sending spore %s to (%d,%d), site value %d, %d ticks away",
+                  best.spore.id, best.site.x, best.site.y, best.value, best.distance)
+        entity_store(game_message).set_destination(best.spore.id, best.site)
+        return [SporeMoveToAction(sporeId=best.spore.id, position=best.site)]
+    log.debug(
+        "should_create_spawner: creating spawner using spore %s at (%d,%d) with biomass %d, cost=%d, site value %d",
+        best.spore.id, best.site.x, best.site.y, best.spore.biomass, my_team.nextSpawnerCost, best.value
     )
-    return [SporeCreateSpawnerAction(sporeId=candidate.id)]
-
-
-def _manhattan(a: Position, b: Position) -> int:
-    return abs(a.x - b.x) + abs(a.y - b.y)
-
-
-def _owned_income(game_message: TeamGameState, my_team: TeamInfo) -> int:  # todo a utiliser
-    ownership = game_message.world.ownershipGrid
-    nutrients = game_message.world.map.nutrientGrid
-    my_id = my_team.teamId
-    h = game_message.world.map.height
-    w = game_message.world.map.width
-    income = 0
-    for y in range(h):
-        row_owner = ownership[y]
-        row_nut = nutrients[y]
-        for x in range(w):
-            if row_owner[x] == my_id:
-                income += row_nut[x]
-    return income
-
-
-def _in_map(x: int, y: int, game_message: TeamGameState) -> bool:
-    w = game_message.world.map.width
-    h = game_message.world.map.height
-    return 0 <= x < w and 0 <= y < h
-
-
-def find_closest_nutrients_not_ours(nutrientGrid, origin, game_message) -> list[Position]:
-    # Find all positions with nutrients > 0
-    nutrient_positions = []
-    for r in range(len(nutrientGrid)):
-        for c in range(len(nutrientGrid[0])):
-            if nutrientGrid[r][c] > 0:
-                nutrient_positions.append(Position(c, r))
-
-    if not nutrient_positions:
-        return []
-
-    # Sort all nutrient positions by distance
-    nutrient_positions.sort(key=lambda pos: _manhattan(pos, origin))
-
-    filtered_positions = []
-
-    for pos in nutrient_positions:
-        owner = game_message.world.ownershipGrid[pos.y][pos.x]
-        if owner != game_message.yourTeamId:
-            filtered_positions.append(pos)
-
-    return filtered_positions
-
-
-def find_closest_spawner_not_ours(spawners, origin, game_message) -> list[Position]:
-    spawner_positions = []
-    for spawner in spawners:
-        spawner_positions.append(spawner.position)
-
-    if not spawner_positions:
-        return []
-
-    # Sort all spawner positions by distance
-    spawner_positions.sort(key=lambda pos: _manhattan(pos, origin))
-
-    filtered_positions = []
-
-    for pos in spawner_positions:
-        owner = game_message.world.ownershipGrid[pos.y][pos.x]
-        if owner != game_message.yourTeamId:
-            filtered_positions.append(pos)
-
-    return filtered_positions
-
-
-def _best_target(game_message: TeamGameState, my_team: TeamInfo, origin) -> list[Position]:
-    # nutrients_plus_proches = find_closest_nutrients(game_message.world.map.nutrientGrid, origin)
-    meilleurs_nutrients = sorted(
-        find_closest_nutrients_not_ours(game_message.world.map.nutrientGrid, origin.position, game_message),
-        key=lambda pos: _path_score(game_message, my_team, origin.position, pos),
-        reverse=True)  # double sort mais marche
-    # meilleurs_nutrients = sort_list_list(game_message.world.map.nutrientGrid)
-    return meilleurs_nutrients
-
-
-def _path_score(game_message: TeamGameState, my_team: TeamInfo, start: Position, target: Position) -> int:
-    """
-    Simple path-based score: walk a deterministic Manhattan path (x then y).
-    For every step onto a tile we don't own, add its nutrients and pay 1 biomass cost.
-    Steps onto owned tiles are free and yield no immediate nutrients (already ours).
-    Returns net benefit = sum(nutrients on newly-claimed tiles) - number of paid steps.
-    """
-    ownership = game_message.world.ownershipGrid
-    # nutrients = game_message.world.map.nutrientGrid
-    my_id = my_team.teamId
-    at_least_one_not_owned_tile = False  # s'assurer qu'on conquerit sur le path, sinon on fait juste tourner en rond dans notre zone
-
-    x, y = start.x, start.y
-    tx, ty = target.x, target.y
-
-    net = 0
-
-    # Move horizontally towards target
-    step_x = 1 if tx > x else -1
-    while x != tx:
-        x += step_x
-        if not _in_map(x, y, game_message):
-            break
-        if ownership[y][x] != my_id:
-            at_least_one_not_owned_tile = True
-            # net += nutrients[y][x] * MULTIPLICATEUR_DE_VALEUR_POSITIVE  # gain
-            net -= 1  # biomass cost
-        # else: moving on our own trail is free and yields no new nutrients
-
-    # Move vertically towards target
-    step_y = 1 if ty > y else -1
-    while y != ty:
-        y += step_y
-        if not _in_map(x, y, game_message):
-            break
-        if ownership[y][x] != my_id:
-            at_least_one_not_owned_tile = True
-            # net += nutrients[y][x] * MULTIPLICATEUR_DE_VALEUR_POSITIVE
-            net -= 1
-
-    return net if at_least_one_not_owned_tile else -999
+    return [SporeCreateSpawnerAction(sporeId=best.spore.id)]
 
 
-def sort_list_list(nutrientGrid: list[list[int]]) -> list[tuple[int, int, int]]:
-    # Create list of (value, row, col) for all cells
-    values = []
-    for i, row in enumerate(nutrientGrid):
-        for j, val in enumerate(row):
-            values.append((val, i, j))
-
-    # Sort by value descending
-    values.sort(reverse=True)
-
-    # Return as (row, col, value)
-    return [(i, j, val) for val, i, j in values]
-
-
-def _best_target_fallback(best_pos, game_message, my_id, origin, ownership):
-    FALLBACK_RADIUS = 20  # Limit fallback search to avoid full map scan
-    best_dist = 10 ** 9
-    fallback_radius = min(FALLBACK_RADIUS, max(game_message.world.map.width, game_message.world.map.height))
-    for dy in range(-fallback_radius, fallback_radius + 1):
-        for dx in range(-fallback_radius, fallback_radius + 1):
-            tx = origin.position.x + dx
-            ty = origin.position.y + dy
-
-            if not _in_map(tx, ty, game_message):
-                continue
+def _best_target(game_message: TeamGameState, my_team: TeamInfo, origin) -> Targets:
+    # Cheapest real route first (see pathfinding), then closest, like the old double sort.
+    # The ranking is kept between ticks and only repaired where route costs changed (see target_cache)
+    targets = target_cache(game_message).nutrient_targets(origin.position)
+    if not targets:
+        # Every nutrient tile is ours already: keep expanding the territory anyway
+        targets = _best_target_fallback(game_message, origin.position)
+    return targets
 
-            dist = abs(dx) + abs(dy)
-            if dist == 0:
-                continue
 
-            if ownership[ty][tx] != my_id:
-                if dist < best_dist:
-                    best_dist = dist
-                    best_pos = Position(tx, ty)
-    if best_pos is not None:
-        _dbg(f"_best_target: fallback found ({best_pos.x},{best_pos.y}) at distance {best_dist}")
-    else:
-        _dbg(f"_best_target: no targets found (map fully owned?)")
-    return best_pos
+def _best_target_fallback(game_message: TeamGameState, origin: Position) -> Targets:
+    """The richest tiles next to our territory we don't own yet, closest first (no map scan: see territory)."""
+    xs, ys = territory(game_message).frontier_by_value(FALLBACK_TARGETS)
+    if len(xs) == 0:
+        log.debug("_best_target: no targets found (map fully owned?)")
+        return EMPTY
+    order = np.argsort(np.abs(xs - origin.x) + np.abs(ys - origin.y), kind="stable")
+    log.debug("_best_target: fallback found (%d,%d)", xs[order[0]], ys[order[0]])
+    return Targets(xs[order], ys[order])
 
 
-def should_move_spore(spores, game_message, my_team, blocked_spore_ids: Optional[set[str]] = None) -> list[SporeMoveToAction]:
+def should_move_spore(spores, game_message, my_team, blocked_spore_ids: Optional[set[str]] = None,
+                      deadline: Optional[float] = None) -> list[SporeMoveToAction]:
     moves = list()
-    targets_from_spawners = _gen_targets_from_spawners(game_message, my_team)
+    targets_from_spawners = _gen_targets_from_spawners(game_message, my_team, deadline)
+    blocked_spore_ids = blocked_spore_ids or set()
+
+    our_spawners = spatial_index(game_message).team_spawners(my_team.teamId)
+    if our_spawners.count:
+        # Destinations live in the entity store and go away with their spore
+        store = entity_store(game_message)
+        idle_mask = store.idle_mask(spores)
+        idle = [spore for spore, is_idle in zip(spores, idle_mask.tolist())
+                if is_idle and spore.id not in blocked_spore_ids]
+        # Tiles some other spore is already heading to are not up for grabs
+        dest_xs, dest_ys = store.destinations_of(spores)
+        taken = set(zip(dest_xs[~idle_mask].tolist(), dest_ys[~idle_mask].tolist()))
+
+        closest = {spore.id: our_spawners.closest(spore.position).id for spore in idle}
+        candidates = _candidate_targets(targets_from_spawners, closest, taken)
+        # One spore per tile, total travel as small as possible (see assignment)
+        assigned = assign_targets(game_message, idle, candidates, deadline)
+        for spore in idle:
+            # Spores left without a target of their own stay idle: they are assigned again next tick
+            destination = assigned.get(spore.id)
+            if destination is not None and destination != spore.position:
+                store.set_destination(spore.id, destination)
 
-    our_spawners = [spawner for spawner in game_message.world.spawners if spawner.teamId == my_team.teamId]
-    if our_spawners:
         for spore in spores:
-            if spore.id not in spore_destinations or spore.position == spore_destinations[spore.id]:
-                closest_spawner = min(our_spawners, key=lambda spawner: _manhattan(spore.position, spawner.position))
-                targets = targets_from_spawners.get(closest_spawner.id) or []
-                if len(targets) > 0:
-                    spore_destinations[spore.id] = targets[random.randint(0, len(targets) - 1)]
-
-            moves.append(
-                SporeMoveToAction(sporeId=spore.id, position=spore_destinations[spore.id])
-            )
+            destination = store.destination(spore.id)
+            if destination is not None and spore.id not in blocked_spore_ids:
+                moves.append(
+                    SporeMoveToAction(sporeId=spore.id, position=destination)
+                )
 
     return moves
 
 
+def _candidate_targets(targets_from_spawners: dict[str, Targets], closest: dict[str, str],
+                       taken: set[tuple[int, int]]) -> list[Position]:
+    """Free targets drawn at random from the lists of the spawners the spores are closest to, twice as many
+    as the spores (plus some). Drawing from the whole list keeps the spores spreading out over the map."""
+    wanted: dict[str, int] = {}
+    for spawner_id in closest.values():
+        wanted[spawner_id] = wanted.get(spawner_id, 8) + 2
+    candidates = []
+    seen = set(taken)
+    for spawner_id, count in wanted.items():
+        targets = targets_from_spawners.get(spawner_id) or []
+        # Drawn at random, skipping tiles already taken: count + len(seen) draws always leave `count` free ones
+        for target in random.sample(targets, min(count + len(seen), len(targets))):
+            if (target.x, target.y) not in seen:
+                seen.add((target.x, target.y))
+                candidates.append(target)
+                count -= 1
+                if not count:
+                    break
+    return candidates
+
+
 def _enemy_targets(game_message, my_team, origin):
-    meilleurs_nutrients = sorted(
-        find_closest_spawner_not_ours(game_message.world.spawners, origin.position, game_message),
-        key=lambda pos: _path_score(game_message, my_team, origin.position, pos),
-        reverse=True)  # double sort mais marche
-    return meilleurs_nutrients
+    view = grid_view(game_message)
+    spawners = [spawner for spawner in game_message.world.spawners
+                if not view.is_ours(spawner.position.x, spawner.position.y)]
+    xs = np.array([spawner.position.x for spawner in spawners], dtype=np.intp)
+    ys = np.array([spawner.position.y for spawner in spawners], dtype=np.intp)
+    return target_cache(game_message).enemy_targets(origin.position, xs, ys)
 
 
-def _gen_targets_from_spawners(game_message, my_team):
+def _gen_targets_from_spawners(game_message, my_team, deadline: Optional[float] = None):
     targets = dict()
-    ownership = game_message.world.ownershipGrid
     my_id = game_message.yourTeamId
     our_spawners = [spawner for spawner in game_message.world.spawners if spawner.teamId == my_id]
+    # Spawners are independent: the distance fields their rankings need are built over the process pool
+    target_cache(game_message).prefetch([spawner.position for spawner in our_spawners], deadline)
     for spawner in our_spawners:
-        # Generate targets normally, then filter out any tiles we already own,
-        raw_targets = _best_target(game_message, my_team, spawner) or []
-        enemy_targets = _enemy_targets(game_message, my_team, spawner) or []
-        raw_targets.extend(enemy_targets)
-        filtered = [pos for pos in raw_targets if isinstance(pos, Position) and ownership[pos.y][pos.x] != my_id]
-        targets[spawner.id] = filtered
+        if deadline is not None and time.perf_counter() >= deadline:
+            # Out of time: spores around the remaining spawners keep their current destination
+            log.debug("_gen_targets_from_spawners: deadline hit after %d/%d spawners", len(targets), len(our_spawners))
+            break
+        # Both lists only hold tiles we don't own (the nutrient ranking filters them, enemy spawners stand on theirs)
+        spawner_targets = _best_target(game_message, my_team, spawner)
+        targets[spawner.id] = spawner_targets + _enemy_targets(game_message, my_team, spawner)
     return targets
 
 
 class Bot:
 
     def __init__(self):
-        print("Initializing your super mega duper bot")
+        log.info("Initializing your super mega duper bot")
+        # Lookahead search that polishes the strategy's actions with whatever time is left
+        self.planner = BeamPlanner()
+        # Start the target generation workers (if any) before the first tick needs them
+        parallel_targets()
 
     def get_next_move(self, game_message: TeamGameState) -> list[Action]:
         """
         Strategic loop implementing spawner creation, spawner production, and spore movement.
         """
+        actions = []
+        for actions in self.plan_anytime(game_message):
+            pass
+        return actions
+
+    def plan_anytime(self, game_message: TeamGameState, deadline: Optional[float] = None) -> Iterator[list[Action]]:
+        """
+        Yields better and better action sets for this tick: a cheap baseline first, then the full strategy
+        improved by a lookahead search (see planner.BeamPlanner), with its moves checked for collisions and
+        fights (see move_evaluator). The search gives up at once when the deadline has passed, so the strategy
+        is never sent without that check.
+        The caller can stop at any point and send the last one it got (see scheduler.TickScheduler).
+        """
         my_team: TeamInfo = game_message.world.teamInfos[game_message.yourTeamId]
+        with phase("plan.world_state"):
+            # The diff since last tick, which the territory, entity store, economy and caches apply
+            world_state(game_message)
+        with phase("plan.baseline"):
+            actions = self.baseline(game_message, my_team)
+        yield actions
+        with phase("plan.strategie"):
+            actions = self.strategie(game_message, my_team, deadline)
+        with phase("plan.search"):
+            actions = self.planner.refine(game_message, actions, deadline)
+        with phase("plan.check"):
+            actions = check_moves(game_message, actions).actions
+        yield actions
+
+    def baseline(self, game_message: TeamGameState, myTeam: TeamInfo) -> list[Action]:
+        """
+        Cheap plan that is always ready in time: keep spores on their current destination and keep producing.
+        """
+        actions = []
+        store = entity_store(game_message)
+        for spore in myTeam.spores:
+            destination = store.destination(spore.id)
+            if destination is not None and destination != spore.position:
+                actions.append(SporeMoveToAction(sporeId=spore.id, position=destination))
+        if len(myTeam.spawners) == 0 and myTeam.spores and store.destination(myTeam.spores[0].id) is None:
+            actions.append(SporeCreateSpawnerAction(sporeId=myTeam.spores[0].id))
+        actions.extend(self.produce_spores(game_message, myTeam))
+        return actions
 
-        return self.strategie(game_message, my_team)
+    def produce_spores(self, game_message: TeamGameState, myTeam: TeamInfo) -> list[Action]:
+        if PRODUCTION_MODE == "economy":
+            return economy(game_message).production(myTeam)
+        actions = []
+        nutrients_courant = myTeam.nutrients
+        for spawner in myTeam.spawners:
+            if nutrients_courant > PRODUCTION_THRESHOLD:
+                actions.append(SpawnerProduceSporeAction(spawnerId=spawner.id, biomass=SPORE_BIOMASS))
+                nutrients_courant = nutrients_courant - SPORE_BIOMASS
+        return actions
 
     def fillSpawnerZone(self, spawner: Spawner, game_message: TeamGameState) -> list[Position]:
         """
@@ -298,17 +246,14 @@ class Bot:
                 zone_coords.append(Position(x=x, y=y))
         return zone_coords
 
-    def moveAllSporesTo(self, spores: list[Spore], targets: list[Position]) -> list[Action]:
+    def moveAllSporesTo(self, spores: list[Spore], targets: list[Position],
+                        game_message: TeamGameState, deadline: Optional[float] = None) -> list[Action]:
         """
-        Generates move actions for all spores to a target coordinate.
+        Generates move actions sending each spore to its own target, with the least travel overall.
         """
-        actions = []
-        for spore in spores:
-            actions.append(SporeMoveToAction(sporeId=spore.id, position=targets[0]))
-            targets.pop(0)
-            if len(targets) == 0:
-                return actions
-        return actions
+        destinations = assign_targets(game_message, spores, targets, deadline)
+        return [SporeMoveToAction(sporeId=spore.id, position=destinations[spore.id])
+                for spore in spores if spore.id in destinations]
 
     def isNearBy(self, position: Position, target: Position) -> bool:
         isNear = True
@@ -316,10 +261,15 @@ class Bot:
             isNear = False
         return isNear
 
-    def numberSporeNearBy(self, spores: list[Spore], target: Position) -> int:
+    def numberSporeNearBy(self, spores: list[Spore], target: Position, game_message: Optional[TeamGameState] = None) -> int:
+        if game_message is not None:
+            # Only the spores in the 3x3 square around target, from the tick's spatial index
+            ids = {spore.id for spore in spores}
+            return len(spatial_index(game_message).spores.within(
+                target, 1, "chebyshev", keep=lambda spore: spore.id in ids))
         count = 0
         for spore in spores:
-            if self.isNearBy(spore, target):
+            if self.isNearBy(spore.position, target):
                 count += 1
         return count
 
@@ -334,19 +284,20 @@ class Bot:
         #         for spore in team.spores:
         #             if mySpore.biomass < spore.biomass:
 
-    def strategie(self, game_message: TeamGameState, myTeam: TeamInfo) -> list[Action]:
+    def strategie(self, game_message: TeamGameState, myTeam: TeamInfo, deadline: Optional[float] = None) -> list[Action]:
         actions = []
         spores_couverture = myTeam.spores[:len(myTeam.spores) // 3]
-        spores_ressources = [spore for spore in myTeam.spores if spore not in spores_couverture]
+        couverture_ids = {spore.id for spore in spores_couverture}
+        spores_ressources = [spore for spore in myTeam.spores if spore.id not in couverture_ids]
 
-        if (game_message.tick % 125) >= 100:
+        if (game_message.tick % PHASE_PERIOD) >= PHASE_SWITCH:
             return self.strat_after_x_ticks(game_message, myTeam)
         # if len(myTeam.spawners) == 0:
         #     actions.append(SporeCreateSpawnerAction(sporeId=myTeam.spores[0].id))
         # elif myTeam.nutrients > 10:
         #     actions.append(SpawnerProduceSporeAction(spawnerId=myTeam.spawners[0].id, biomass=5))
         # else:
-        #     for action in self.moveAllSporesTo(myTeam.spores, self.fillSpawnerZone(myTeam.spawners[0], game_message)):
+        #     for action in self.moveAllSporesTo(myTeam.spores, self.fillSpawnerZone(myTeam.spawners[0], game_message), game_message):
         #         actions.append(action)
         #         print(action.position.x, action.position.y)
 
@@ -354,7 +305,8 @@ class Bot:
 
         # 1) Spawner creation decisions
         #if(game_message.tick < 100 or game_message.tick % 50 == 0):
-        spawner_creations = should_create_spawner(game_message, myTeam)
+        with phase("plan.strategie.spawners"):
+            spawner_creations = should_create_spawner(game_message, myTeam, deadline)
         actions.extend(spawner_creations)
         blocked_spores = {a.sporeId for a in spawner_creations}
 
@@ -363,21 +315,23 @@ class Bot:
         # actions.extend(production)
 
         # 4) Move spores
-        spore_moves = should_move_spore(spores_ressources, game_message, myTeam, blocked_spore_ids=blocked_spores)
+        with phase("plan.strategie.moves"):
+            spore_moves = should_move_spore(spores_ressources, game_message, myTeam, blocked_spore_ids=blocked_spores,
+                                            deadline=deadline)
         actions.extend(spore_moves)
 
         # Felix
         if len(myTeam.spawners) == 0:
-            actions.append(SporeCreateSpawnerAction(sporeId=myTeam.spores[0].id))
+            if not spawner_creations:
+                actions.append(SporeCreateSpawnerAction(sporeId=myTeam.spores[0].id))
         else:
-            for action in self.moveAllSporesTo(spores_couverture, self.fillSpawnerZone(myTeam.spawners[0], game_message)):
-                actions.append(action)
+            with phase("plan.strategie.cover"):
+                cover = [spore for spore in spores_couverture if spore.id not in blocked_spores]
+                zone = self.fillSpawnerZone(myTeam.spawners[0], game_message)
+                actions.extend(self.moveAllSporesTo(cover, zone, game_message, deadline))
 
-        nutrients_courant = myTeam.nutrients
-        for spawner in myTeam.spawners:
-            if nutrients_courant > 15:
-                actions.append(SpawnerProduceSporeAction(spawnerId=spawner.id, biomass=10))
-                nutrients_courant = nutrients_courant - 10
+        with phase("plan.strategie.production"):
+            actions.extend(self.produce_spores(game_message, myTeam))
 
         return actions
     
@@ -389,67 +343,5 @@ class Bot:
             actions.append(
                 SporeMoveToAction(sporeId=spore.id, position=newPos)
                 )
-        nutrients_courant = myTeam.nutrients
-        for spawner in myTeam.spawners:
-            if nutrients_courant > 15:
-                actions.append(SpawnerProduceSporeAction(spawnerId=spawner.id, biomass=10))
-                nutrients_courant = nutrients_courant - 10
+        actions.extend(self.produce_spores(game_message, myTeam))
         return actions
-    
-    
-    def action(self, game_message: TeamGameState) -> list[Action]:
-        actions = []
-        my_team: TeamInfo = game_message.world.teamInfos[game_message.yourTeamId]
-        
-        if len(my_team.spawners) == 0:
-            actions.append(SporeCreateSpawnerAction(sporeId=my_team.spores[0].id))
-        elif my_team.nutrients > 10:
-            actions.append(SpawnerProduceSporeAction(spawnerId=my_team.spawners[0].id, biomass=5))
-        else:
-            best_positions = self.get_nutriments_score(game_message, my_team.spawners[0])
-            for spore in my_team.spores:
-                if best_positions:  # Only move if we found valid positions
-                    actions.append(
-                        SporeMoveToAction(
-                        sporeId=spore.id,
-                        position=best_positions[0],  # Take the best position
-                    )
-                )
-            best_positions.pop(0) # Remove the position once assigned
-        return actions
-
-    def get_nutriments_score(self, game_message: TeamGameState, spawner: Spawner):
-        """Returns a list of Position objects sorted from best to worst score."""
-        nutriments = game_message.world.map.nutrientGrid
-        position_scores = []
-        
-        for y in range(game_message.world.map.height):
-            for x in range(game_message.world.map.width):
-                if nutriments[y][x] > 0:
-                    position = Position(x=x, y=y)
-                    score = self.score_result(game_message, position, spawner, nutriments)
-                    # Only include positions with valid scores
-                    if score < 0:
-                        position_scores.append((score, position))
-        
-        # Sort by score in descending order (best first)
-        
-        position_scores.sort(reverse=True, key=lambda item: item[0])
-        print(position_scores)
-
-        # Return just the positions (without scores)
-        return [position for score, position in position_scores]
-    
-    def score_result(self, game_message: TeamGameState, position: Position, spawner: Spawner, nutriments):
-        teamId = game_message.yourTeamId
-        
-        # Skip tiles we already own
-        if game_message.world.ownershipGrid[position.y][position.x] == teamId:
-            return -float('inf')
-        
-        # Calculate Manhattan distance
-        distance = abs(spawner.position.x - position.x) + abs(spawner.position.y - position.y)
-        
-        # Score based on nutrient value minus distance cost
-        score = nutriments[position.y][position.x] * 4 - distance
-        return score
\ No newline at end of file
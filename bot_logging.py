@@ -0,0 +1,91 @@
+"""Logging that stays off the game loop: records go through a bounded queue to a writer thread.
+
+Modules log with `log = logging.getLogger(__name__)` and %-style arguments (`log.debug("x=%s", x)`), so a
+disabled level costs one cached level check and nothing gets formatted. Levels are set from the environment:
+    LOG_LEVEL=INFO                     default level
+    LOG_LEVELS=bot=DEBUG,worker=WARNING per module
+    LOG_QUEUE_SIZE=10000               records waiting for the writer before new ones are dropped
+
+Records are formatted by the writer thread: log values, not containers that get changed right after.
+"""
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_FORMAT = "%(message)s"
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or raising."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Waits for room: the writer is draining the queue and must see the sentinel
+        self.queue.put(self._sentinel)
+
+
+_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[_Listener] = None
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """"bot=DEBUG,worker=WARNING" -> {"bot": "DEBUG", "worker": "WARNING"}"""
+    levels = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, level = part.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(stream=None):
+    """Routes every logger through the queue to `stream` (stdout by default). Safe to call twice."""
+    global _handler, _listener
+    if _listener is not None:
+        return
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(logging.Formatter(LOG_FORMAT))
+    _handler = _DroppingQueueHandler(queue.Queue(int(os.environ.get("LOG_QUEUE_SIZE", "10000"))))
+    _listener = _Listener(_handler.queue, writer)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for name, level in parse_levels(os.environ.get("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def dropped_messages() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+def stop_logging():
+    """Writes what is still queued and stops the writer thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    if _handler.dropped:
+        print(f"{_handler.dropped} log messages dropped", file=sys.stderr)
@@ -0,0 +1,271 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import msgspec
+import numpy as np
+
+from game_message import *
+from grid_view import TeamCodes, static_map
+
+QUOTED = re.compile(rb'"([^"]*)"')
+
+
+@dataclass(slots=True)
+class CompactGameMap:
+    """Same as GameMap, but the grid is a (height, width) int32 array."""
+
+    width: int
+    """Width of the map."""
+    height: int
+    """Height of the map."""
+    nutrientGrid: np.ndarray
+    """The nutrients level per tile, indexed [y, x]."""
+
+
+@dataclass(slots=True)
+class CompactGameWorld:
+    """Same as GameWorld, but the grids are (height, width) int32 arrays."""
+
+    map: CompactGameMap
+    """The loaded game map. This map will never change during the game."""
+    biomassGrid: np.ndarray
+    """The biomass level per tile, indexed [y, x]."""
+    ownershipGrid: np.ndarray
+    """The owner per tile as an interned team code, indexed [y, x]. Use teamCodes to get the team id back."""
+    spores: list[Spore]
+    """The spores in the map."""
+    spawners: list[Spawner]
+    """The spawners in the map."""
+    teamInfos: dict[str, TeamInfo]
+    """Current info of each team by team id."""
+    teamCodes: TeamCodes
+    """Team id <-> code table used by ownershipGrid. Stable for the whole game."""
+
+
+@dataclass(slots=True)
+class CompactTeamGameState:
+    """Same as TeamGameState, with a CompactGameWorld."""
+
+    tick: int
+    """Current tick number."""
+    yourTeamId: str
+    """Your team id."""
+    lastTickErrors: list[str]
+    """Errors that happened during the last tick."""
+    constants: Constants
+    """Game constants."""
+    teamIds: list[str]
+    """List of all the teams currently playing."""
+    world: CompactGameWorld
+    """The game map, and objects"""
+
+
+@dataclass(slots=True)
+class _RawGameMap:
+    width: int
+    height: int
+    nutrientGrid: msgspec.Raw
+
+
+@dataclass(slots=True)
+class _RawGameWorld:
+    map: _RawGameMap
+    biomassGrid: msgspec.Raw
+    ownershipGrid: msgspec.Raw
+    spores: list[Spore]
+    spawners: list[Spawner]
+    teamInfos: dict[str, TeamInfo]
+
+
+@dataclass(slots=True)
+class _RawTeamGameState:
+    tick: int
+    yourTeamId: str
+    lastTickErrors: list[str]
+    constants: Constants
+    teamIds: list[str]
+    world: _RawGameWorld
+
+
+def _parse_ints(raw) -> np.ndarray:
+    return np.fromstring(bytes(raw).translate(None, b"[] \n\r\t"), dtype=np.int32, sep=",")
+
+
+def _int_grid(raw, height: int, width: int) -> np.ndarray:
+    """The non-negative integers of a JSON grid as a (height, width) int32 array.
+
+    Numbers are read digit position by digit position over the whole grid at once (a handful of array
+    operations per digit of the longest number) instead of one at a time. Anything else than non-negative
+    integers (a sign, a fraction, an exponent) goes through np.fromstring.
+    """
+    if height * width == 0:
+        return np.zeros((height, width), dtype=np.int32)
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    digits = buf - np.uint8(ord("0"))
+    is_digit = digits < 10
+    # The grid starts with "[" and ends with "]": changes from non-digit to digit and back alternate
+    changes = np.flatnonzero(is_digit[1:] != is_digit[:-1]) + 1
+    starts, ends = changes[0::2], changes[1::2]
+    lengths = ends - starts
+    if len(ends) != height * width or is_digit[0] or lengths.max() > 9 or (buf == ord("-")).any():
+        return _parse_ints(raw).reshape(height, width)
+    values = digits[ends - 1].astype(np.int32)
+    scale = 1
+    for position in range(1, int(lengths.max())):
+        scale *= 10
+        longer = np.flatnonzero(lengths > position)
+        values[longer] += digits[ends[longer] - 1 - position].astype(np.int32) * scale
+    return values.reshape(height, width)
+
+
+def _distinguishing_offsets(ids: list[bytes]) -> Optional[list[int]]:
+    """A few byte offsets that, with the length, tell all the given ids apart (None if it takes too many)."""
+    offsets = []
+    while True:
+        keys = [(len(i), *(i[o] if o < len(i) else 0 for o in offsets)) for i in ids]
+        if len(set(keys)) == len(ids):
+            return offsets
+        if len(offsets) == 5:
+            return None
+        longest = max(len(i) for i in ids)
+        offsets.append(max(
+            (o for o in range(longest) if o not in offsets),
+            key=lambda o: len({(*k, i[o] if o < len(i) else 0) for k, i in zip(keys, ids)}),
+        ))
+
+
+def _token_keys(lengths: np.ndarray, byte_at: list[np.ndarray]) -> np.ndarray:
+    keys = lengths.astype(np.int64)
+    for values in byte_at:
+        keys = (keys << 8) | values
+    return keys
+
+
+def _ownership_grid_replace(raw: bytes, teams: TeamCodes, known_ids: list[str], height: int, width: int) -> np.ndarray:
+    # Replace every quoted team id by its code with bytes.replace, so no per-tile Python string is created
+    for team_id in known_ids:
+        raw = raw.replace(b'"' + team_id.encode() + b'"', str(teams.code(team_id)).encode())
+    if b'"' in raw:
+        # Owners we didn't know about
+        for team_id in set(QUOTED.findall(raw)):
+            raw = raw.replace(b'"' + team_id + b'"', str(teams.code(team_id.decode())).encode())
+    return _int_grid(raw, height, width)
+
+
+def _ownership_grid(raw: bytes, teams: TeamCodes, known_ids: list[str], height: int, width: int) -> np.ndarray:
+    """Ownership grid as team codes, without ever building one Python string per tile.
+
+    Owners are always the neutral team or a team listed in teamIds at some point of the game, so each
+    quoted token is identified by its length and the few bytes that tell those ids apart. Anything that
+    doesn't match a known id goes through the slower (but exact) replace path.
+    """
+    ids = [team_id.encode() for team_id in dict.fromkeys(known_ids)]
+    offsets = _distinguishing_offsets(ids)
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    quotes = np.flatnonzero(buf == ord('"'))
+    if offsets is None or len(quotes) != 2 * height * width or b"\\" in raw:
+        return _ownership_grid_replace(raw, teams, known_ids, height, width)
+
+    starts = quotes[0::2] + 1
+    lengths = quotes[1::2] - starts
+    byte_at = []
+    for offset in offsets:
+        values = buf[np.minimum(starts + offset, len(buf) - 1)].astype(np.int64)
+        values[lengths <= offset] = 0
+        byte_at.append(values)
+    keys = _token_keys(lengths, byte_at)
+
+    known_keys = np.array([
+        _token_keys(np.array([len(i)]), [np.array([i[o] if o < len(i) else 0]) for o in offsets])[0] for i in ids
+    ], dtype=np.int64)
+    known_codes = np.array([teams.code(i.decode()) for i in ids], dtype=np.int32)
+    if len(offsets) <= 1 and lengths.max() < 256:
+        # Keys fit in 16 bits: a lookup table beats a binary search
+        table = np.full(1 << 16, -1, dtype=np.int32)
+        table[known_keys] = known_codes
+        codes = table[keys]
+        if (codes < 0).any():
+            return _ownership_grid_replace(raw, teams, known_ids, height, width)
+        return codes.reshape(height, width)
+    order = np.argsort(known_keys)
+    known_keys, known_codes = known_keys[order], known_codes[order]
+    index = np.minimum(np.searchsorted(known_keys, keys), len(known_keys) - 1)
+    if not np.array_equal(known_keys[index], keys):
+        return _ownership_grid_replace(raw, teams, known_ids, height, width)
+    return known_codes[index].reshape(height, width)
+
+
+def _cut_ownership(message: bytes) -> tuple[Optional[bytes], bytes]:
+    """The ownership grid's JSON, and the message with an empty grid in its place, or (None, message) if the grid
+    isn't laid out the usual way ("ownershipGrid":[[...],...,[...]] with no "]]" before its end).
+
+    Skipping that many strings is most of msgspec's work on the message, and _ownership_grid reads them anyway.
+    A wrong cut (an id containing "]]" ends inside a string) leaves JSON msgspec rejects, and the decoder falls
+    back to the whole message.
+    """
+    key = message.find(b'"ownershipGrid"')
+    start = message.find(b"[", key)
+    end = message.find(b"]]", start)
+    if key < 0 or start < 0 or end < 0 or message[key + len(b'"ownershipGrid"'):start].strip(b" \t\r\n:"):
+        return None, message
+    end += 2
+    return message[start:end], b"".join((message[:start], b"[]", message[end:]))
+
+
+class CompactDecoder:
+    """Decodes game messages into CompactTeamGameState.
+
+    Small entities (spores, spawners, team infos) are the usual game_message dataclasses; the three grids
+    go straight from the JSON bytes to int32 arrays, and the nutrient grid is only parsed again when it
+    changes (i.e. on a new game).
+    """
+
+    def __init__(self):
+        self._decoder = msgspec.json.Decoder(_RawTeamGameState)
+        self._nutrients_raw: Optional[bytes] = None
+        self._nutrients: Optional[np.ndarray] = None
+
+    def decode(self, message) -> CompactTeamGameState:
+        if isinstance(message, str):
+            message = message.encode()
+        ownership, rest = _cut_ownership(bytes(message))
+        raw = None
+        if ownership is not None:
+            try:
+                raw = self._decoder.decode(rest)
+            except msgspec.DecodeError:
+                pass
+        if raw is None:
+            raw = self._decoder.decode(message)
+            ownership = bytes(raw.world.ownershipGrid)
+        world = raw.world
+        height, width = world.map.height, world.map.width
+
+        nutrients_raw = bytes(world.map.nutrientGrid)
+        if nutrients_raw != self._nutrients_raw:
+            self._nutrients_raw = nutrients_raw
+            self._nutrients = _int_grid(nutrients_raw, height, width)
+
+        state = CompactTeamGameState(
+            tick=raw.tick,
+            yourTeamId=raw.yourTeamId,
+            lastTickErrors=raw.lastTickErrors,
+            constants=raw.constants,
+            teamIds=raw.teamIds,
+            world=CompactGameWorld(
+                map=CompactGameMap(width=width, height=height, nutrientGrid=self._nutrients),
+                biomassGrid=_int_grid(world.biomassGrid, height, width),
+                ownershipGrid=None,
+                spores=world.spores,
+                spawners=world.spawners,
+                teamInfos=world.teamInfos,
+                teamCodes=None,
+            ),
+        )
+        # Codes have to come from the per-game StaticMap so GridView can use the grid as is
+        teams = static_map(state).teams
+        known_ids = [raw.constants.neutralTeamId, *teams.team_ids(), *raw.teamIds]
+        state.world.teamCodes = teams
+        state.world.ownershipGrid = _ownership_grid(ownership, teams, known_ids, height, width)
+        return state
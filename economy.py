@@ -0,0 +1,232 @@
+"""Spore production planned from our income, instead of a fixed spore size above a fixed stock.
+
+A spore walks free over our ground to the nearest tile we don't own, then takes one tile per tick for 1 biomass
+each; a tile is worth itself plus the nutrients it yields until the end, everything discounted by
+ECONOMY_DISCOUNT per tick. A dynamic program over the next ECONOMY_HORIZON ticks, with our stock as the state and
+a multiple-choice knapsack over SPORE_SIZES each tick, picks what every spawner produces. Plans are cached on
+the (rounded) income, spawners and ticks left.
+"""
+import logging
+import math
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import GridView, StaticMap
+from map_analysis import square_sums, summed_area_table
+from territory import territory
+from world_state import world_state
+
+log = logging.getLogger(__name__)
+
+# Ticks ahead the production plan looks at
+ECONOMY_HORIZON = int(os.environ.get("ECONOMY_HORIZON", "12"))
+# Worth of a tile or a nutrient one tick later, relative to now (below 1: what comes sooner is reinvested sooner)
+ECONOMY_DISCOUNT = float(os.environ.get("ECONOMY_DISCOUNT", "0.95"))
+# Biomass a spawner can put in a spore
+SPORE_SIZES = (2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50)
+# Stocks above this are planned as this much (the rest waits for the next tick). Below it, the plan only
+# looks at what the spawners can spend in one tick (one spore each)
+STOCK_CAP = 512
+# Nutrients per tile around a spawner are averaged over the tiles we don't own in this radius
+ECONOMY_RADIUS = 5
+# Plans are shared by incomes within this ratio of each other, and by ticks left within this many ticks
+INCOME_STEP = 1.1
+REMAINING_STEP = 25
+# Plans kept (least recently used ones are evicted first)
+PLAN_CACHE_SIZE = 32
+
+
+def spore_values(biomass: np.ndarray, remaining: int, distance: float, nutrients: float,
+                 discount: float = ECONOMY_DISCOUNT) -> np.ndarray:
+    """Worth of spores of each `biomass`, in tiles now: the tiles they take and what those yield, discounted."""
+    k = np.arange(1, int(biomass.max()))
+    # Ticks the k-th tile taken yields its nutrients for (it isn't taken at all when negative)
+    left = remaining - distance - k
+    income = nutrients * discount * (1 - discount ** np.maximum(left, 0)) / (1 - discount)
+    tiles = np.where(left >= 0, discount ** (distance + k) * (1 + income), 0.0)
+    return np.concatenate(([0.0], np.cumsum(tiles)))[biomass - 1]
+
+
+class ProductionPlan:
+    """Which spawner produces how much this tick, for every stock we may have."""
+
+    def __init__(self, spawner_ids: list[str], spend: np.ndarray, choices: np.ndarray):
+        self.spawner_ids = spawner_ids
+        self.spend = spend
+        """Nutrients to spend this tick, by stock (the last one for any stock above)."""
+        self.choices = choices
+        """(spawners, stocks) biomass of spawner s's spore when spawners 0..s spend exactly c."""
+
+    def production(self, stock: int) -> dict[str, int]:
+        """Biomass to produce by spawner id (spawners left out produce nothing)."""
+        spent = int(self.spend[min(max(stock, 0), len(self.spend) - 1)])
+        produced = {}
+        for s in range(len(self.spawner_ids) - 1, -1, -1):
+            biomass = int(self.choices[s, spent])
+            if biomass:
+                produced[self.spawner_ids[s]] = biomass
+                spent -= biomass
+        return produced
+
+
+def solve(spawner_ids: list[str], distances: np.ndarray, nutrients: np.ndarray, income: int, remaining: int,
+          horizon: int = ECONOMY_HORIZON, discount: float = ECONOMY_DISCOUNT) -> ProductionPlan:
+    """Production plan of spawners `distances` ticks from new ground with `nutrients` per tile around them."""
+    sizes = np.array(SPORE_SIZES, dtype=np.int64)
+    capacity = min(STOCK_CAP, len(spawner_ids) * int(sizes[-1])) + 1
+    stock = np.arange(capacity)
+    # What is left at the end of the horizon buys the best spore there is then
+    tail = max(remaining - horizon, 0)
+    worth = max((float((spore_values(sizes, tail, d, mu, discount) / sizes).max())
+                 for d, mu in zip(distances, nutrients)), default=0.0)
+    future = stock * worth
+    # Carried over from one tick to the next: what is kept plus the income, capped
+    carry = np.clip(stock[:, None] - stock[None, :] + income, 0, capacity - 1)
+    affordable = stock[None, :] <= stock[:, None]
+    spend = choices = None
+    for tick in range(horizon - 1, -1, -1):
+        # Multiple-choice knapsack: best[c] is the most the spawners are worth spending exactly c
+        best = np.full(capacity, -np.inf)
+        best[0] = 0.0
+        picks = np.zeros((len(spawner_ids), capacity), dtype=np.int64)
+        for s, (d, mu) in enumerate(zip(distances, nutrients)):
+            values = spore_values(sizes, remaining - tick, d, mu, discount)
+            extended = best.copy()
+            for size, value in zip(sizes.tolist(), values.tolist()):
+                if value <= 0:
+                    continue
+                candidate = best[:-size] + value
+                better = candidate > extended[size:]
+                extended[size:][better] = candidate[better]
+                picks[s, size:][better] = size
+            best = extended
+        # Stock n spends c <= n this tick and keeps the rest for the next one
+        total = np.where(affordable, best[None, :] + discount * future[carry], -np.inf)
+        spend = np.argmax(total, axis=1)
+        future = total[stock, spend]
+        choices = picks
+    return ProductionPlan(spawner_ids, spend, choices)
+
+
+class Economy:
+    """Our income and stock, and the production plans for them, cached between ticks."""
+
+    def __init__(self, cache_size: int = PLAN_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.static: Optional[StaticMap] = None
+        self.view: Optional[GridView] = None
+        self.version = -1
+        """Version of the world state applied last."""
+        self.income = 0
+        """Nutrients per tick from the tiles we own."""
+        self.stock = 0
+        self.remaining = 0
+        """Ticks left in the game."""
+        self.plans: OrderedDict[tuple, ProductionPlan] = OrderedDict()
+        self.solves = 0
+        """Plans solved so far (the rest came from the cache)."""
+        self._around: dict[str, tuple[int, int, int, int, int]] = {}
+        """Spawner id -> (x, y, ticks to the nearest tile we don't own, nutrients and count of such tiles around)."""
+        self._total = 0
+        self._owned = 0
+
+    def sync(self, game_message: TeamGameState):
+        world = world_state(game_message)
+        if world.version == self.version:
+            return
+        diff = world.diff
+        if world.static is not self.static:
+            self.plans.clear()
+            self.static = world.static
+            self._total = int(world.static.nutrients.sum())
+        if diff.full_rebuild or diff.base != self.version:
+            self._around.clear()
+        else:
+            self._forget_around(diff.ours_changed())
+        self.version = world.version
+        self.view = world.view
+        ours = territory(game_message)
+        self.income = ours.income
+        self._owned = ours.owned_count
+        self.stock = game_message.world.teamInfos[game_message.yourTeamId].nutrients
+        self.remaining = max(game_message.constants.maxTicks - game_message.tick, 0)
+
+    def production(self, my_team: TeamInfo) -> list[Action]:
+        """This tick's SpawnerProduceSporeActions."""
+        if not my_team.spawners:
+            return []
+        produced = self.plan(my_team).production(self.stock)
+        return [SpawnerProduceSporeAction(spawnerId=spawner_id, biomass=biomass)
+                for spawner_id, biomass in produced.items()]
+
+    def plan(self, my_team: TeamInfo) -> ProductionPlan:
+        spawners = sorted(my_team.spawners, key=lambda spawner: spawner.id)
+        key = (tuple(spawner.id for spawner in spawners), round(math.log1p(self.income) / math.log(INCOME_STEP)),
+               self.remaining // REMAINING_STEP)
+        plan = self.plans.get(key)
+        if plan is not None:
+            self.plans.move_to_end(key)
+            return plan
+        distances, nutrients = self._surroundings(spawners)
+        plan = solve([spawner.id for spawner in spawners], distances, nutrients, self.income, self.remaining)
+        self.solves += 1
+        log.debug("Production plan for %d spawners, income %d, %d ticks left: spends %s",
+                  len(spawners), self.income, self.remaining, plan.spend[::32].tolist())
+        self.plans[key] = plan
+        if len(self.plans) > self.cache_size:
+            self.plans.popitem(last=False)
+        return plan
+
+    def _surroundings(self, spawners: list[Spawner]) -> tuple[np.ndarray, np.ndarray]:
+        """Per spawner: ticks to the nearest tile we don't own, and nutrients per such tile around it."""
+        free = self.view.not_ours_mask.size - self._owned
+        if free == 0:
+            # Nothing left to take: no spore would get anywhere before the end
+            return np.full(len(spawners), float(self.remaining)), np.zeros(len(spawners))
+        missing = [spawner for spawner in spawners if spawner.id not in self._around]
+        if missing:
+            self._measure_around(missing)
+        distances, around, count = np.array([self._around[spawner.id][2:] for spawner in spawners]).T
+        overall = (self._total - self.income) / free
+        nutrients = np.where(count > 0, around / np.maximum(count, 1), overall)
+        # The spore starts on its spawner: the first step onto new ground is tick 1
+        return np.maximum(distances - 1, 0).astype(float), nutrients.astype(float)
+
+    def _measure_around(self, spawners: list[Spawner]):
+        view = self.view
+        not_ours = view.not_ours_mask
+        xs = np.array([spawner.position.x for spawner in spawners])
+        ys = np.array([spawner.position.y for spawner in spawners])
+        free_ys, free_xs = np.nonzero(not_ours)
+        distances = (np.abs(free_xs[None, :] - xs[:, None]) + np.abs(free_ys[None, :] - ys[:, None])).min(axis=1)
+        _, table = view.unowned_nutrients()
+        around = square_sums(table, xs, ys, ECONOMY_RADIUS)
+        count = square_sums(summed_area_table(not_ours), xs, ys, ECONOMY_RADIUS)
+        rows = zip(xs.tolist(), ys.tolist(), distances.tolist(), around.tolist(), count.tolist())
+        for spawner, row in zip(spawners, rows):
+            self._around[spawner.id] = row
+
+    def _forget_around(self, tiles: np.ndarray):
+        """Drops the surroundings that tiles changing owner can change: tiles in the square around the
+        spawner, or no farther than its nearest tile we don't own."""
+        if not len(tiles) or not self._around:
+            return
+        width = self.static.width
+        txs, tys = tiles % width, tiles // width
+        for spawner_id, (x, y, distance, _, _) in list(self._around.items()):
+            dx, dy = np.abs(txs - x), np.abs(tys - y)
+            if ((dx + dy <= distance) | (np.maximum(dx, dy) <= ECONOMY_RADIUS)).any():
+                del self._around[spawner_id]
+
+
+_economy = Economy()
+
+
+def economy(game_message: TeamGameState) -> Economy:
+    """Our economy, synced with the current tick."""
+    _economy.sync(game_message)
+    return _economy
@@ -0,0 +1,173 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import StaticMap, TeamCodes
+from world_state import WorldDiff, WorldState, world_state
+
+INITIAL_CAPACITY = 256
+
+
+class EntityTable:
+    """Entities by dense integer handle, with their fields in struct-of-arrays form.
+
+    Handles of entities that disappear are released (and reused), and every column is reset for them, so
+    per-entity state never outlives its entity.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.handles: dict[str, int] = {}
+        """id -> handle of every live entity."""
+        self.ids: list[Optional[str]] = [None] * capacity
+        self._free: list[int] = list(range(capacity - 1, -1, -1))
+        self._defaults: dict[str, int] = {}
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.x = self._column("x")
+        self.y = self._column("y")
+        self.team = self._column("team")
+        self.biomass = self._column("biomass")
+
+    def _column(self, name: str, default: int = 0) -> np.ndarray:
+        self._defaults[name] = default
+        return np.full(len(self.ids), default, dtype=np.int32)
+
+    def add_column(self, name: str, default: int = 0):
+        """Extra per-entity int32 state, reset to `default` when the entity goes away."""
+        setattr(self, name, self._column(name, default))
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self.handles
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def handle(self, entity_id: str) -> Optional[int]:
+        return self.handles.get(entity_id)
+
+    def handles_of(self, entity_ids: Iterable[str]) -> np.ndarray:
+        handles = self.handles
+        return np.fromiter((handles[entity_id] for entity_id in entity_ids), dtype=np.intp)
+
+    def sync(self, entities: list, teams: TeamCodes):
+        """Takes this tick's list of Spore/Spawner: new ids get a handle, missing ones are released."""
+        handles = [self.handles.get(entity.id) for entity in entities]
+        for i, handle in enumerate(handles):
+            if handle is None:
+                handles[i] = self._allocate(entities[i].id)
+        handles = np.array(handles, dtype=np.intp)
+
+        seen = np.zeros(len(self.ids), dtype=bool)
+        seen[handles] = True
+        for handle in np.flatnonzero(self.alive & ~seen).tolist():
+            self._release(handle)
+        self.alive[handles] = True
+        self._write(handles, entities, teams)
+
+    def apply(self, added: list, removed: list, changed: list, teams: TeamCodes):
+        """Only what changed since the last tick: entities `added`, `removed`, or `changed` (moved or resized)."""
+        for entity in removed:
+            self._release(self.handles[entity.id])
+        for entity in added:
+            self.alive[self._allocate(entity.id)] = True
+        entities = added + changed
+        if entities:
+            self._write(self.handles_of(entity.id for entity in entities), entities, teams)
+
+    def _write(self, handles: np.ndarray, entities: list, teams: TeamCodes):
+        self.x[handles] = [entity.position.x for entity in entities]
+        self.y[handles] = [entity.position.y for entity in entities]
+        self.team[handles] = [teams.code(entity.teamId) for entity in entities]
+        self.biomass[handles] = [getattr(entity, "biomass", 0) for entity in entities]
+
+    def _allocate(self, entity_id: str) -> int:
+        if not self._free:
+            self._grow()
+        handle = self._free.pop()
+        self.handles[entity_id] = handle
+        self.ids[handle] = entity_id
+        return handle
+
+    def _release(self, handle: int):
+        del self.handles[self.ids[handle]]
+        self.ids[handle] = None
+        self.alive[handle] = False
+        for name, default in self._defaults.items():
+            getattr(self, name)[handle] = default
+        self._free.append(handle)
+
+    def _grow(self):
+        capacity = len(self.ids)
+        self.ids.extend([None] * capacity)
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+        self.alive = np.concatenate([self.alive, np.zeros(capacity, dtype=bool)])
+        for name, default in self._defaults.items():
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.full(capacity, default, dtype=np.int32)]))
+
+
+class EntityStore:
+    """Spores and spawners of the game, plus the per-spore state the bot keeps between ticks (destinations)."""
+
+    def __init__(self):
+        self.static: Optional[StaticMap] = None
+        self.version = -1
+        """Version of the world state applied last."""
+        self.spores = EntityTable()
+        self.spores.add_column("dest_x", -1)
+        self.spores.add_column("dest_y", -1)
+        self.spawners = EntityTable()
+
+    def sync(self, world: WorldState):
+        if world.version == self.version:
+            return
+        static, diff = world.static, world.diff
+        if static is not self.static:
+            # New game: nothing carries over
+            self.__init__()
+            self.static = static
+        if diff.full_rebuild or diff.base != self.version:
+            self.spores.sync(world.game_message.world.spores, static.teams)
+            self.spawners.sync(world.game_message.world.spawners, static.teams)
+        else:
+            self._apply(diff, static.teams)
+        self.version = world.version
+
+    def _apply(self, diff: WorldDiff, teams: TeamCodes):
+        changed = [spore for spore, _ in diff.spores_moved]
+        changed.extend(spore for spore, _ in diff.spores_resized)
+        self.spores.apply(diff.spores_appeared, diff.spores_disappeared, changed, teams)
+        # Spawners never move nor change
+        self.spawners.apply(diff.spawners_new, diff.spawners_lost, [], teams)
+
+    def destination(self, spore_id: str) -> Optional[Position]:
+        handle = self.spores.handles.get(spore_id)
+        if handle is None or self.spores.dest_x[handle] < 0:
+            return None
+        return Position(int(self.spores.dest_x[handle]), int(self.spores.dest_y[handle]))
+
+    def set_destination(self, spore_id: str, position: Position):
+        handle = self.spores.handles[spore_id]
+        self.spores.dest_x[handle] = position.x
+        self.spores.dest_y[handle] = position.y
+
+    def destinations_of(self, spores: list[Spore]) -> tuple[np.ndarray, np.ndarray]:
+        """(xs, ys) of the destination of each spore, -1 for none."""
+        handles = self.spores.handles_of(spore.id for spore in spores)
+        return self.spores.dest_x[handles], self.spores.dest_y[handles]
+
+    def idle_mask(self, spores: list[Spore]) -> np.ndarray:
+        """For each spore: True if it has no destination or already stands on it."""
+        table = self.spores
+        handles = table.handles_of(spore.id for spore in spores)
+        dest_x, dest_y = table.dest_x[handles], table.dest_y[handles]
+        return (dest_x < 0) | ((dest_x == table.x[handles]) & (dest_y == table.y[handles]))
+
+
+_store = EntityStore()
+
+
+def entity_store(game_message: TeamGameState) -> EntityStore:
+    """The entity store, synced with the current tick."""
+    _store.sync(world_state(game_message))
+    return _store
@@ -0,0 +1,146 @@
+import itertools
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from map_analysis import MapAnalysis, analyse, summed_area_table
+
+
+class TeamCodes:
+    """Interns team id strings into small integer codes that stay stable for a whole game."""
+
+    def __init__(self, neutral_team_id: str = ""):
+        self._codes: dict[str, int] = {}
+        self._ids: list[str] = []
+        self.neutral = self.code(neutral_team_id)
+
+    def code(self, team_id: str) -> int:
+        code = self._codes.get(team_id)
+        if code is None:
+            code = len(self._ids)
+            self._codes[team_id] = code
+            self._ids.append(team_id)
+        return code
+
+    def team_id(self, code: int) -> str:
+        return self._ids[code]
+
+    def team_ids(self) -> list[str]:
+        """Every team id seen so far, by code."""
+        return list(self._ids)
+
+    def encode_grid(self, grid) -> np.ndarray:
+        """Turns an ownershipGrid (list of rows of team ids) into an int32 array of codes."""
+        if isinstance(grid, np.ndarray):
+            # Already encoded (compact decode mode)
+            return grid
+        height = len(grid)
+        width = len(grid[0]) if height else 0
+        try:
+            codes = self._lookup(grid, height * width)
+        except KeyError:
+            # New ids get their codes in sorted order
+            for team_id in sorted(set(itertools.chain.from_iterable(grid))):
+                self.code(team_id)
+            codes = self._lookup(grid, height * width)
+        return codes.reshape(height, width)
+
+    def _lookup(self, grid, size: int) -> np.ndarray:
+        # One dict lookup per tile, no sort of the whole grid: team ids are few and known after the first tick
+        return np.fromiter(map(self._codes.__getitem__, itertools.chain.from_iterable(grid)), np.int32, size)
+
+
+class StaticMap:
+    """Arrays derived from the GameMap. The map never changes during a game, so this is built once per game."""
+
+    def __init__(self, game_map: GameMap, neutral_team_id: str = ""):
+        self.width = game_map.width
+        self.height = game_map.height
+        self.nutrients = np.asarray(game_map.nutrientGrid, dtype=np.int32).reshape(self.height, self.width)
+        self.nutrient_mask = self.nutrients > 0
+        # Nutrient tiles in row-major order, same order as scanning nutrientGrid row by row
+        self.nutrient_ys, self.nutrient_xs = np.nonzero(self.nutrient_mask)
+        self.teams = TeamCodes(neutral_team_id)
+        self._analysis: Optional[MapAnalysis] = None
+
+    @property
+    def analysis(self) -> MapAnalysis:
+        """Sorted tiles, nutrient prefix sums and resource regions of the map (see map_analysis), loaded from the
+        disk cache or computed the first time a game asks for them."""
+        if self._analysis is None:
+            self._analysis = analyse(self.nutrients)
+        return self._analysis
+
+
+class GridView:
+    """Whole-array view of one tick of GameWorld, from the point of view of one team."""
+
+    def __init__(self, static: StaticMap, ownership: np.ndarray, my_code: int):
+        self.static = static
+        self.ownership = ownership
+        self.my_code = my_code
+        self.ours_mask = ownership == my_code
+        self.not_ours_mask = ~self.ours_mask
+        self._unowned: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_message(cls, game_message: TeamGameState, static: Optional[StaticMap] = None) -> "GridView":
+        static = static or static_map(game_message)
+        ownership = static.teams.encode_grid(game_message.world.ownershipGrid)
+        return cls(static, ownership, static.teams.code(game_message.yourTeamId))
+
+    def is_ours(self, x: int, y: int) -> bool:
+        return bool(self.ours_mask[y, x])
+
+    def income(self, team_id: Optional[str] = None) -> int:
+        """Nutrients generated per tick by the tiles owned by `team_id` (default: us)."""
+        mask = self.ours_mask if team_id is None else self.ownership == self.static.teams.code(team_id)
+        return int(self.static.nutrients[mask].sum())
+
+    def nutrient_targets_not_ours(self) -> tuple[np.ndarray, np.ndarray]:
+        """(xs, ys) of nutrient tiles we don't own, in row-major order."""
+        static = self.static
+        keep = self.not_ours_mask[static.nutrient_ys, static.nutrient_xs]
+        return static.nutrient_xs[keep], static.nutrient_ys[keep]
+
+    def unowned_nutrients(self) -> tuple[np.ndarray, np.ndarray]:
+        """Nutrients of the tiles we don't own (0 on ours), and their summed-area table."""
+        if self._unowned is None:
+            unowned = np.where(self.not_ours_mask, self.static.nutrients, 0)
+            self._unowned = (unowned, summed_area_table(unowned))
+        return self._unowned
+
+    def rank(self, origin: Position, xs: np.ndarray, ys: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """Indices ordered by score (desc), then Manhattan distance to origin, then input order."""
+        distances = np.abs(xs - origin.x) + np.abs(ys - origin.y)
+        return np.lexsort((np.arange(len(xs)), distances, -scores))
+
+
+_static: Optional[StaticMap] = None
+_static_tick = -1
+_last_view: Optional[tuple[TeamGameState, GridView]] = None
+
+
+def static_map(game_message: TeamGameState) -> StaticMap:
+    """Returns the StaticMap of the current game, building it on the first tick of a game."""
+    global _static, _static_tick
+    game_map = game_message.world.map
+    new_game = (
+        _static is None
+        or game_message.tick < _static_tick
+        or _static.width != game_map.width
+        or _static.height != game_map.height
+    )
+    if new_game:
+        _static = StaticMap(game_map, game_message.constants.neutralTeamId)
+    _static_tick = game_message.tick
+    return _static
+
+
+def grid_view(game_message: TeamGameState) -> GridView:
+    """GridView of the current tick, built once and shared by every caller during the tick."""
+    global _last_view
+    if _last_view is None or _last_view[0] is not game_message:
+        _last_view = (game_message, GridView.from_message(game_message))
+    return _last_view[1]
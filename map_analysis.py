@@ -0,0 +1,215 @@
+"""Analysis of the static map, done once per map and kept on disk across matches.
+
+The GameMap never changes during a game, and the same maps come back from one match to the next. The first
+time a game asks for it (see `StaticMap.analysis`), the analysis of its nutrient grid is either loaded from the
+cache or computed and saved. Arrays are stored as .npy files and loaded memory-mapped, so a warm start reads only
+what gets used.
+
+    MAP_CACHE_DIR=/tmp/map-analysis   where the analyses go (one folder per nutrient grid hash)
+
+Also home of the summed-area tables: sums of a grid over any rectangle in O(1), after one pass over the grid.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+MAP_CACHE_DIR = Path(os.environ.get("MAP_CACHE_DIR", Path(tempfile.gettempdir()) / "map-analysis"))
+# Bump when what is stored changes: older analyses are then ignored
+ANALYSIS_VERSION = 2
+# A tile with at least this many nutrients is part of a resource region
+CLUSTER_MIN_NUTRIENTS = int(os.environ.get("CLUSTER_MIN_NUTRIENTS", "5"))
+ARRAYS = ("by_value", "prefix", "cluster_labels", "cluster_nutrients", "cluster_sizes", "cluster_xs",
+          "cluster_ys")
+
+
+def summed_area_table(grid: np.ndarray) -> np.ndarray:
+    """(height + 1, width + 1) table with table[y, x] = sum of grid[:y, :x]."""
+    height, width = grid.shape
+    table = np.zeros((height + 1, width + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(grid, axis=0), axis=1, out=table[1:, 1:])
+    return table
+
+
+def rect_sums(table: np.ndarray, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> np.ndarray:
+    """Sum of the grid of a summed-area table over each rectangle [x0, x1] x [y0, y1] (inclusive, in the map)."""
+    return table[y1 + 1, x1 + 1] - table[y0, x1 + 1] - table[y1 + 1, x0] + table[y0, x0]
+
+
+def square_sums(table: np.ndarray, xs: np.ndarray, ys: np.ndarray, radius: int) -> np.ndarray:
+    """Sum of the grid of a summed-area table over the (2 * radius + 1) square around each (x, y), clipped."""
+    height, width = table.shape[0] - 1, table.shape[1] - 1
+    return rect_sums(table, np.maximum(xs - radius, 0), np.maximum(ys - radius, 0),
+                     np.minimum(xs + radius, width - 1), np.minimum(ys + radius, height - 1))
+
+
+class MapAnalysis:
+    """What can be known about a map before playing on it. Positions are (x, y), arrays indexed [y, x]."""
+
+    def __init__(self, width: int, height: int, arrays: dict[str, np.ndarray]):
+        self.width = width
+        self.height = height
+        self.by_value = arrays["by_value"]
+        """Flat indices (y * width + x) of the nutrient tiles, most nutrients first, row-major among equals."""
+        self.prefix = arrays["prefix"]
+        """(height + 1, width + 1) summed-area table of the nutrients: prefix[y, x] = sum of [0, y) x [0, x)."""
+        self.cluster_labels = arrays["cluster_labels"]
+        """Resource region of every tile, -1 outside of them. Regions are numbered richest first."""
+        self.cluster_nutrients = arrays["cluster_nutrients"]
+        """Total nutrients of each region."""
+        self.cluster_sizes = arrays["cluster_sizes"]
+        """Tiles in each region."""
+        self.cluster_xs = arrays["cluster_xs"]
+        self.cluster_ys = arrays["cluster_ys"]
+        """Tile of each region closest to its nutrient-weighted centre."""
+
+    @classmethod
+    def compute(cls, nutrients: np.ndarray) -> "MapAnalysis":
+        height, width = nutrients.shape
+        flat = nutrients.ravel()
+        by_value = np.argsort(-flat, kind="stable")
+        by_value = by_value[flat[by_value] > 0]
+        prefix = summed_area_table(nutrients)
+        return cls(width, height, {"by_value": by_value, "prefix": prefix, **_clusters(nutrients)})
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in ARRAYS}
+
+    def sorted_nutrients(self) -> tuple[np.ndarray, np.ndarray]:
+        """(xs, ys) of the nutrient tiles, most nutrients first."""
+        return self.by_value % self.width, self.by_value // self.width
+
+    def rect_sum(self, x0: int, y0: int, x1: int, y1: int) -> int:
+        """Nutrients in the rectangle [x0, x1] x [y0, y1] (inclusive, clipped to the map), in O(1)."""
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width - 1), min(y1, self.height - 1)
+        if x0 > x1 or y0 > y1:
+            return 0
+        prefix = self.prefix
+        return int(prefix[y1 + 1, x1 + 1] - prefix[y0, x1 + 1] - prefix[y1 + 1, x0] + prefix[y0, x0])
+
+    def square_sums(self, xs: np.ndarray, ys: np.ndarray, radius: int) -> np.ndarray:
+        """Nutrients in the (2 * radius + 1) square around each (x, y), clipped to the map."""
+        return square_sums(self.prefix, xs, ys, radius)
+
+
+def _components(rich: np.ndarray) -> np.ndarray:
+    """4-connected components of the True tiles: the smallest flat index of its component for each of them,
+    the number of tiles for the others. Hooks every edge's roots together, then jumps pointers, until every
+    edge joins equal labels (a few rounds, each a handful of whole-array operations)."""
+    height, width = rich.shape
+    size = height * width
+    tiles = np.arange(size).reshape(height, width)
+    across = rich[:, 1:] & rich[:, :-1]
+    down = rich[1:, :] & rich[:-1, :]
+    a = np.concatenate([tiles[:, 1:][across], tiles[1:, :][down]])
+    b = np.concatenate([tiles[:, :-1][across], tiles[:-1, :][down]])
+    labels = np.where(rich.ravel(), np.arange(size), size)
+    while len(a):
+        la, lb = labels[a], labels[b]
+        if np.array_equal(la, lb):
+            break
+        low = np.minimum(la, lb)
+        np.minimum.at(labels, la, low)
+        np.minimum.at(labels, lb, low)
+        while True:
+            jumped = labels[np.minimum(labels, size - 1)]
+            jumped[labels == size] = size
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def _clusters(nutrients: np.ndarray) -> dict[str, np.ndarray]:
+    """4-connected regions of tiles with at least CLUSTER_MIN_NUTRIENTS nutrients, richest first (then by their
+    first tile in row-major order)."""
+    height, width = nutrients.shape
+    flat = nutrients.ravel().astype(np.int64)
+    rich = nutrients >= CLUSTER_MIN_NUTRIENTS
+    roots = _components(rich)
+    inside = np.flatnonzero(rich.ravel())
+    # Regions by their first tile, then richest first
+    firsts, region = np.unique(roots[inside], return_inverse=True)
+    totals = np.bincount(region, weights=flat[inside], minlength=len(firsts)).astype(np.int64)
+    order = np.argsort(-totals, kind="stable")
+    relabel = np.empty(len(firsts), dtype=np.int32)
+    relabel[order] = np.arange(len(firsts), dtype=np.int32)
+    region = relabel[region]
+    labels = np.full(height * width, -1, dtype=np.int32)
+    labels[inside] = region
+
+    # Centre: the region's tile closest to its nutrient-weighted mean (row-major among equals)
+    xs, ys = inside % width, inside // width
+    weights = flat[inside]
+    totals = totals[order]
+    cx = np.bincount(region, weights=xs * weights, minlength=len(totals)) / np.maximum(totals, 1)
+    cy = np.bincount(region, weights=ys * weights, minlength=len(totals)) / np.maximum(totals, 1)
+    distances = np.abs(xs - cx[region]) + np.abs(ys - cy[region])
+    closest = np.lexsort((inside, distances, region))
+    first = np.ones(len(closest), dtype=bool)
+    first[1:] = region[closest][1:] != region[closest][:-1]
+    centres = inside[closest[first]]
+    return {
+        "cluster_labels": labels.reshape(height, width),
+        "cluster_nutrients": totals,
+        "cluster_sizes": np.bincount(region, minlength=len(totals)).astype(np.int64),
+        "cluster_xs": centres % width,
+        "cluster_ys": centres // width,
+    }
+
+
+def map_key(nutrients: np.ndarray) -> str:
+    """Cache key of a map: hash of its nutrient grid (and of the analysis settings)."""
+    digest = hashlib.sha1(np.ascontiguousarray(nutrients, dtype=np.int32).tobytes())
+    digest.update(f"{nutrients.shape}/{ANALYSIS_VERSION}/{CLUSTER_MIN_NUTRIENTS}".encode())
+    return digest.hexdigest()
+
+
+def load(nutrients: np.ndarray, cache_dir: Path = MAP_CACHE_DIR) -> Optional[MapAnalysis]:
+    """The cached analysis of this map, memory-mapped, or None if there is none yet."""
+    folder = cache_dir / map_key(nutrients)
+    try:
+        arrays = {name: np.load(folder / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+    except (OSError, ValueError):
+        return None
+    height, width = nutrients.shape
+    return MapAnalysis(width, height, arrays)
+
+
+def save(nutrients: np.ndarray, analysis: MapAnalysis, cache_dir: Path = MAP_CACHE_DIR):
+    """Writes the analysis next to the others; a complete folder appears at once or not at all."""
+    folder = cache_dir / map_key(nutrients)
+    if folder.exists():
+        return
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    partial = Path(tempfile.mkdtemp(prefix=".partial-", dir=cache_dir))
+    for name, array in analysis.arrays().items():
+        np.save(partial / f"{name}.npy", array)
+    try:
+        os.replace(partial, folder)
+    except OSError:
+        # Someone else (another bot process) saved the same map first
+        for path in partial.iterdir():
+            path.unlink()
+        partial.rmdir()
+
+
+def analyse(nutrients: np.ndarray, cache_dir: Path = MAP_CACHE_DIR) -> MapAnalysis:
+    """Analysis of a map, from the cache when this map was seen before."""
+    analysis = load(nutrients, cache_dir)
+    if analysis is not None:
+        log.info("Map analysis loaded from %s", cache_dir)
+        return analysis
+    analysis = MapAnalysis.compute(nutrients)
+    try:
+        save(nutrients, analysis, cache_dir)
+    except OSError:
+        log.warning("Could not save the map analysis to %s", cache_dir, exc_info=True)
+    return analysis
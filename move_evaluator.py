@@ -0,0 +1,202 @@
+"""Collision and combat checks of all our spore moves at once, on arrays.
+
+The next tile of every spore is predicted from its action: a SporeMoveToAction takes the first step of a
+shortest path, vertical first, like the server. Then, for all spores together:
+  - contact: the biomass of other teams standing on each tile now. A spore that arrives there (after leaving
+    1 biomass of trail on new ground) with no more biomass than that fights a fight it loses: the move is unsafe.
+  - threat: the biomass of other teams that can stand on each tile next tick. Enemy spores can reach their
+    tile and its 4 neighbours (a cross-shaped convolution of their biomass grid); neutral spores don't move.
+  - occupancy: a spore ending on the same tile as another of ours merges with it.
+Actions the server would refuse are dropped: moves and splits of spores under 2 biomass, moves off the map.
+Only unsafe moves are replaced, by the spore's next best option: another step toward its destination,
+staying, then any step, out of the threat when it can. Replacements don't land on a tile another of our
+spores ends on; a tile wanted by several goes to the biggest spore, in a few vectorized rounds.
+
+Merges of planned moves are counted, not undone: in self-play, breaking them up (and treating the reachable
+threat as certain) lost more games than the merges and fights it avoided.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import grid_view
+
+log = logging.getLogger(__name__)
+
+# Rounds of conflict resolution: each one settles every contested tile, the losers try their next option
+MOVE_ROUNDS = 3
+# Options of a spore, in the order of planner.DIRECTIONS (up, down, left, right), then staying
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+STAY = 4
+_DX = np.array([0, 0, -1, 1, 0], dtype=np.int64)
+_DY = np.array([-1, 1, 0, 0, 0], dtype=np.int64)
+# Preference of an option (lower is better); UNUSABLE ones are never picked
+PLANNED, CLOSER, STAYING, AWAY = 0, 1, 2, 3
+UNUSABLE = 99
+
+
+@dataclass(slots=True)
+class MoveCheck:
+    actions: list[Action]
+    """The actions, with the unsafe moves replaced (or dropped, for spores that now stay)."""
+    unsafe: int
+    """Planned moves onto a tile where the spore would be destroyed."""
+    merges: int
+    """Planned moves onto a tile another of our spores ends on."""
+    changed: int
+    refused: int = 0
+    """Actions the server would refuse, dropped: moves and splits of spores under 2 biomass, moves off the map."""
+
+
+def contact_map(game_message: TeamGameState) -> np.ndarray:
+    """Flat (height * width) biomass of other teams on each tile now."""
+    world = game_message.world
+    width = world.map.width
+    contact = np.zeros(world.map.height * width, dtype=np.int64)
+    others = [spore for spore in world.spores if spore.teamId != game_message.yourTeamId]
+    if others:
+        np.add.at(contact, np.array([spore.position.y * width + spore.position.x for spore in others]),
+                  np.array([spore.biomass for spore in others]))
+    return contact
+
+
+def threat_map(game_message: TeamGameState) -> np.ndarray:
+    """Flat (height * width) biomass of other teams that can be on each tile next tick."""
+    world = game_message.world
+    height, width = world.map.height, world.map.width
+    neutral_id = game_message.constants.neutralTeamId
+    others = [spore for spore in world.spores if spore.teamId != game_message.yourTeamId]
+    tiles = np.array([spore.position.y * width + spore.position.x for spore in others], dtype=np.int64)
+    biomass = np.array([spore.biomass for spore in others], dtype=np.int64)
+    moving = np.array([spore.teamId != neutral_id for spore in others], dtype=bool)
+
+    enemy = np.zeros(height * width, dtype=np.int64)
+    np.add.at(enemy, tiles[moving], biomass[moving])
+    enemy = enemy.reshape(height, width)
+    threat = enemy.copy()
+    threat[1:, :] += enemy[:-1, :]
+    threat[:-1, :] += enemy[1:, :]
+    threat[:, 1:] += enemy[:, :-1]
+    threat[:, :-1] += enemy[:, 1:]
+    threat = threat.ravel()
+    np.add.at(threat, tiles[~moving], biomass[~moving])
+    return threat
+
+
+def check_moves(game_message: TeamGameState, actions: list[Action]) -> MoveCheck:
+    """Our actions with unsafe moves replaced (see the module docstring)."""
+    my_team = game_message.world.teamInfos[game_message.yourTeamId]
+    spores = my_team.spores
+    if not spores:
+        return MoveCheck(actions, 0, 0, 0)
+    view = grid_view(game_message)
+    width, height = view.static.width, view.static.height
+    index = {spore.id: i for i, spore in enumerate(spores)}
+    count = len(spores)
+    xs = np.array([spore.position.x for spore in spores], dtype=np.int64)
+    ys = np.array([spore.position.y for spore in spores], dtype=np.int64)
+    biomass = np.array([spore.biomass for spore in spores], dtype=np.int64)
+
+    # The first action of each spore is the one the server plays
+    acting = np.full(count, -1, dtype=np.int64)
+    movable = np.zeros(count, dtype=bool)
+    target_xs, target_ys = xs.copy(), ys.copy()
+    landings = []
+    replaced: dict[int, Optional[Action]] = {}
+    for position, action in enumerate(actions):
+        i = index.get(getattr(action, "sporeId", None))
+        if i is None or acting[i] >= 0:
+            continue
+        x, y = int(xs[i]), int(ys[i])
+        if isinstance(action, SporeMoveToAction):
+            x, y = action.position.x, action.position.y
+        elif isinstance(action, (SporeMoveAction, SporeSplitAction)):
+            x, y = x + action.direction.x, y + action.direction.y
+        if not (0 <= x < width and 0 <= y < height) or (
+                biomass[i] < 2 and not isinstance(action, SporeCreateSpawnerAction)):
+            # Refused by the server, which then plays the spore's next action (if any)
+            replaced[position] = None
+            continue
+        acting[i] = position
+        if isinstance(action, (SporeMoveToAction, SporeMoveAction)):
+            target_xs[i], target_ys[i] = x, y
+            movable[i] = True
+        elif isinstance(action, SporeSplitAction):
+            # Left as it is: the moving part lands next to the part that stays
+            landings.append(y * width + x)
+    movable &= (target_xs != xs) | (target_ys != ys)
+
+    # Options of every spore: (count, 5) tiles, preferences, and whether the spore survives there
+    option_xs, option_ys = xs[:, None] + _DX, ys[:, None] + _DY
+    inside = (option_xs >= 0) & (option_xs < width) & (option_ys >= 0) & (option_ys < height)
+    tiles = np.clip(option_ys, 0, height - 1) * width + np.clip(option_xs, 0, width - 1)
+    distance = np.abs(target_xs - xs) + np.abs(target_ys - ys)
+    option_distance = np.abs(target_xs[:, None] - option_xs) + np.abs(target_ys[:, None] - option_ys)
+    closer = option_distance < distance[:, None]
+    # Like the server: the first step (in DIRECTIONS order) that gets closer
+    planned = np.where(movable, np.argmax(closer[:, :STAY], axis=1), STAY)
+    options = np.arange(STAY + 1)
+    preference = np.select([options == planned[:, None], options == STAY, closer], [PLANNED, STAYING, CLOSER], AWAY)
+    arrival = biomass[:, None] - (view.not_ours_mask.ravel()[tiles] & (options != STAY))
+    safe = arrival > contact_map(game_message)[tiles]
+    exposed = arrival <= threat_map(game_message)[tiles]
+    rows = np.arange(count)
+    replacing = movable & ~safe[rows, planned]
+
+    # Tiles our spores end on when they keep their action (the split parts' included)
+    kept_tiles = tiles[rows, np.where(replacing, STAY, planned)]
+    landing = np.bincount(np.concatenate((kept_tiles, np.array(landings, dtype=np.int64))),
+                          minlength=width * height)
+    planned_tiles = tiles[rows, planned]
+    merges = int((movable & (landing[planned_tiles] > 1)).sum())
+    if not replacing.any():
+        return MoveCheck(_replace(actions, replaced), 0, merges, 0, len(replaced))
+
+    # A replacement stays out of the threat when it can: it is worth one step of preference
+    cost = np.where(inside & safe, 2 * preference + exposed, UNUSABLE)
+    cost[rows, planned] = UNUSABLE
+    claimed = landing > 0
+    # The replaced spores leave their tile, unless they end up staying
+    claimed[tiles[replacing, STAY]] = landing[tiles[replacing, STAY]] > 1
+    choice = planned.copy()
+    open_ = np.flatnonzero(replacing & (cost.min(axis=1) < UNUSABLE))
+    for _ in range(MOVE_ROUNDS):
+        if len(open_) == 0:
+            break
+        choice[open_] = np.argmin(cost[open_], axis=1)
+        destinations = tiles[open_, choice[open_]]
+        # Biggest spore first on every tile; a tile already claimed has no winner
+        order = np.lexsort((open_, -biomass[open_], destinations))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = destinations[order][1:] != destinations[order][:-1]
+        wins = np.zeros(len(open_), dtype=bool)
+        wins[order] = first
+        wins &= ~claimed[destinations]
+        claimed[destinations[wins]] = True
+        losers = open_[~wins]
+        cost[losers, choice[losers]] = UNUSABLE
+        # Nothing left for a spore: it keeps its plan (and fights)
+        choice[losers] = planned[losers]
+        open_ = losers[cost[losers].min(axis=1) < UNUSABLE]
+
+    changed = np.flatnonzero(replacing & (choice != planned))
+    refused = len(replaced)
+    for i in changed.tolist():
+        option = int(choice[i])
+        replaced[int(acting[i])] = None if option == STAY else SporeMoveAction(
+            sporeId=spores[i].id, direction=Position(*DIRECTIONS[option]))
+    unsafe = int(replacing.sum())
+    log.debug("check_moves: %d unsafe, %d merging, %d changed out of %d moves, %d refused",
+              unsafe, merges, len(changed), int(movable.sum()), refused)
+    return MoveCheck(_replace(actions, replaced), unsafe, merges, len(changed), refused)
+
+
+def _replace(actions: list[Action], replaced: dict[int, Optional[Action]]) -> list[Action]:
+    """`actions` with the ones at the positions of `replaced` swapped for theirs (None drops them)."""
+    if not replaced:
+        return actions
+    checked = [replaced.get(position, action) for position, action in enumerate(actions)]
+    return [action for action in checked if action is not None]
@@ -0,0 +1,115 @@
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import StaticMap
+from pathfinding import DistanceFieldCache, neighbours_table, zero_one_bfs
+
+# Processes that build distance fields for target generation, 0 keeps it all in the bot's process
+# (default: one per core beyond the bot's own)
+TARGET_WORKERS = int(os.environ.get("TARGET_WORKERS", str(len(os.sched_getaffinity(0)) - 1)))
+# Below this many missing fields the pool saves nothing: the bot builds one field itself while it waits
+MIN_PARALLEL_FIELDS = 2
+
+
+# Worker side: segments and neighbour tables, attached or built once and reused between jobs
+_segments: dict[str, SharedMemory] = {}
+_neighbours: dict[tuple[int, int], list[tuple[int, ...]]] = {}
+
+
+def _attach(name: str) -> SharedMemory:
+    segment = _segments.get(name)
+    if segment is None:
+        segment = _segments[name] = SharedMemory(name=name)
+    return segment
+
+
+def _ready() -> bool:
+    return True
+
+
+def _job(costs_name: str, width: int, height: int, source: int) -> np.ndarray:
+    neighbours = _neighbours.get((width, height))
+    if neighbours is None:
+        _neighbours.clear()
+        neighbours = _neighbours[(width, height)] = neighbours_table(width, height)
+    costs = np.ndarray(width * height, dtype=np.int8, buffer=_attach(costs_name).buf).tolist()
+    return np.array(zero_one_bfs(costs, neighbours, (source,)), dtype=np.int32)
+
+
+class ParallelTargets:
+    """Builds the distance fields target generation needs over a process pool.
+
+    Ranking a spawner's targets is cheap once its distance field exists (see target_cache); the 0-1 BFS
+    that builds the field is what costs, and spawners are independent. The step costs are published in
+    shared memory every tick that needs the pool, so a job only carries its source tile. Costs are
+    double-buffered so a job left over from the previous tick never reads a half-written grid.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        # Start the workers now: spawning them costs more than a tick
+        for _ in range(workers):
+            self._pool.submit(_ready)
+        self._static: Optional[StaticMap] = None
+        self._costs: list[SharedMemory] = []
+        self._flip = 0
+
+    def _publish(self, fields: DistanceFieldCache) -> str:
+        static = fields.view.static
+        if static is not self._static:
+            self._release()
+            size = static.width * static.height
+            self._costs = [SharedMemory(create=True, size=max(1, size)) for _ in range(2)]
+            self._static = static
+        self._flip ^= 1
+        segment = self._costs[self._flip]
+        costs = np.ndarray(fields.view.not_ours_mask.size, dtype=np.int8, buffer=segment.buf)
+        costs[:] = fields.view.not_ours_mask.ravel()
+        return segment.name
+
+    def build_fields(self, fields: DistanceFieldCache, positions: list[Position],
+                     deadline: Optional[float] = None):
+        """Adds the fields from `positions` to the cache: the first one built here, the others by the pool.
+        Fields whose job isn't done by the deadline are left out (asking for them builds them in process)."""
+        costs_name = self._publish(fields)
+        width, height = fields.width, fields.height
+        futures = {self._pool.submit(_job, costs_name, width, height, position.y * width + position.x): position
+                   for position in positions[1:]}
+        fields.from_position(positions[0])
+        timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        done, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            fields.add(futures[future], future.result().tolist())
+
+    def _release(self):
+        for segment in self._costs:
+            segment.close()
+            segment.unlink()
+        self._costs = []
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+        self._release()
+
+
+_parallel: Optional[ParallelTargets] = None
+
+
+def parallel_targets() -> Optional[ParallelTargets]:
+    """The shared ParallelTargets, or None when TARGET_WORKERS is 0."""
+    global _parallel
+    if _parallel is None and TARGET_WORKERS > 0:
+        _parallel = ParallelTargets(TARGET_WORKERS)
+        atexit.register(_parallel.close)
+    return _parallel
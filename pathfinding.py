@@ -0,0 +1,282 @@
+import os
+from collections import deque
+from typing import Iterable, Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import GridView
+from world_state import WorldState, world_state
+
+INF = 10 ** 9
+# Above this share of the map to go over, repairing a field costs more than searching it again
+REPAIR_LIMIT = float(os.environ.get("REPAIR_LIMIT", "0.25"))
+
+
+def neighbours_table(width: int, height: int) -> list[tuple[int, ...]]:
+    """4-neighbours of every tile, by flat index (y * width + x)."""
+    table = []
+    for y in range(height):
+        for x in range(width):
+            v = y * width + x
+            around = []
+            if x > 0:
+                around.append(v - 1)
+            if x < width - 1:
+                around.append(v + 1)
+            if y > 0:
+                around.append(v - width)
+            if y < height - 1:
+                around.append(v + width)
+            table.append(tuple(around))
+    return table
+
+
+def step_costs(view: GridView) -> list[int]:
+    """Biomass paid to step onto each tile: 0 on our own trail, 1 anywhere else."""
+    return view.not_ours_mask.astype(np.int8).ravel().tolist()
+
+
+def zero_one_bfs(costs: list[int], neighbours: list[tuple[int, ...]], sources: Iterable[int]) -> list[int]:
+    """Multi-source 0-1 BFS. Returns the cheapest cost from any source to every tile."""
+    dist = [INF] * len(costs)
+    queue = deque()
+    for source in sources:
+        dist[source] = 0
+        queue.append(source)
+    while queue:
+        v = queue.popleft()
+        d = dist[v]
+        for w in neighbours[v]:
+            c = costs[w]
+            if d + c < dist[w]:
+                dist[w] = d + c
+                if c:
+                    queue.append(w)
+                else:
+                    queue.appendleft(w)
+    return dist
+
+
+class DistanceField:
+    """Exact step-cost distances from a set of source tiles to every tile of the map."""
+
+    def __init__(self, sources: tuple[int, ...], width: int, dist: list[int]):
+        self.sources = sources
+        self.width = width
+        self.dist = dist
+        self._array: Optional[np.ndarray] = None
+
+    def cost_to(self, position: Position) -> int:
+        return self.dist[position.y * self.width + position.x]
+
+    def costs_at(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        return self.as_array()[ys * self.width + xs]
+
+    def as_array(self) -> np.ndarray:
+        if self._array is None:
+            self._array = np.array(self.dist, dtype=np.int64)
+        return self._array
+
+    def repair(self, old_costs: list[int], costs: list[int], neighbours: list[tuple[int, ...]], changed: list[int]):
+        """Fixes the field after the step cost of the `changed` tiles flipped.
+
+        Tiles whose cheapest path may go through a tile that got more expensive are reset and recomputed
+        from their still-valid border; tiles that got cheaper are relaxed outwards. Work is proportional to
+        the part of the field that actually changes, up to REPAIR_LIMIT of the map: past that (a tile next to
+        a source changing hands moves most of the map) the field is searched again from scratch.
+        """
+        dist = self.dist
+        sources = set(self.sources)
+        increased = [v for v in changed if costs[v] > old_costs[v] and v not in sources]
+        decreased = [v for v in changed if costs[v] < old_costs[v] and v not in sources]
+        limit = REPAIR_LIMIT * len(dist)
+
+        # Every tile reachable through "tight" edges of the old field may have used an increased tile
+        affected = set()
+        stack = list(increased)
+        while stack:
+            u = stack.pop()
+            if u in affected:
+                continue
+            affected.add(u)
+            if len(affected) > limit:
+                self._rebuild(costs, neighbours)
+                return
+            for w in neighbours[u]:
+                if w not in affected and w not in sources and dist[w] == dist[u] + old_costs[w]:
+                    stack.append(w)
+        for u in affected:
+            dist[u] = INF
+
+        seeds = []
+        for v in affected.union(decreased):
+            best = dist[v]
+            for u in neighbours[v]:
+                if dist[u] + costs[v] < best:
+                    best = dist[u] + costs[v]
+            if best < dist[v]:
+                dist[v] = best
+                seeds.append((best, v))
+        # Steps cost 0 or 1: one list per distance, in increasing order, does what a heap would (like
+        # zero_one_bfs, with the seeds joining when their distance comes up)
+        seeds.sort()
+        relaxed = 0
+        current, following = [], []
+        i, d = 0, seeds[0][0] if seeds else 0
+        while True:
+            while i < len(seeds) and seeds[i][0] == d:
+                current.append(seeds[i][1])
+                i += 1
+            if not current:
+                if i == len(seeds):
+                    break
+                d = seeds[i][0]
+                continue
+            for v in current:
+                if dist[v] != d:
+                    continue
+                relaxed += 1
+                for w in neighbours[v]:
+                    c = costs[w]
+                    if d + c < dist[w]:
+                        dist[w] = d + c
+                        if c:
+                            following.append(w)
+                        else:
+                            current.append(w)
+            if relaxed > limit:
+                self._rebuild(costs, neighbours)
+                return
+            current, following = following, []
+            d += 1
+        self._array = None
+
+    def _rebuild(self, costs: list[int], neighbours: list[tuple[int, ...]]):
+        self.dist[:] = zero_one_bfs(costs, neighbours, self.sources)
+        self._array = None
+
+
+class DistanceFieldCache:
+    """Distance fields shared by the whole tick and repaired, not rebuilt, when ownership changes (the first time
+    they are asked for after it).
+
+    Fields nobody asked for during the previous tick are dropped so the cache doesn't grow with the game.
+    """
+
+    def __init__(self):
+        self.view: Optional[GridView] = None
+        self.version = -1
+        """Version of the world state applied last."""
+        self.width = 0
+        self.height = 0
+        self.neighbours: list[tuple[int, ...]] = []
+        self.costs: list[int] = []
+        self.fields: dict[tuple[int, ...], DistanceField] = {}
+        self._used: set[tuple[int, ...]] = set()
+        self._stale: dict[tuple[int, ...], tuple[list[int], list[int]]] = {}
+        """Fields not repaired yet since the last ownership change: (step costs before it, tiles it flipped)."""
+
+    def sync(self, world: WorldState):
+        if world.version == self.version:
+            return
+        view, diff = world.view, world.diff
+        static = view.static
+        if diff.full_rebuild or diff.base != self.version:
+            if self.view is None or self.view.static is not static:
+                self.width, self.height = static.width, static.height
+                self.neighbours = neighbours_table(static.width, static.height)
+            self.fields = {}
+            self._stale = {}
+            self.costs = step_costs(view)
+        else:
+            changed = diff.ours_changed().tolist()
+            self.fields = {key: field for key, field in self.fields.items() if key in self._used}
+            self._stale = {}
+            if changed:
+                costs = list(self.costs)
+                not_ours = view.not_ours_mask.ravel()
+                for tile in changed:
+                    costs[tile] = int(not_ours[tile])
+                # Repaired when asked for: a field whose sources moved on isn't, and is dropped next tick
+                self._stale = {key: (self.costs, changed) for key in self.fields}
+                self.costs = costs
+        self._used = set()
+        self.version = world.version
+        self.view = view
+
+    def from_sources(self, positions: Iterable[Position]) -> DistanceField:
+        """Multi-source field: cheapest cost from any of `positions` to every tile."""
+        key = tuple(sorted({p.y * self.width + p.x for p in positions}))
+        field = self.fields.get(key)
+        if field is None:
+            field = DistanceField(key, self.width, zero_one_bfs(self.costs, self.neighbours, key))
+            self.fields[key] = field
+        elif key in self._stale:
+            old_costs, changed = self._stale.pop(key)
+            field.repair(old_costs, self.costs, self.neighbours, changed)
+        self._used.add(key)
+        return field
+
+    def from_position(self, position: Position) -> DistanceField:
+        return self.from_sources((position,))
+
+    def from_team(self, game_message: TeamGameState, team_id: str) -> DistanceField:
+        """Field from every spawner and spore of a team at once.
+
+        A spore one of the team's spawners reaches for free (over the team's own tiles) changes none of its
+        distances, so only the other spores are sources: the field stays cached while spores walk around on our
+        ground. The spawners' own fields, which tell, are the ones target generation asks for anyway.
+        """
+        spawners = [spawner.position for spawner in game_message.world.spawners if spawner.teamId == team_id]
+        spores = [spore.position for spore in game_message.world.spores if spore.teamId == team_id]
+        reached = [self.from_position(position) for position in spawners]
+        spores = [position for position in spores if all(field.cost_to(position) > 0 for field in reached)]
+        return self.from_sources(spawners + spores)
+
+    def from_spores(self, game_message: TeamGameState, spores: list[Spore]) -> list[DistanceField]:
+        """Field of each spore without a search of its own: a spawner of its team that reaches it for free
+        has the very same distances, the way back being free too. A spore cut off from its spawners gets the
+        team field, exact where it is the team's cheapest source and a lower bound elsewhere."""
+        team_ids = {spore.teamId for spore in spores}
+        spawners: dict[str, list[DistanceField]] = {}
+        for spawner in game_message.world.spawners:
+            # Standing on its team's tile, as it always does in a game, so that the way back is free
+            tile = spawner.position.y * self.width + spawner.position.x
+            if spawner.teamId in team_ids and self.costs[tile] == 0:
+                spawners.setdefault(spawner.teamId, []).append(self.from_position(spawner.position))
+        teams: dict[str, DistanceField] = {}
+        fields = []
+        for spore in spores:
+            tile = spore.position.y * self.width + spore.position.x
+            field = next((field for field in spawners.get(spore.teamId, ()) if field.dist[tile] == 0), None)
+            if field is None:
+                field = teams.get(spore.teamId)
+                if field is None:
+                    field = teams[spore.teamId] = self.from_team(game_message, spore.teamId)
+            fields.append(field)
+        return fields
+
+    def missing(self, positions: Iterable[Position]) -> list[Position]:
+        """The positions (each once) whose single-source field isn't cached."""
+        keys = {}
+        for p in positions:
+            key = (p.y * self.width + p.x,)
+            if key not in self.fields:
+                keys.setdefault(key, p)
+        return list(keys.values())
+
+    def add(self, position: Position, dist: list[int]):
+        """Caches a field from `position` built elsewhere (see parallel_targets), for this tick's costs."""
+        key = (position.y * self.width + position.x,)
+        self.fields[key] = DistanceField(key, self.width, dist)
+        self._stale.pop(key, None)
+
+
+_cache = DistanceFieldCache()
+
+
+def distance_fields(game_message: TeamGameState) -> DistanceFieldCache:
+    """The distance field cache, synced with the current tick."""
+    _cache.sync(world_state(game_message))
+    return _cache
@@ -0,0 +1,431 @@
+"""Lookahead search over a fast forward model of the game.
+
+`ForwardModel` holds one team's view of the world in flat numpy arrays and plays whole ticks on them
+vectorized, with the rules of simulator.LocalGame. The grids are changed in place and every write is journaled,
+so `push()` / `pop()` take a tick (or several) back without ever copying the map.
+
+`BeamPlanner` starts from the action set the heuristics came up with and searches for a better one: each
+candidate changes the action of one unit (a spore moves, splits or stays instead, a spawner produces the next
+spore size up or down from the economy's plan, or nothing), is played for `PLANNER_HORIZON` ticks (after the
+first tick every spore keeps walking to its destination) and scored. The best candidates form the beam the next
+round of changes starts from. The number of simulated ticks (nodes) is capped by `PLANNER_NODES` and by what
+fits before the deadline, and the search stops early after a round of changes that improves on nothing.
+
+Other teams are assumed to stand still: the model is a one-sided lookahead, good for a few ticks.
+"""
+import bisect
+import os
+import random
+import time
+from typing import Optional
+
+import numpy as np
+
+from economy import SPORE_SIZES
+from game_message import *
+from grid_view import grid_view
+
+# Simulated ticks the search may spend on one game tick (0 turns the search off)
+PLANNER_NODES = int(os.environ.get("PLANNER_NODES", "300"))
+# Ticks every candidate is played for
+PLANNER_HORIZON = int(os.environ.get("PLANNER_HORIZON", "3"))
+# Candidates kept from one round of changes to the next
+PLANNER_BEAM = int(os.environ.get("PLANNER_BEAM", "4"))
+# Changes tried on each candidate of the beam per round
+PLANNER_BRANCHING = 12
+# Time kept free before the deadline for encoding and sending
+DEADLINE_MARGIN_S = 0.005
+# Score: a tile is worth this much biomass, income this many ticks of itself
+TILE_VALUE = 3
+INCOME_TICKS = 5
+
+# Direction codes: index into DIRECTIONS (same order as simulator.DIRECTIONS), STAY for no move
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+STAY = 4
+_DX = np.array([0, 0, -1, 1, 0], dtype=np.int64)
+_DY = np.array([-1, 1, 0, 0, 0], dtype=np.int64)
+NONE = -1
+
+
+class ForwardModel:
+    """One team's view of the game in flat arrays (tile index = y * width + x), played tick by tick.
+
+    Our spores are kept as arrays of tile, biomass and destination tile (-1 for none), replaced every tick.
+    Other teams' spores are folded into per-tile biomass and team grids.
+    """
+
+    def __init__(self, width: int, height: int, nutrients: np.ndarray, me: int, neutral: int):
+        self.width = width
+        self.height = height
+        self.nutrients = nutrients
+        self.me = me
+        self.neutral = neutral
+        size = width * height
+        self.owner = np.full(size, neutral, dtype=np.int32)
+        self.trail = np.zeros(size, dtype=np.int32)
+        self.trail_owner = np.full(size, neutral, dtype=np.int32)
+        self.enemy_biomass = np.zeros(size, dtype=np.int32)
+        self.enemy_team = np.full(size, NONE, dtype=np.int32)
+        self.spawner_team = np.full(size, NONE, dtype=np.int32)
+        self.spore_tiles = np.zeros(0, dtype=np.int64)
+        self.spore_biomass = np.zeros(0, dtype=np.int64)
+        self.spore_targets = np.zeros(0, dtype=np.int64)
+        self.spawner_tiles = np.zeros(0, dtype=np.int64)
+        self.stock = 0
+        """Our nutrients."""
+        self.income = 0
+        self.tiles = 0
+        self.ticks = 0
+        """Ticks played since the model was built (undone ones included)."""
+        self._journal: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._frames: list[tuple] = []
+
+    @classmethod
+    def from_message(cls, game_message: TeamGameState) -> "ForwardModel":
+        view = grid_view(game_message)
+        static = view.static
+        world = game_message.world
+        width = static.width
+        model = cls(width, static.height, static.nutrients.ravel(), view.my_code, static.teams.neutral)
+        model.owner[:] = view.ownership.ravel()
+
+        teams = static.teams
+        spores = world.spores
+        tiles = np.array([s.position.y * width + s.position.x for s in spores], dtype=np.int64)
+        biomass = np.array([s.biomass for s in spores], dtype=np.int64)
+        codes = np.array([teams.code(s.teamId) for s in spores], dtype=np.int32)
+        # The biomass grid counts the spores standing on a tile: what is left is trail
+        trail = np.asarray(world.biomassGrid, dtype=np.int32).ravel().copy()
+        np.subtract.at(trail, tiles, biomass.astype(np.int32))
+        np.maximum(trail, 0, out=trail)
+        model.trail[:] = trail
+        model.trail_owner[:] = np.where(trail > 0, model.owner, model.neutral)
+
+        theirs = codes != model.me
+        np.add.at(model.enemy_biomass, tiles[theirs], biomass[theirs].astype(np.int32))
+        model.enemy_team[tiles[theirs]] = codes[theirs]
+        for spawner in world.spawners:
+            model.spawner_team[spawner.position.y * width + spawner.position.x] = teams.code(spawner.teamId)
+
+        my_team = world.teamInfos[game_message.yourTeamId]
+        model.spore_tiles = np.array([s.position.y * width + s.position.x for s in my_team.spores], dtype=np.int64)
+        model.spore_biomass = np.array([s.biomass for s in my_team.spores], dtype=np.int64)
+        model.spore_targets = np.full(len(my_team.spores), NONE, dtype=np.int64)
+        model.spawner_tiles = np.array([s.position.y * width + s.position.x for s in my_team.spawners],
+                                       dtype=np.int64)
+        model.stock = my_team.nutrients
+        ours = model.owner == model.me
+        model.income = int(model.nutrients[ours].sum())
+        model.tiles = int(ours.sum())
+        return model
+
+    # --- undo --------------------------------------------------------------------------------------------
+
+    def push(self):
+        """Marks the current state; the next `pop()` comes back to it."""
+        self._frames.append((len(self._journal), self.spore_tiles, self.spore_biomass, self.spore_targets,
+                             self.stock, self.income, self.tiles))
+
+    def pop(self):
+        mark, self.spore_tiles, self.spore_biomass, self.spore_targets, self.stock, self.income, self.tiles = \
+            self._frames.pop()
+        journal = self._journal
+        while len(journal) > mark:
+            array, index, old = journal.pop()
+            array[index] = old
+
+    def _write(self, array: np.ndarray, index: np.ndarray, values):
+        self._journal.append((array, index, array[index]))
+        array[index] = values
+
+    # --- rules -------------------------------------------------------------------------------------------
+
+    def toward_targets(self) -> np.ndarray:
+        """Direction of the first step of each spore to its destination (like SporeMoveToAction)."""
+        tiles, targets = self.spore_tiles, self.spore_targets
+        x, y = tiles % self.width, tiles // self.width
+        tx, ty = targets % self.width, targets // self.width
+        has = targets >= 0
+        return np.select([has & (ty < y), has & (ty > y), has & (tx < x), has & (tx > x)], [0, 1, 2, 3], STAY)
+
+    def tick(self, directions: np.ndarray, splits: Optional[np.ndarray] = None,
+             produce: Optional[np.ndarray] = None):
+        """Plays one tick. Per spore: direction code and biomass of the moving part of a split (0 for none);
+        per spawner: biomass to produce (0 for none)."""
+        width = self.width
+        tiles, biomass, targets = self.spore_tiles, self.spore_biomass, self.spore_targets
+        x, y = tiles % width, tiles // width
+        nx, ny = x + _DX[directions], y + _DY[directions]
+        can_move = (biomass >= 2) & (directions != STAY) & (nx >= 0) & (nx < width) & (ny >= 0) & (ny < self.height)
+        directions = np.where(can_move, directions, STAY)
+
+        stay_tiles, stay_biomass = [], []
+        if splits is not None:
+            split = can_move & (splits >= 1) & (splits < biomass)
+            if split.any():
+                stay_tiles.append(tiles[split])
+                stay_biomass.append(biomass[split] - splits[split])
+                biomass = np.where(split, splits, biomass)
+        if produce is not None and len(produce):
+            produce = produce * (np.cumsum(produce) <= self.stock)
+            made = produce > 0
+            if made.any():
+                self.stock -= int(produce.sum())
+                stay_tiles.append(self.spawner_tiles[made])
+                stay_biomass.append(produce[made])
+
+        # Moves: new ground costs 1 biomass, left behind as trail on the tile the spore comes from
+        moving = directions != STAY
+        destinations = tiles + _DX[directions] + _DY[directions] * width
+        free = (self.trail[destinations] >= 1) & (self.trail_owner[destinations] == self.me)
+        pay = moving & ~free
+        if pay.any():
+            left, count = np.unique(tiles[pay], return_counts=True)
+            kept = np.where(self.trail_owner[left] == self.me, self.trail[left], 0)
+            self._write(self.trail, left, kept + count)
+            self._write(self.trail_owner, left, self.me)
+        biomass = biomass - pay
+        affected = [tiles]
+        tiles = np.where(moving, destinations, tiles)
+
+        if stay_tiles:
+            tiles = np.concatenate([tiles] + stay_tiles)
+            biomass = np.concatenate([biomass] + stay_biomass)
+            targets = np.concatenate([targets, np.full(len(tiles) - len(targets), NONE, dtype=np.int64)])
+        alive = biomass > 0
+        tiles, biomass, targets = tiles[alive], biomass[alive], targets[alive]
+
+        # Friendly spores on one tile merge; the biggest one's destination is kept
+        merged, group = np.unique(tiles, return_inverse=True)
+        total = np.bincount(group, weights=biomass, minlength=len(merged)).astype(np.int64)
+        order = np.lexsort((-biomass, group))
+        firsts = order[np.r_[0, np.flatnonzero(np.diff(group[order])) + 1]] if len(order) else order
+        targets = targets[firsts]
+
+        # Fights with whatever else stands on the tile: the bigger side survives with the difference
+        enemy = self.enemy_biomass[merged]
+        fight = enemy > 0
+        if fight.any():
+            at = merged[fight]
+            self._write(self.enemy_biomass, at, np.maximum(enemy[fight] - total[fight], 0))
+            total = total - enemy
+        alive = total > 0
+        merged, total, targets = merged[alive], total[alive], targets[alive]
+
+        # Enemy spawners under one of our spores are destroyed; standing on enemy trail wipes it
+        spawner = self.spawner_team[merged]
+        lost = (spawner != NONE) & (spawner != self.me)
+        if lost.any():
+            self._write(self.spawner_team, merged[lost], NONE)
+        wiped = (self.trail[merged] > 0) & (self.trail_owner[merged] != self.me)
+        if wiped.any():
+            self._write(self.trail, merged[wiped], 0)
+
+        # Ownership only changes where spores were, are, or fought
+        affected.append(merged)
+        if fight.any():
+            affected.append(at)
+        affected = np.unique(np.concatenate(affected))
+        ours = np.zeros(len(affected), dtype=bool)
+        ours[np.searchsorted(affected, merged)] = True
+        enemy_left = self.enemy_biomass[affected] > 0
+        spawner = self.spawner_team[affected]
+        owners = np.where(self.trail[affected] >= 1, self.trail_owner[affected], self.neutral)
+        owners = np.where(spawner != NONE, spawner, owners)
+        owners = np.where(enemy_left, self.enemy_team[affected], owners)
+        owners = np.where(ours, self.me, owners)
+        change = (owners == self.me).astype(np.int64) - (self.owner[affected] == self.me)
+        self.income += int(self.nutrients[affected] @ change)
+        self.tiles += int(change.sum())
+        self._write(self.owner, affected, owners)
+
+        self.stock += self.income
+        self.spore_tiles, self.spore_biomass, self.spore_targets = merged, total, targets
+        self.ticks += 1
+
+    def score(self) -> float:
+        return (TILE_VALUE * self.tiles + INCOME_TICKS * self.income + self.stock
+                + int(self.spore_biomass.sum()))
+
+
+class _Plan:
+    """The heuristics' action set as per-unit arrays the model can play, and back to actions."""
+
+    def __init__(self, model: ForwardModel, game_message: TeamGameState, actions: list[Action]):
+        my_team = game_message.world.teamInfos[game_message.yourTeamId]
+        width = model.width
+        self.spores = my_team.spores
+        self.spawners = my_team.spawners
+        spore_index = {spore.id: i for i, spore in enumerate(self.spores)}
+        spawner_index = {spawner.id: j for j, spawner in enumerate(self.spawners)}
+        self.directions = np.full(len(self.spores), STAY, dtype=np.int64)
+        self.splits = np.zeros(len(self.spores), dtype=np.int64)
+        self.produce = np.zeros(len(self.spawners), dtype=np.int64)
+        targets = np.full(len(self.spores), NONE, dtype=np.int64)
+        frozen = set()
+        self.actions = actions
+        self.unit_of_action: list[Optional[int]] = []
+        for action in actions:
+            unit = None
+            if isinstance(action, SpawnerProduceSporeAction):
+                j = spawner_index.get(action.spawnerId)
+                if j is not None:
+                    unit = len(self.spores) + j
+                    self.produce[j] = action.biomass
+            else:
+                unit = spore_index.get(action.sporeId)
+                if unit is not None:
+                    if isinstance(action, SporeMoveToAction):
+                        x, y = action.position.x, action.position.y
+                        if 0 <= x < width and 0 <= y < model.height:
+                            # (targets outside the map are refused by the server: the spore stays)
+                            targets[unit] = y * width + x
+                    elif isinstance(action, SporeMoveAction):
+                        self.directions[unit] = _direction_code(action.direction)
+                    elif isinstance(action, SporeSplitAction):
+                        self.directions[unit] = _direction_code(action.direction)
+                        self.splits[unit] = action.biomassForMovingSpore
+                    else:
+                        # Spawner creation: left alone (the model sees the spore stay where it is)
+                        frozen.add(unit)
+            self.unit_of_action.append(unit)
+        model.spore_targets = targets
+        moves_to = targets >= 0
+        self.directions[moves_to] = model.toward_targets()[moves_to]
+        biomass = np.array([spore.biomass for spore in self.spores], dtype=np.int64)
+        self.movable = [i for i in np.flatnonzero(biomass >= 2).tolist() if i not in frozen]
+        self.biomass = biomass
+
+    def options(self, unit: int) -> list[tuple[int, int]]:
+        """What a unit can do instead: (direction, split) for a spore, (biomass, 0) for a spawner."""
+        if unit >= len(self.spores):
+            return [(biomass, 0) for biomass in _produce_options(int(self.produce[unit - len(self.spores)]))]
+        half = int(self.biomass[unit]) // 2
+        return [(STAY, 0)] + [(d, 0) for d in range(4)] + [(d, half) for d in range(4) if half >= 1]
+
+    def arrays(self, changes: dict[int, tuple[int, int]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        directions, splits, produce = self.directions, self.splits, self.produce
+        if changes:
+            directions, splits, produce = directions.copy(), splits.copy(), produce.copy()
+            count = len(self.spores)
+            for unit, (value, split) in changes.items():
+                if unit >= count:
+                    produce[unit - count] = value
+                else:
+                    directions[unit], splits[unit] = value, split
+        return directions, splits, produce
+
+    def to_actions(self, changes: dict[int, tuple[int, int]]) -> list[Action]:
+        """The original actions, with the changed units' actions replaced."""
+        actions = [action for action, unit in zip(self.actions, self.unit_of_action) if unit not in changes]
+        count = len(self.spores)
+        for unit, (value, split) in sorted(changes.items()):
+            if unit >= count:
+                if value > 0:
+                    actions.append(SpawnerProduceSporeAction(spawnerId=self.spawners[unit - count].id, biomass=value))
+                continue
+            spore_id = self.spores[unit].id
+            if value == STAY:
+                continue
+            direction = Position(*DIRECTIONS[value])
+            if split:
+                actions.append(SporeSplitAction(sporeId=spore_id, biomassForMovingSpore=split, direction=direction))
+            else:
+                actions.append(SporeMoveAction(sporeId=spore_id, direction=direction))
+        return actions
+
+
+def _produce_options(planned: int) -> list[int]:
+    """What a spawner planned to produce `planned` (see economy) can produce instead: nothing, or the spore
+    sizes on either side of the planned one."""
+    k = bisect.bisect_left(SPORE_SIZES, planned)
+    return [biomass for biomass in (0, *SPORE_SIZES[max(k - 1, 0):k + 2]) if biomass != planned]
+
+
+def _direction_code(direction: Position) -> int:
+    try:
+        return DIRECTIONS.index((direction.x, direction.y))
+    except ValueError:
+        return STAY
+
+
+class BeamPlanner:
+    """Improves an action set with a beam search over single-unit changes, within a node budget."""
+
+    def __init__(self, nodes: int = PLANNER_NODES, horizon: int = PLANNER_HORIZON, beam: int = PLANNER_BEAM,
+                 branching: int = PLANNER_BRANCHING, seed: int = 0):
+        self.nodes = nodes
+        self.horizon = max(1, horizon)
+        self.beam = beam
+        self.branching = branching
+        self.rng = random.Random(seed)
+        self.seconds_per_node = 1e-4
+        """Running estimate of the time one simulated tick takes, to fit the budget to the deadline."""
+        self.last_nodes = 0
+        self.last_gain = 0.0
+
+    def budget(self, deadline: Optional[float]) -> int:
+        """Simulated ticks that fit before the deadline, at most `nodes`."""
+        if deadline is None:
+            return self.nodes
+        left = deadline - time.perf_counter() - DEADLINE_MARGIN_S
+        return max(0, min(self.nodes, int(left / self.seconds_per_node)))
+
+    def refine(self, game_message: TeamGameState, actions: list[Action],
+               deadline: Optional[float] = None) -> list[Action]:
+        """A better action set than `actions` if the search finds one in time, else `actions` itself."""
+        self.last_nodes, self.last_gain = 0, 0.0
+        budget = self.budget(deadline)
+        if budget < 2 * self.horizon or not game_message.world.teamInfos[game_message.yourTeamId].spores:
+            return actions
+        start = time.perf_counter()
+        model = ForwardModel.from_message(game_message)
+        plan = _Plan(model, game_message, actions)
+        units = plan.movable + list(range(len(plan.spores), len(plan.spores) + len(plan.spawners)))
+        if not units:
+            return actions
+
+        root = self._evaluate(model, plan, {})
+        beam = [(root, {})]
+        seen = {()}
+        stop = deadline - DEADLINE_MARGIN_S if deadline is not None else None
+        while model.ticks + self.horizon <= budget:
+            children = []
+            for _, changes in beam:
+                for _ in range(self.branching):
+                    if model.ticks + self.horizon > budget or (stop is not None and time.perf_counter() >= stop):
+                        break
+                    unit = self.rng.choice(units)
+                    option = self.rng.choice(plan.options(unit))
+                    child = {**changes, unit: option}
+                    key = tuple(sorted(child.items()))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    children.append((self._evaluate(model, plan, child), child))
+            if not children:
+                break
+            best = beam[0][0]
+            beam = sorted(beam + children, key=lambda item: -item[0])[:self.beam]
+            if beam[0][0] <= best:
+                # A whole round found nothing better: the time is worth more to the rest of the tick
+                break
+
+        elapsed = time.perf_counter() - start
+        if model.ticks:
+            self.seconds_per_node = 0.8 * self.seconds_per_node + 0.2 * elapsed / model.ticks
+        self.last_nodes = model.ticks
+        best, changes = beam[0]
+        self.last_gain = best - root
+        if not changes or best <= root:
+            return actions
+        return plan.to_actions(changes)
+
+    def _evaluate(self, model: ForwardModel, plan: _Plan, changes: dict) -> float:
+        model.push()
+        model.tick(*plan.arrays(changes))
+        for _ in range(self.horizon - 1):
+            model.tick(model.toward_targets())
+        score = model.score()
+        model.pop()
+        return score
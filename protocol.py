@@ -0,0 +1,39 @@
+import os
+
+import msgspec
+
+from compact_message import CompactDecoder
+from game_message import *
+
+# "compact" decodes the grids straight into arrays (see compact_message.py), "default" into lists of lists
+DECODE_MODE = os.environ.get("DECODE_MODE", "compact")
+
+
+def make_decoder(mode: str = DECODE_MODE):
+    """Function turning a raw game message into a TeamGameState (or CompactTeamGameState)."""
+    if mode == "compact":
+        return CompactDecoder().decode
+    return msgspec.json.Decoder(TeamGameState).decode
+
+
+class Command(msgspec.Struct, kw_only=True):
+    """The COMMAND message. Fields are encoded in this order, like the dict it replaces."""
+
+    type: str = "COMMAND"
+    tick: int
+    actions: list[Action]
+
+
+_encoder = msgspec.json.Encoder()
+_buffer = bytearray()
+
+
+def encode_command(tick: int, actions: list[Action]) -> bytes:
+    """JSON of the COMMAND for these actions.
+
+    msgspec encodes the action dataclasses (and their Positions) directly, in field order, so the bytes are
+    the same as encoding `dataclasses.asdict(action)` without building those dicts. The output buffer is
+    reused from one tick to the next.
+    """
+    _encoder.encode_into(Command(tick=tick, actions=actions), _buffer)
+    return bytes(_buffer)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+"""Match recordings (every frame received and COMMAND sent) and a replay engine to play them again offline.
+
+Recording is switched on with environment variables (a no-op otherwise):
+    REPLAY_DIR=replays       where to write one recording per match (match-<time>-<pid>.replay)
+    REPLAY_SEED=1234         seed of the bot's RNG for the match (random by default, recorded either way)
+    REPLAY_QUEUE_SIZE=256    records waiting for the writer before new ones are dropped
+
+A recording is one zlib stream of length-prefixed records: kind (1 byte), seconds since the start of the
+match (float64), length of the data (uint32), then the data. The stream is flushed after every record, so
+a recording cut short (crash, kill) reads fine up to its last whole record. Compression and writes run on a
+writer thread: recording a frame costs the game loop a queue put.
+
+Replaying feeds the recorded frames to a new Bot, seeded like the recorded one, as fast as it can plan them.
+Module-level state (entity store, caches) is per process, so every replay runs in a fresh process.
+
+    python replay.py match.replay [--profile 120,300-305] [--no-deadline] [--top 10]
+"""
+import argparse
+import cProfile
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import msgspec
+
+from telemetry import parse_ticks
+
+log = logging.getLogger(__name__)
+
+# Bump when the record layout changes
+REPLAY_VERSION = 1
+RECORD = struct.Struct("<cdI")
+HEADER = b"H"
+"""First record: JSON with the format version and the seed of the bot's RNG."""
+FRAME = b"F"
+"""A frame as received from the server."""
+COMMAND = b"C"
+"""A COMMAND as sent to the server."""
+# Fast compression: frames are mostly the same grids from one tick to the next
+COMPRESSION_LEVEL = 1
+READ_CHUNK = 1024 * 1024
+
+
+@dataclass(slots=True)
+class Record:
+    kind: bytes
+    time: float
+    """Seconds since the start of the match."""
+    data: bytes
+
+
+class Recorder:
+    """Streams the frames and COMMANDs of a match to a compressed, append-only recording."""
+
+    def __init__(self, path: Optional[str], seed: int, queue_size: int = 256):
+        self.path = Path(path) if path else None
+        self.seed = seed
+        self.dropped = 0
+        """Records lost because the writer fell behind."""
+        self._start = time.perf_counter()
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue = queue.Queue(queue_size)
+        self._writer = threading.Thread(target=self._write, name="replay-writer", daemon=True)
+        self._writer.start()
+        self._put(HEADER, json.dumps({"version": REPLAY_VERSION, "seed": seed}).encode(), 0.0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def frame(self, message, arrival: float):
+        """A frame received at `arrival` (perf_counter)."""
+        self._put(FRAME, message, arrival - self._start)
+
+    def command(self, payload: bytes):
+        """A COMMAND, recorded when it has been sent."""
+        self._put(COMMAND, payload, time.perf_counter() - self._start)
+
+    def close(self):
+        """Writes what is still queued and ends the stream."""
+        if self._writer is None:
+            return
+        # Waits for room: the writer is draining the queue and must see the end
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        if self.dropped:
+            log.warning("%d replay records dropped", self.dropped)
+        log.info("Match recorded to %s", self.path)
+
+    def _put(self, kind: bytes, data, at: float):
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait((kind, at, data))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        with open(self.path, "ab") as file:
+            while (record := self._queue.get()) is not None:
+                kind, at, data = record
+                if isinstance(data, str):
+                    data = data.encode()
+                file.write(compressor.compress(RECORD.pack(kind, at, len(data))))
+                file.write(compressor.compress(data))
+                file.write(compressor.flush(zlib.Z_SYNC_FLUSH))
+                file.flush()
+            file.write(compressor.flush())
+
+
+def read_records(path) -> Iterator[Record]:
+    """Records of a recording in order. A record cut short at the end of the file is left out."""
+    decompressor = zlib.decompressobj()
+    buffer = bytearray()
+    with open(path, "rb") as file:
+        while chunk := file.read(READ_CHUNK):
+            buffer += decompressor.decompress(chunk)
+            offset = 0
+            while len(buffer) - offset >= RECORD.size:
+                kind, at, length = RECORD.unpack_from(buffer, offset)
+                end = offset + RECORD.size + length
+                if end > len(buffer):
+                    break
+                yield Record(kind, at, bytes(buffer[offset + RECORD.size:end]))
+                offset = end
+            del buffer[:offset]
+
+
+_recorder: Optional[Recorder] = None
+
+
+def recorder() -> Recorder:
+    """The process-wide Recorder, configured from the environment on first use."""
+    global _recorder
+    if _recorder is None:
+        seed = int(os.environ.get("REPLAY_SEED") or random.randrange(2 ** 32))
+        folder = os.environ.get("REPLAY_DIR")
+        path = Path(folder) / f"match-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.replay" if folder else None
+        _recorder = Recorder(path, seed, int(os.environ.get("REPLAY_QUEUE_SIZE", "256")))
+    return _recorder
+
+
+# --- replay ---------------------------------------------------------------------------------------------
+
+
+class _Tick(msgspec.Struct):
+    """Just the tick of a frame or COMMAND (msgspec skips the rest without building it)."""
+
+    tick: int
+
+
+@dataclass(slots=True)
+class ReplayedTick:
+    tick: int
+    seconds: float
+    """Time the bot took for the tick in the replay (decode to encoded COMMAND)."""
+    recorded: float
+    """Time from frame to sent COMMAND in the recording."""
+    same: bool
+    """The replay sent the same COMMAND as the recording."""
+
+
+def read_header(records: Iterator[Record]) -> dict:
+    """Header of a recording, read from its first record."""
+    first = next(records, None)
+    header = json.loads(first.data) if first is not None and first.kind == HEADER else {}
+    if header.get("version") != REPLAY_VERSION:
+        raise ValueError(f"recording version {header.get('version')}, expected {REPLAY_VERSION}")
+    return header
+
+
+def answered_frames(records: Iterator[Record]) -> Iterator[tuple[Record, Record]]:
+    """(frame, COMMAND) pairs: the frames the bot answered, in order, streamed.
+
+    Frames without a COMMAND (dropped by an offloaded game loop, or the last one of the match) are left out,
+    so the replayed bot sees the same frames as the recorded one.
+    """
+    pending: dict[int, Record] = {}
+    for record in records:
+        if record.kind == FRAME:
+            pending[msgspec.json.decode(record.data, type=_Tick).tick] = record
+        elif record.kind == COMMAND:
+            tick = msgspec.json.decode(record.data, type=_Tick).tick
+            frame = pending.pop(tick, None)
+            # Older frames were never answered
+            pending = {other: late for other, late in pending.items() if other > tick}
+            if frame is not None:
+                yield frame, record
+
+
+def replay(path, seed: Optional[int] = None, deadline: bool = True,
+           profile_ticks: frozenset[int] = frozenset()) -> list[ReplayedTick]:
+    """Plays a recording again with a new Bot, seeded like the recorded one (or with `seed`).
+
+    With `deadline`, ticks are cut at the budget like in a match; without, every tick runs its full plan
+    (the bot is given no deadline at all, so the search uses its whole node budget).
+    Chosen ticks run under cProfile, saved next to the recording as <recording>.tick<N>.prof.
+    Call it in a fresh process (see `replay_isolated`): the bot's module-level state is per process.
+    """
+    from bot import Bot
+    from protocol import encode_command, make_decoder
+    from scheduler import TickScheduler
+
+    records = read_records(path)
+    header = read_header(records)
+    random.seed(header["seed"] if seed is None else seed)
+    bot = Bot()
+    decode = make_decoder()
+    scheduler = TickScheduler()
+    ticks = []
+    for frame, command in answered_frames(records):
+        arrival = time.perf_counter()
+        game_message = decode(frame.data)
+        profiler = None
+        if game_message.tick in profile_ticks:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        if deadline:
+            actions = scheduler.plan(bot, game_message, arrival)
+        else:
+            *_, actions = bot.plan_anytime(game_message, None)
+        payload = encode_command(game_message.tick, actions)
+        seconds = time.perf_counter() - arrival
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(f"{path}.tick{game_message.tick}.prof")
+        if deadline:
+            # Runs the garbage collection the scheduler held back during the tick, like after a real send
+            scheduler.sent(arrival)
+        ticks.append(ReplayedTick(game_message.tick, seconds, command.time - frame.time, payload == command.data))
+    return ticks
+
+
+def replay_isolated(path, **options) -> list[ReplayedTick]:
+    """`replay` in a new process, so nothing is left over from earlier replays (or from the caller)."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(replay, str(path), **options).result()
+
+
+def report(ticks: list[ReplayedTick], top: int = 10):
+    if not ticks:
+        print("nothing to replay")
+        return
+    seconds = [tick.seconds for tick in ticks]
+    same = sum(tick.same for tick in ticks)
+    print(f"{len(ticks)} ticks: p50 {statistics.median(seconds) * 1e3:.1f} ms, max {max(seconds) * 1e3:.1f} ms, "
+          f"total {sum(seconds):.2f} s; same COMMAND as recorded on {same}/{len(ticks)} ticks")
+    print(f"\nslowest {top} ticks:")
+    print(f"{'tick':>6} {'replay ms':>10} {'recorded ms':>12} {'same':>5}")
+    for tick in sorted(ticks, key=lambda t: t.seconds, reverse=True)[:top]:
+        print(f"{tick.tick:6d} {tick.seconds * 1e3:10.1f} {tick.recorded * 1e3:12.1f} {'yes' if tick.same else 'no':>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", nargs="+")
+    parser.add_argument("--seed", type=int, help="seed of the bot's RNG (default: the recorded one)")
+    parser.add_argument("--no-deadline", action="store_true", help="run every tick's full plan")
+    parser.add_argument("--profile", default="", help="ticks to run under cProfile, e.g. 120,300-305")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    for path in args.recording:
+        print(path)
+        report(replay_isolated(path, seed=args.seed, deadline=not args.no_deadline,
+                               profile_ticks=frozenset(parse_ticks(args.profile))), args.top)
+
+
+if __name__ == "__main__":
+    main()
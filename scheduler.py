@@ -0,0 +1,87 @@
+import gc
+import logging
+import os
+import time
+
+from game_message import *
+
+log = logging.getLogger(__name__)
+
+# We get 100 ms per tick; keep some room for encoding, sending and the network
+TICK_BUDGET_S = float(os.environ.get("TICK_BUDGET_MS", "80")) / 1000
+# "idle" keeps the garbage collector out of the ticks and runs it once the COMMAND is sent, "auto" lets it
+# run whenever Python wants to, in the middle of planning too
+GC_MODE = os.environ.get("GC_MODE", "idle")
+
+
+class TickScheduler:
+    """Runs the bot's anytime planning against a per-tick deadline and keeps count of slow ticks.
+
+    `Bot.plan_anytime` yields a cheap baseline right away and better action sets after that; whatever is
+    best when the deadline hits is what gets sent.
+    """
+
+    def __init__(self, budget: float = TICK_BUDGET_S, gc_mode: str = GC_MODE):
+        self.budget = budget
+        self.gc_idle = gc_mode == "idle"
+        self.ticks = 0
+        self.cut_short = 0
+        """Ticks where planning was stopped at the deadline before its last refinement."""
+        self.late = 0
+        """Ticks where the COMMAND was sent after the deadline."""
+        self.missed = 0
+        """Ticks we never answered (the server moved on before we were done)."""
+        self.worst = 0.0
+        self._last_tick = None
+
+    def deadline(self, arrival: float) -> float:
+        return arrival + self.budget
+
+    def plan(self, bot, game_message: TeamGameState, arrival: float) -> list[Action]:
+        """Best action set the bot can come up with before the deadline of a tick received at `arrival`."""
+        if self._last_tick is not None and game_message.tick > self._last_tick + 1:
+            self.missed += game_message.tick - self._last_tick - 1
+        self._last_tick = game_message.tick
+        self.ticks += 1
+        if self.gc_idle:
+            # A full collection takes tens of milliseconds on a large map: not while the deadline runs
+            gc.disable()
+
+        deadline = self.deadline(arrival)
+        best = []
+        complete = False
+        plans = bot.plan_anytime(game_message, deadline)
+        try:
+            for actions in plans:
+                best = actions
+                if time.perf_counter() >= deadline:
+                    break
+            else:
+                complete = True
+        except Exception:
+            # Just so your bot doesn't completely crash. ;) Keep the best plan we had.
+            log.exception("Exception while getting next moves:")
+        finally:
+            plans.close()
+        if not complete:
+            self.cut_short += 1
+        return best
+
+    def sent(self, arrival: float):
+        """To be called right after the COMMAND of the tick received at `arrival` is sent. Also runs the garbage
+        collection held back during the tick (GC_MODE)."""
+        elapsed = time.perf_counter() - arrival
+        self.worst = max(self.worst, elapsed)
+        if elapsed > self.budget:
+            self.late += 1
+        if self.gc_idle:
+            self.collect()
+
+    def collect(self):
+        """The garbage collection held back during the tick: the young generations every tick, the oldest one
+        as often as Python itself would."""
+        gc.collect(2 if gc.get_count()[2] >= gc.get_threshold()[2] else 1)
+
+    def report(self) -> str:
+        return (f"{self.ticks} ticks, {self.cut_short} cut short, {self.late} late, {self.missed} missed, "
+                f"worst {self.worst * 1000:.1f} ms (budget {self.budget * 1000:.0f} ms)")
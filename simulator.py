@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+"""Local, offline game engine and headless match runner.
+
+    python simulator.py --size 40 --teams 2 --ticks 1000
+    python simulator.py --game-loop     # team-0 plays through application.game_loop (see LocalConnection)
+
+Rules follow the game description in .junie/guidelines.md. Where the description is silent the engine
+picks the simplest reading: tile biomass is the trail left by spores, a tile belongs to whoever has trail
+or a spore or a spawner on it, and a spore that turns into a spawner leaves its remaining biomass as trail.
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass, field
+from typing import Optional
+
+import msgspec
+from websockets.exceptions import ConnectionClosed
+
+from game_message import *
+
+NEUTRAL_TEAM_ID = ""
+START_BIOMASS = 10
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+ACTION_TYPES: dict[str, type] = {
+    "SPORE_MOVE": SporeMoveAction,
+    "SPORE_MOVE_TO": SporeMoveToAction,
+    "SPORE_CREATE_SPAWNER": SporeCreateSpawnerAction,
+    "SPAWNER_PRODUCE_SPORE": SpawnerProduceSporeAction,
+    "SPORE_SPLIT": SporeSplitAction,
+}
+
+
+def spawner_cost(spawners_created: int) -> int:
+    """Biomass needed for the next spawner: 0, 1, 3, 7, 15, 31..."""
+    return 2 ** spawners_created - 1
+
+
+def action_from_dict(data: dict) -> Action:
+    """Inverse of `dataclasses.asdict(action)`, i.e. what the bot sends in a COMMAND."""
+    return msgspec.convert(data, ACTION_TYPES[data["type"]])
+
+
+@dataclass(slots=True)
+class TeamState:
+    teamId: str
+    nutrients: int = 0
+    spawnersCreated: int = 0
+    actionsTaken: int = 0
+    isAlive: bool = True
+    errors: list[str] = field(default_factory=list)
+
+
+class LocalGame:
+    """The whole game state and its rules. `state_for` gives what a team's bot would receive."""
+
+    def __init__(self, team_ids: list[str], width: int = 40, height: int = 40, max_ticks: int = 1000,
+                 seed: int = 0, neutral_spores: int = 8, nutrient_grid: Optional[list[list[int]]] = None):
+        self.rng = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.max_ticks = max_ticks
+        self.tick = 0
+        self.nutrients = nutrient_grid or self._generate_nutrients()
+        self.trail = [[0] * width for _ in range(height)]
+        self.trail_owner = [[NEUTRAL_TEAM_ID] * width for _ in range(height)]
+        self.ownership = [[NEUTRAL_TEAM_ID] * width for _ in range(height)]
+        self.teams = {team_id: TeamState(team_id) for team_id in team_ids}
+        self.spores: dict[str, Spore] = {}
+        self.spawners: dict[str, Spawner] = {}
+        self._next_id = 0
+
+        for team_id, (x, y) in zip(team_ids, self._start_positions(len(team_ids))):
+            self._add_spore(team_id, x, y, START_BIOMASS)
+        for _ in range(neutral_spores):
+            x, y = self.rng.randrange(width), self.rng.randrange(height)
+            if not self._spores_at(x, y):
+                self._add_spore(NEUTRAL_TEAM_ID, x, y, self.rng.randint(3, 15))
+        self._update_ownership()
+
+    # --- setup -------------------------------------------------------------------------------------------
+
+    def _generate_nutrients(self) -> list[list[int]]:
+        grid = [[self.rng.choice((0, 0, 0, 1, 1, 2)) for _ in range(self.width)] for _ in range(self.height)]
+        for _ in range(max(1, self.width * self.height // 150)):
+            cx, cy = self.rng.randrange(self.width), self.rng.randrange(self.height)
+            value = self.rng.randint(5, 40)
+            for y in range(max(0, cy - 2), min(self.height, cy + 3)):
+                for x in range(max(0, cx - 2), min(self.width, cx + 3)):
+                    grid[y][x] = max(grid[y][x], value - 5 * (abs(x - cx) + abs(y - cy)))
+        return grid
+
+    def _start_positions(self, count: int) -> list[tuple[int, int]]:
+        margin_x, margin_y = self.width // 5, self.height // 5
+        corners = [(margin_x, margin_y), (self.width - 1 - margin_x, self.height - 1 - margin_y),
+                   (self.width - 1 - margin_x, margin_y), (margin_x, self.height - 1 - margin_y)]
+        while len(corners) < count:
+            corners.append((self.rng.randrange(self.width), self.rng.randrange(self.height)))
+        return corners[:count]
+
+    def _new_id(self, kind: str) -> str:
+        self._next_id += 1
+        return f"{kind}-{self._next_id}"
+
+    def _add_spore(self, team_id: str, x: int, y: int, biomass: int) -> Spore:
+        spore = Spore(self._new_id("spore"), team_id, Position(x, y), biomass)
+        self.spores[spore.id] = spore
+        return spore
+
+    def _spores_at(self, x: int, y: int) -> list[Spore]:
+        return [spore for spore in self.spores.values() if spore.position.x == x and spore.position.y == y]
+
+    # --- state -------------------------------------------------------------------------------------------
+
+    def is_over(self) -> bool:
+        alive = [team for team in self.teams.values() if team.isAlive]
+        return self.tick >= self.max_ticks or len(alive) <= 1
+
+    def state_for(self, team_id: str) -> TeamGameState:
+        """Snapshot for one team. Nothing in it is shared with the engine, bots can keep references."""
+        return self._snapshot(team_id, self._world_snapshot())
+
+    def states(self) -> dict[str, TeamGameState]:
+        """Snapshots for every team still alive, sharing one copy of the world."""
+        world = self._world_snapshot()
+        return {team_id: self._snapshot(team_id, world) for team_id, team in self.teams.items() if team.isAlive}
+
+    def _snapshot(self, team_id: str, world: GameWorld) -> TeamGameState:
+        errors = self.teams[team_id].errors
+        return TeamGameState(
+            tick=self.tick,
+            yourTeamId=team_id,
+            lastTickErrors=list(errors),
+            constants=Constants(neutralTeamId=NEUTRAL_TEAM_ID, maxTicks=self.max_ticks),
+            teamIds=[tid for tid, team in self.teams.items() if team.isAlive],
+            world=world,
+        )
+
+    def _world_snapshot(self) -> GameWorld:
+        spores = [Spore(s.id, s.teamId, Position(s.position.x, s.position.y), s.biomass) for s in self.spores.values()]
+        spawners = [Spawner(s.id, s.teamId, Position(s.position.x, s.position.y)) for s in self.spawners.values()]
+        team_infos = {}
+        for team_id, team in self.teams.items():
+            team_infos[team_id] = TeamInfo(
+                teamId=team_id,
+                isAlive=team.isAlive,
+                nutrients=team.nutrients,
+                spores=[s for s in spores if s.teamId == team_id],
+                spawners=[s for s in spawners if s.teamId == team_id],
+                nextSpawnerCost=spawner_cost(team.spawnersCreated),
+            )
+        biomass = [row[:] for row in self.trail]
+        for spore in spores:
+            biomass[spore.position.y][spore.position.x] += spore.biomass
+        return GameWorld(
+            map=GameMap(self.width, self.height, self.nutrients),
+            biomassGrid=biomass,
+            ownershipGrid=[row[:] for row in self.ownership],
+            spores=spores,
+            spawners=spawners,
+            teamInfos=team_infos,
+        )
+
+    def tiles_controlled(self) -> dict[str, int]:
+        counts = {team_id: 0 for team_id in self.teams}
+        for row in self.ownership:
+            for owner in row:
+                if owner in counts:
+                    counts[owner] += 1
+        return counts
+
+    def ranking(self) -> list[str]:
+        tiles = self.tiles_controlled()
+        biomass = {team_id: 0 for team_id in self.teams}
+        for spore in self.spores.values():
+            if spore.teamId in biomass:
+                biomass[spore.teamId] += spore.biomass
+
+        def key(team_id):
+            team = self.teams[team_id]
+            return (team.isAlive, tiles[team_id], biomass[team_id] + team.nutrients, team.spawnersCreated,
+                    team.actionsTaken)
+        return sorted(self.teams, key=key, reverse=True)
+
+    # --- rules -------------------------------------------------------------------------------------------
+
+    def step(self, actions_by_team: dict[str, list[Action]]):
+        """Plays one tick with the actions of every team."""
+        for team in self.teams.values():
+            team.errors = []
+        moves: list[tuple[Spore, int, int]] = []
+        for team_id, actions in actions_by_team.items():
+            if self.teams[team_id].isAlive:
+                self._apply_actions(team_id, actions, moves)
+        self._move(moves)
+        self._resolve_combat()
+        self._update_ownership()
+        for team_id, team in self.teams.items():
+            team.nutrients += self._income(team_id)
+        self.tick += 1
+        self._eliminate()
+
+    def _apply_actions(self, team_id: str, actions: list[Action], moves: list):
+        team = self.teams[team_id]
+        acted: set[str] = set()
+        for action in actions:
+            unit_id = getattr(action, "sporeId", None) or getattr(action, "spawnerId", None)
+            if unit_id in acted:
+                team.errors.append(f"{unit_id} already acted this tick")
+                continue
+            error = self._apply_action(team, action, moves)
+            if error:
+                team.errors.append(f"{action.type} {unit_id}: {error}")
+            else:
+                acted.add(unit_id)
+                team.actionsTaken += 1
+
+    def _apply_action(self, team: TeamState, action: Action, moves: list) -> Optional[str]:
+        if isinstance(action, SpawnerProduceSporeAction):
+            spawner = self.spawners.get(action.spawnerId)
+            if spawner is None or spawner.teamId != team.teamId:
+                return "unknown spawner"
+            if action.biomass < 1 or action.biomass > team.nutrients:
+                return f"cannot produce {action.biomass} biomass with {team.nutrients} nutrients"
+            team.nutrients -= action.biomass
+            self._add_spore(team.teamId, spawner.position.x, spawner.position.y, action.biomass)
+            return None
+
+        spore = self.spores.get(action.sporeId)
+        if spore is None or spore.teamId != team.teamId:
+            return "unknown spore"
+
+        if isinstance(action, SporeCreateSpawnerAction):
+            cost = spawner_cost(team.spawnersCreated)
+            if spore.biomass < max(cost, 1):
+                return f"needs {cost} biomass"
+            if any(s.position == spore.position for s in self.spawners.values()):
+                return "there is already a spawner here"
+            del self.spores[spore.id]
+            spawner = Spawner(self._new_id("spawner"), team.teamId, Position(spore.position.x, spore.position.y))
+            self.spawners[spawner.id] = spawner
+            team.spawnersCreated += 1
+            self._add_trail(team.teamId, spore.position.x, spore.position.y, spore.biomass - cost)
+            return None
+
+        if spore.biomass < 2:
+            return "needs at least 2 biomass to act"
+
+        if isinstance(action, SporeMoveAction):
+            return self._queue_move(spore, action.direction, moves)
+        if isinstance(action, SporeMoveToAction):
+            target = action.position
+            if not (0 <= target.x < self.width and 0 <= target.y < self.height):
+                return "target outside the map"
+            step = self._next_step(spore.position, target)
+            if step is None:
+                return None
+            return self._queue_move(spore, Position(*step), moves)
+        if isinstance(action, SporeSplitAction):
+            if not 1 <= action.biomassForMovingSpore < spore.biomass:
+                return f"cannot split {action.biomassForMovingSpore} out of {spore.biomass}"
+            if not self._valid_direction(spore, action.direction):
+                return "invalid direction"
+            stay = self._add_spore(spore.teamId, spore.position.x, spore.position.y,
+                                   spore.biomass - action.biomassForMovingSpore)
+            stay.position = Position(spore.position.x, spore.position.y)
+            spore.biomass = action.biomassForMovingSpore
+            moves.append((spore, spore.position.x + action.direction.x, spore.position.y + action.direction.y))
+            return None
+        return f"unknown action {type(action).__name__}"
+
+    def _valid_direction(self, spore: Spore, direction: Position) -> bool:
+        if (direction.x, direction.y) not in DIRECTIONS:
+            return False
+        x, y = spore.position.x + direction.x, spore.position.y + direction.y
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def _queue_move(self, spore: Spore, direction: Position, moves: list) -> Optional[str]:
+        if not self._valid_direction(spore, direction):
+            return "invalid direction"
+        moves.append((spore, spore.position.x + direction.x, spore.position.y + direction.y))
+        return None
+
+    def _next_step(self, start: Position, target: Position) -> Optional[tuple[int, int]]:
+        """Direction of the first step of a shortest path (ties: up, down, left, right)."""
+        # No obstacles on the map, so any step that gets closer is on a shortest path
+        distance = abs(start.x - target.x) + abs(start.y - target.y)
+        for dx, dy in DIRECTIONS:
+            if abs(start.x + dx - target.x) + abs(start.y + dy - target.y) < distance:
+                return dx, dy
+        return None
+
+    def _move(self, moves: list[tuple[Spore, int, int]]):
+        destinations = {spore.id: (x, y) for spore, x, y in moves}
+        by_id = {spore.id: spore for spore, _, _ in moves}
+        # Enemies trying to swap tiles: the weaker one stays where it is
+        at: dict[tuple[int, int], list[Spore]] = {}
+        for spore in self.spores.values():
+            at.setdefault((spore.position.x, spore.position.y), []).append(spore)
+        cancelled = set()
+        for spore, x, y in moves:
+            for other in at.get((x, y), ()):
+                back = destinations.get(other.id)
+                if other.teamId != spore.teamId and back == (spore.position.x, spore.position.y):
+                    if spore.biomass <= other.biomass:
+                        cancelled.add(spore.id)
+                    if other.biomass <= spore.biomass:
+                        cancelled.add(other.id)
+        for spore_id, (x, y) in destinations.items():
+            if spore_id in cancelled:
+                continue
+            spore = by_id[spore_id]
+            if not (self.trail[y][x] >= 1 and self.trail_owner[y][x] == spore.teamId):
+                # New ground: 1 biomass stays behind as trail
+                spore.biomass -= 1
+                self._add_trail(spore.teamId, spore.position.x, spore.position.y, 1)
+            spore.position = Position(x, y)
+            if spore.biomass <= 0:
+                del self.spores[spore.id]
+
+    def _add_trail(self, team_id: str, x: int, y: int, biomass: int):
+        if biomass <= 0:
+            return
+        if self.trail_owner[y][x] != team_id:
+            self.trail[y][x] = 0
+            self.trail_owner[y][x] = team_id
+        self.trail[y][x] += biomass
+
+    def _resolve_combat(self):
+        tiles: dict[tuple[int, int], list[Spore]] = {}
+        for spore in self.spores.values():
+            tiles.setdefault((spore.position.x, spore.position.y), []).append(spore)
+        for (x, y), spores in tiles.items():
+            if len(spores) == 1:
+                continue
+            # Friendly spores merge first; the id of the biggest one is kept
+            by_team: dict[str, Spore] = {}
+            for spore in sorted(spores, key=lambda s: -s.biomass):
+                kept = by_team.get(spore.teamId)
+                if kept is None:
+                    by_team[spore.teamId] = spore
+                else:
+                    kept.biomass += spore.biomass
+                    del self.spores[spore.id]
+            if len(by_team) == 1:
+                continue
+            # Only the two biggest fight, everybody else is eliminated
+            fighters = sorted(by_team.values(), key=lambda s: -s.biomass)
+            for loser in fighters[2:]:
+                del self.spores[loser.id]
+            first, second = fighters[0], fighters[1]
+            del self.spores[second.id]
+            if first.biomass == second.biomass:
+                del self.spores[first.id]
+            else:
+                first.biomass -= second.biomass
+
+        for spawner_id, spawner in list(self.spawners.items()):
+            for spore in tiles.get((spawner.position.x, spawner.position.y), ()):
+                if spore.id in self.spores and spore.teamId != spawner.teamId:
+                    del self.spawners[spawner_id]
+                    break
+
+    def _update_ownership(self):
+        for y in range(self.height):
+            trail_row, trail_owner_row, row = self.trail[y], self.trail_owner[y], self.ownership[y]
+            for x in range(self.width):
+                row[x] = trail_owner_row[x] if trail_row[x] >= 1 else NEUTRAL_TEAM_ID
+        for spawner in self.spawners.values():
+            self.ownership[spawner.position.y][spawner.position.x] = spawner.teamId
+        for spore in self.spores.values():
+            x, y = spore.position.x, spore.position.y
+            if self.trail_owner[y][x] != spore.teamId and self.trail[y][x]:
+                # Standing on someone else's trail wipes it
+                self.trail[y][x] = 0
+            self.ownership[y][x] = spore.teamId
+
+    def _income(self, team_id: str) -> int:
+        income = 0
+        for row_owner, row_nutrients in zip(self.ownership, self.nutrients):
+            for owner, value in zip(row_owner, row_nutrients):
+                if owner == team_id:
+                    income += value
+        return income
+
+    def _eliminate(self):
+        for team_id, team in self.teams.items():
+            if not team.isAlive:
+                continue
+            has_spawner = any(s.teamId == team_id for s in self.spawners.values())
+            can_act = any(s.teamId == team_id and s.biomass >= 2 for s in self.spores.values())
+            if not has_spawner and not can_act:
+                team.isAlive = False
+
+
+class LocalConnection:
+    """Stand-in for the websocket (see transport.Transport), so the unchanged `application.game_loop` can play a
+    local game.
+
+    `recv` gives our team's TeamGameState as JSON; `send` hands over our COMMAND. Like the server, the next
+    frame comes once the tick has been played: the opponents plan (each in its own process, see tournament) and
+    the game steps inside `recv`, so that time shows up as waiting for the frame. Raises ConnectionClosed once
+    the game is over or our team is out.
+    """
+
+    def __init__(self, game: LocalGame, team_id: str, opponents: dict, seed: int = 0):
+        from tournament import _Seats
+
+        self.game = game
+        self.team_id = team_id
+        self._seats = _Seats(opponents, seed)
+        self._encoder = msgspec.json.Encoder()
+        self._started = False
+        self._command: Optional[list[Action]] = None
+        self._commanded = asyncio.Event()
+
+    async def __aenter__(self) -> "LocalConnection":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def recv(self, decode: Optional[bool] = None) -> bytes:
+        if self._started and not self.game.is_over():
+            while self._command is None:
+                self._commanded.clear()
+                await self._commanded.wait()
+            command, self._command = self._command, None
+            await asyncio.to_thread(self._play, command)
+        self._started = True
+        if self.game.is_over() or not self.game.teams[self.team_id].isAlive:
+            raise ConnectionClosed(None, None)
+        return self._encoder.encode(self.game.state_for(self.team_id))
+
+    async def send(self, message, arrival: Optional[float] = None):
+        payload = msgspec.json.decode(message)
+        if payload.get("type") == "COMMAND":
+            self._command = [action_from_dict(action) for action in payload["actions"]]
+            self._commanded.set()
+
+    async def close(self):
+        self._seats.close()
+
+    def _play(self, actions: list[Action]):
+        states = {team_id: state for team_id, state in self.game.states().items() if team_id != self.team_id}
+        actions_by_team, _ = self._seats.plan(states)
+        actions_by_team[self.team_id] = actions
+        self.game.step(actions_by_team)
+
+
+async def play_game_loop(team_ids: list[str], width: int, height: int, max_ticks: int, seed: int) -> LocalGame:
+    """Plays a local game with the first team's Bot in this process, through `application.game_loop`, and the
+    others in their own processes."""
+    from application import game_loop
+    from bot import Bot
+    from tournament import Variant
+
+    game = LocalGame(team_ids, width, height, max_ticks, seed)
+    random.seed(seed)
+    opponents = {team_id: Variant(team_id) for team_id in team_ids[1:]}
+    async with LocalConnection(game, team_ids[0], opponents, seed) as connection:
+        await game_loop(connection, Bot())
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=40)
+    parser.add_argument("--teams", type=int, default=2)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--game-loop", action="store_true",
+                        help="play team-0 in this process through application.game_loop, like against a server")
+    args = parser.parse_args()
+
+    if args.game_loop:
+        from bot_logging import setup_logging
+
+        setup_logging()
+        team_ids = [f"team-{i}" for i in range(args.teams)]
+        game = asyncio.run(play_game_loop(team_ids, args.size, args.size, args.ticks, args.seed))
+        tiles = game.tiles_controlled()
+        for rank, team_id in enumerate(game.ranking(), 1):
+            print(f"{rank}. {team_id}: {tiles[team_id]} tiles")
+        return
+
+
+    # Every bot in its own process, like in a tournament: bots share module-level state (caches, entity store)
+    from tournament import Variant, play_match
+
+    report = play_match(args.seed, [Variant(f"team-{i}") for i in range(args.teams)], args.size, args.size,
+                        args.ticks)
+    print(f"{report.ticks} ticks in {report.seconds:.2f} s ({report.ticks / report.seconds:.0f} ticks/s)")
+    for rank, name in enumerate(report.ranking, 1):
+        times = sorted(report.tick_times[name]) or [0.0]
+        print(f"{rank}. {name}: {report.tiles[name]} tiles, "
+              f"p50 {times[len(times) // 2] * 1000:.1f} ms, max {times[-1] * 1000:.1f} ms per tick, "
+              f"{report.rejected[name]} actions refused")
+        for failure in report.failures.get(name, []):
+            print(f"   {failure}")
+
+
+if __name__ == "__main__":
+    main()
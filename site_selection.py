@@ -0,0 +1,192 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import GridView, StaticMap, grid_view
+from map_analysis import rect_sums, square_sums, summed_area_table
+from pathfinding import distance_fields
+
+# A spawner's site is worth the nutrients we don't own yet in the square of this radius around it
+SITE_RADIUS = int(os.environ.get("SITE_RADIUS", "5"))
+# No new spawner closer than this (Euclidean) to one of ours
+MIN_SPAWNER_DISTANCE = int(os.environ.get("MIN_SPAWNER_DISTANCE", "5"))
+# Best sites of the map each spore is matched against, on top of the sites within its reach
+SITE_CANDIDATES = 32
+# Richest resource regions of the map (see map_analysis) whose centre is a candidate too
+SITE_REGIONS = 8
+# Tiles scored at a time while looking for the best sites of the map
+SITE_BATCH = 256
+# Sites within this Manhattan distance of a spore (and within its biomass) are always candidates
+SITE_REACH = 8
+# Time one tick may spend matching spores to sites, fattest spores first
+SITE_BUDGET_S = float(os.environ.get("SITE_BUDGET_MS", "2")) / 1000
+# Nutrients of site value one tick of walking (or one biomass spent on the way) is worth
+TRAVEL_WEIGHT = 2
+# The spawner's own tile pays its nutrients every tick for the rest of the game: it counts this many times
+TILE_WEIGHT = 10
+
+
+@dataclass(slots=True)
+class SitePair:
+    """A spore that can afford the next spawner and a site to build it on."""
+
+    spore: Spore
+    site: Position
+    value: int
+    """Unowned nutrients around the site, plus its own tile's counted TILE_WEIGHT times."""
+    distance: int
+    """Ticks of walking to the site (0: build where the spore stands)."""
+    path_cost: int
+    """Biomass spent on the way."""
+    score: float
+
+
+def site_values(game_message: TeamGameState, radius: int = SITE_RADIUS) -> np.ndarray:
+    """(height, width) value of a spawner on every tile: one summed-area table, O(1) per tile."""
+    view = grid_view(game_message)
+    nutrients = view.static.nutrients
+    unowned, table = view.unowned_nutrients()
+    height, width = view.ownership.shape
+    ys, xs = np.mgrid[0:height, 0:width]
+    # The site's own tile counts whoever owns it now: the spawner keeps it (and the walk there takes it)
+    return square_sums(table, xs, ys, radius) - unowned + TILE_WEIGHT * nutrients
+
+
+def _site_values_at(view: GridView, tiles: np.ndarray, radius: int = SITE_RADIUS) -> np.ndarray:
+    """`site_values` of just these tiles (flat indices)."""
+    unowned, table = view.unowned_nutrients()
+    width = view.static.width
+    return (square_sums(table, tiles % width, tiles // width, radius) - unowned.ravel()[tiles]
+            + TILE_WEIGHT * view.static.nutrients.ravel()[tiles])
+
+
+_bounds: Optional[tuple[StaticMap, int, np.ndarray, np.ndarray]] = None
+
+
+def _site_bounds(static: StaticMap, radius: int = SITE_RADIUS) -> tuple[np.ndarray, np.ndarray]:
+    """Every tile, best first, and the most its site can be worth (when we own nothing around it)."""
+    global _bounds
+    if _bounds is None or _bounds[0] is not static or _bounds[1] != radius:
+        ys, xs = np.mgrid[0:static.height, 0:static.width]
+        bounds = (static.analysis.square_sums(xs, ys, radius) + (TILE_WEIGHT - 1) * static.nutrients).ravel()
+        order = np.argsort(-bounds, kind="stable")
+        _bounds = (static, radius, order, bounds[order])
+    return _bounds[2], _bounds[3]
+
+
+def _top_sites(view: GridView, allowed: np.ndarray, count: int) -> np.ndarray:
+    """The `count` best allowed sites with some value, without scoring the whole map: tiles are scored in the
+    order of their bound until no tile left can beat the count-th best."""
+    order, bounds = _site_bounds(view.static)
+    allowed = allowed.ravel()
+    best_tiles = np.zeros(0, dtype=np.intp)
+    best_values = np.zeros(0, dtype=np.int64)
+    for start in range(0, len(order), SITE_BATCH):
+        if len(best_tiles) == count and (best_values[-1] >= bounds[start] or bounds[start] <= 0):
+            break
+        tiles = order[start:start + SITE_BATCH]
+        tiles = tiles[allowed[tiles]]
+        values = _site_values_at(view, tiles)
+        best_tiles = np.concatenate([best_tiles, tiles[values > 0]])
+        best_values = np.concatenate([best_values, values[values > 0]])
+        keep = np.argsort(-best_values, kind="stable")[:count]
+        best_tiles, best_values = best_tiles[keep], best_values[keep]
+    return best_tiles
+
+
+def _region_sites(view: GridView, allowed: np.ndarray, count: int = SITE_REGIONS) -> np.ndarray:
+    """Centres of the `count` richest resource regions of the map, where a spawner is allowed."""
+    analysis = view.static.analysis
+    tiles = (analysis.cluster_ys[:count] * view.static.width + analysis.cluster_xs[:count]).astype(np.intp)
+    return tiles[allowed.ravel()[tiles]]
+
+
+def _allowed(game_message: TeamGameState, my_team: TeamInfo) -> np.ndarray:
+    """(height, width) tiles a spawner can go on: no spawner there, none of ours too close.
+
+    The first spawner must stand on nutrients: until it has spores out, its tile is all we own and earn from.
+    """
+    height, width = game_message.world.map.height, game_message.world.map.width
+    if my_team.spawners:
+        allowed = np.ones((height, width), dtype=bool)
+    else:
+        allowed = grid_view(game_message).static.nutrients > 0
+    for spawner in game_message.world.spawners:
+        allowed[spawner.position.y, spawner.position.x] = False
+    ys, xs = np.ogrid[0:height, 0:width]
+    for spawner in my_team.spawners:
+        near = (xs - spawner.position.x) ** 2 + (ys - spawner.position.y) ** 2 < MIN_SPAWNER_DISTANCE ** 2
+        allowed &= ~near
+    return allowed
+
+
+def _foreign_spores(game_message: TeamGameState, my_team: TeamInfo) -> np.ndarray:
+    """Summed-area table of the tiles holding a spore that isn't ours (enemy or neutral)."""
+    height, width = game_message.world.map.height, game_message.world.map.width
+    foreign = np.zeros((height, width), dtype=np.int32)
+    for spore in game_message.world.spores:
+        if spore.teamId != my_team.teamId:
+            foreign[spore.position.y, spore.position.x] = 1
+    return summed_area_table(foreign)
+
+
+def best_sites(game_message: TeamGameState, my_team: TeamInfo, budget: float = SITE_BUDGET_S,
+               deadline: Optional[float] = None) -> list[SitePair]:
+    """Best (spore, site) pairs, best first, one per spore, for the spores that can afford the next spawner.
+
+    A site scores the unowned nutrients around it (its own tile's TILE_WEIGHT times) minus TRAVEL_WEIGHT per tick
+    of walking and per biomass spent on the way. The spore must still afford the spawner when it gets there, and
+    must not run into a spore that isn't ours on the way. Stops matching spores once `budget` seconds are spent,
+    or at the tick's deadline (perf_counter), whichever comes first; the fattest spore is always matched.
+    """
+    cost = my_team.nextSpawnerCost
+    spores = sorted((spore for spore in my_team.spores if spore.biomass >= max(cost, 1)),
+                    key=lambda spore: -spore.biomass)
+    if not spores:
+        return []
+    stop = time.perf_counter() + budget
+    if deadline is not None:
+        stop = min(stop, deadline)
+    view = grid_view(game_message)
+    allowed = _allowed(game_message, my_team)
+    foreign = _foreign_spores(game_message, my_team)
+    width = view.static.width
+    # The best sites of the map (found from the map analysis' bounds), and the centres of its richest regions
+    top = np.union1d(_top_sites(view, allowed, SITE_CANDIDATES), _region_sites(view, allowed))
+    allowed = allowed.ravel()
+
+    height = view.static.height
+    fields = distance_fields(game_message)
+    pairs = []
+    for spore, field in zip(spores, fields.from_spores(game_message, spores)):
+        if pairs and time.perf_counter() > stop:
+            break
+        sx, sy = spore.position.x, spore.position.y
+        reach = max(min(spore.biomass - max(cost, 2), SITE_REACH), 0)
+        near = np.arange(max(sy - reach, 0), min(sy + reach, height - 1) + 1)[:, None] * width + \
+            np.arange(max(sx - reach, 0), min(sx + reach, width - 1) + 1)
+        near = near.ravel()
+        tiles = np.union1d(top, near[allowed[near]])
+        if len(tiles) == 0:
+            continue
+        values = _site_values_at(view, tiles)
+        xs, ys = tiles % width, tiles // width
+        distances = np.abs(xs - sx) + np.abs(ys - sy)
+        path_costs = field.costs_at(xs, ys)
+        # A spore needs 2 biomass to move, and must still afford the spawner on arrival. The server walks any
+        # shortest path, so a spore that isn't ours anywhere in the rectangle between them is in the way.
+        in_the_way = rect_sums(foreign, np.minimum(xs, sx), np.minimum(ys, sy), np.maximum(xs, sx), np.maximum(ys, sy))
+        reachable = (distances == 0) | ((spore.biomass - path_costs >= max(cost, 2)) & (in_the_way == 0))
+        if not reachable.any():
+            continue
+        scores = np.where(reachable, values - TRAVEL_WEIGHT * (distances + path_costs), -np.inf)
+        best = int(np.argmax(scores))
+        pairs.append(SitePair(spore, Position(int(xs[best]), int(ys[best])), int(values[best]),
+                              int(distances[best]), int(path_costs[best]), float(scores[best])))
+    pairs.sort(key=lambda pair: -pair.score)
+    return pairs
+
@@ -0,0 +1,147 @@
+from typing import Callable, Generic, Iterator, Optional, TypeVar
+
+from game_message import *
+
+CELL_SIZE = 8
+# Up to this many entities, queries check every one of them: walking the empty cells between a few far
+# apart entities (spawners on a large map) costs more
+SCAN_LIMIT = 32
+
+Entity = TypeVar("Entity", Spore, Spawner)
+
+
+class Buckets(Generic[Entity]):
+    """Entities bucketed by CELL_SIZE x CELL_SIZE cells of the map.
+
+    Queries walk rings of cells outwards from the origin and stop as soon as no farther cell can hold
+    anything closer, so they only look at the entities around the origin. Ties are broken by the order
+    of the input list, like `min`/`sorted` on that list would.
+    """
+
+    def __init__(self, entities: list[Entity], cell: int = CELL_SIZE):
+        self.cell = cell
+        self.count = len(entities)
+        self.cells: dict[tuple[int, int], list[tuple[int, Entity]]] = {}
+        for order, entity in enumerate(entities):
+            key = (entity.position.x // cell, entity.position.y // cell)
+            self.cells.setdefault(key, []).append((order, entity))
+        xs = [cx for cx, _ in self.cells] or [0]
+        ys = [cy for _, cy in self.cells] or [0]
+        self._bounds = (min(xs), max(xs), min(ys), max(ys))
+
+    def _rings(self, origin: Position) -> Iterator[tuple[int, list[tuple[int, Entity]]]]:
+        """(ring, entities of that ring), ring r being the cells at Chebyshev cell distance r."""
+        cx, cy = origin.x // self.cell, origin.y // self.cell
+        # Go until every occupied cell has been covered
+        min_x, max_x, min_y, max_y = self._bounds
+        farthest = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        for ring in range(farthest + 1):
+            found = []
+            if ring == 0:
+                found.extend(self.cells.get((cx, cy), ()))
+            else:
+                for x in range(cx - ring, cx + ring + 1):
+                    found.extend(self.cells.get((x, cy - ring), ()))
+                    found.extend(self.cells.get((x, cy + ring), ()))
+                for y in range(cy - ring + 1, cy + ring):
+                    found.extend(self.cells.get((cx - ring, y), ()))
+                    found.extend(self.cells.get((cx + ring, y), ()))
+            yield ring, found
+
+    def nearest(self, origin: Position, k: Optional[int] = None,
+                keep: Optional[Callable[[Entity], bool]] = None) -> list[Entity]:
+        """Up to k entities (all if None) closest to origin by Manhattan distance, closest first."""
+        k = self.count if k is None else k
+        if k <= 0:
+            return []
+        candidates = []
+        if self.count <= SCAN_LIMIT:
+            for found in self.cells.values():
+                for order, entity in found:
+                    if keep is None or keep(entity):
+                        distance = abs(entity.position.x - origin.x) + abs(entity.position.y - origin.y)
+                        candidates.append((distance, order, entity))
+            candidates.sort(key=lambda c: (c[0], c[1]))
+            return [entity for _, _, entity in candidates[:k]]
+        for ring, found in self._rings(origin):
+            for order, entity in found:
+                if keep is None or keep(entity):
+                    distance = abs(entity.position.x - origin.x) + abs(entity.position.y - origin.y)
+                    candidates.append((distance, order, entity))
+            # Anything outside the rings seen so far is at least ring * cell + 1 away
+            if len(candidates) >= k:
+                candidates.sort(key=lambda c: (c[0], c[1]))
+                if candidates[k - 1][0] <= ring * self.cell:
+                    break
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        return [entity for _, _, entity in candidates[:k]]
+
+    def closest(self, origin: Position, keep: Optional[Callable[[Entity], bool]] = None) -> Optional[Entity]:
+        found = self.nearest(origin, 1, keep)
+        return found[0] if found else None
+
+    def within(self, origin: Position, radius: int, metric: str = "manhattan",
+               keep: Optional[Callable[[Entity], bool]] = None) -> list[Entity]:
+        """Entities at distance <= radius ("manhattan", "chebyshev"), or < radius ("euclidean", strict like
+        the spawner spacing rule), in input order."""
+        cx, cy = origin.x // self.cell, origin.y // self.cell
+        reach = radius // self.cell + 1
+        found = []
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                for order, entity in self.cells.get((x, y), ()):
+                    dx = abs(entity.position.x - origin.x)
+                    dy = abs(entity.position.y - origin.y)
+                    if metric == "manhattan":
+                        inside = dx + dy <= radius
+                    elif metric == "chebyshev":
+                        inside = max(dx, dy) <= radius
+                    else:
+                        inside = dx * dx + dy * dy < radius * radius
+                    if inside and (keep is None or keep(entity)):
+                        found.append((order, entity))
+        found.sort(key=lambda f: f[0])
+        return [entity for _, entity in found]
+
+
+class SpatialIndex:
+    """Spores and spawners of one tick, bucketed by position, overall and per team."""
+
+    def __init__(self, spores: list[Spore], spawners: list[Spawner], cell: int = CELL_SIZE):
+        self.spores = Buckets(spores, cell)
+        self.spawners = Buckets(spawners, cell)
+        self._spores_by_team: dict[str, Buckets[Spore]] = {}
+        self._spawners_by_team: dict[str, Buckets[Spawner]] = {}
+        self._all_spores = spores
+        self._all_spawners = spawners
+        self.cell = cell
+
+    def team_spores(self, team_id: str) -> Buckets[Spore]:
+        return self._team(self._spores_by_team, self._all_spores, team_id)
+
+    def team_spawners(self, team_id: str) -> Buckets[Spawner]:
+        return self._team(self._spawners_by_team, self._all_spawners, team_id)
+
+    def _team(self, by_team: dict, entities: list, team_id: str) -> Buckets:
+        # Built on first use: most ticks only query a team or two
+        buckets = by_team.get(team_id)
+        if buckets is None:
+            buckets = by_team[team_id] = Buckets([e for e in entities if e.teamId == team_id], self.cell)
+        return buckets
+
+    def closest_spawner_of_team(self, origin: Position, team_id: str) -> Optional[Spawner]:
+        return self.team_spawners(team_id).closest(origin)
+
+    def closest_spore_of_team(self, origin: Position, team_id: str) -> Optional[Spore]:
+        return self.team_spores(team_id).closest(origin)
+
+
+_last_index: Optional[tuple[TeamGameState, SpatialIndex]] = None
+
+
+def spatial_index(game_message: TeamGameState) -> SpatialIndex:
+    """SpatialIndex of the current tick, built once and shared by every caller during the tick."""
+    global _last_index
+    if _last_index is None or _last_index[0] is not game_message:
+        _last_index = (game_message, SpatialIndex(game_message.world.spores, game_message.world.spawners))
+    return _last_index[1]
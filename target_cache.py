@@ -0,0 +1,189 @@
+import os
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import GridView, StaticMap
+from parallel_targets import MIN_PARALLEL_FIELDS, parallel_targets
+from pathfinding import DistanceFieldCache, distance_fields
+from world_state import WorldState, world_state
+
+# Ranked target lists kept between ticks (least recently used ones are evicted first)
+TARGET_CACHE_SIZE = int(os.environ.get("TARGET_CACHE_SIZE", "64"))
+# Above this share of targets whose cost changed, re-sorting is cheaper than repairing
+REPAIR_LIMIT = 0.25
+
+
+class Targets(Sequence):
+    """Target tiles in ranked order, made into Positions only when read: on a large map a ranking holds tens
+    of thousands of tiles, and a tick draws a few hundred of them."""
+
+    __slots__ = ("xs", "ys")
+
+    def __init__(self, xs: np.ndarray, ys: np.ndarray):
+        self.xs = xs
+        self.ys = ys
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Targets(self.xs[index], self.ys[index])
+        return Position(int(self.xs[index]), int(self.ys[index]))
+
+    def __add__(self, other: "Targets") -> "Targets":
+        return Targets(np.concatenate([self.xs, other.xs]), np.concatenate([self.ys, other.ys]))
+
+
+EMPTY = Targets(np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+
+
+class _Ranking:
+    """Every nutrient tile of the map ranked for one origin, with the sort keys it was ranked by."""
+
+    __slots__ = ("costs", "distances", "keys", "version", "targets")
+
+    def __init__(self, costs: np.ndarray, distances: np.ndarray, keys: np.ndarray):
+        self.costs = costs
+        self.distances = distances
+        self.keys = keys
+        """Sorted (cost, distance, tile index) keys packed in one int64; `keys % n` is the ranking."""
+        self.version = -1
+        self.targets = EMPTY
+
+
+class TargetCache:
+    """Ranked targets of each spawner position, kept between ticks instead of re-sorted.
+
+    Nutrient tiles never move, so the ranking of every nutrient tile (by route cost, then distance, then
+    row-major order, like `GridView.rank`) only changes where route costs changed. When ownership changes,
+    the costs are read from the repaired distance field and only the tiles whose cost changed are moved in
+    the ranking; tiles we own are then filtered out. When ownership hasn't changed since a ranking was
+    built (same version), its target list is reused as is.
+    """
+
+    def __init__(self, size: int = TARGET_CACHE_SIZE):
+        self.size = size
+        self.static: Optional[StaticMap] = None
+        self.view: Optional[GridView] = None
+        self.fields: Optional[DistanceFieldCache] = None
+        self.version = 0
+        """Bumped every time ownership changes."""
+        self.world_version = -1
+        """Version of the world state applied last."""
+        self.rankings: OrderedDict[tuple[int, int], _Ranking] = OrderedDict()
+        self._enemies: OrderedDict[tuple, list[Position]] = OrderedDict()
+
+    def sync(self, world: WorldState, fields: DistanceFieldCache):
+        if world.version == self.world_version:
+            return
+        diff = world.diff
+        if world.static is not self.static:
+            self.rankings.clear()
+            self._enemies.clear()
+            self.static = world.static
+        elif diff.base != self.world_version or len(diff.ours_changed()):
+            # Ownership changed (or we can't tell: a tick was skipped)
+            self.version += 1
+        self.world_version = world.version
+        self.view = world.view
+        self.fields = fields
+
+    def prefetch(self, origins: list[Position], deadline: Optional[float] = None):
+        """Builds the distance fields the rankings from `origins` are missing, over the process pool when
+        there is one and at least MIN_PARALLEL_FIELDS are missing (otherwise they are built when asked for)."""
+        pool = parallel_targets()
+        if pool is None:
+            return
+        missing = self.fields.missing(origins)
+        if len(missing) >= MIN_PARALLEL_FIELDS:
+            pool.build_fields(self.fields, missing, deadline)
+
+    def nutrient_targets(self, origin: Position) -> Targets:
+        """Nutrient tiles we don't own, cheapest route from origin first."""
+        static = self.static
+        if len(static.nutrient_xs) == 0:
+            return EMPTY
+        key = (origin.x, origin.y)
+        ranking = self.rankings.get(key)
+        if ranking is None:
+            ranking = self._rank(origin)
+            self._remember(self.rankings, key, ranking)
+        else:
+            self.rankings.move_to_end(key)
+            if ranking.version != self.version:
+                self._repair(ranking, origin)
+        if ranking.version != self.version:
+            order = ranking.keys % len(static.nutrient_xs)
+            xs, ys = static.nutrient_xs[order], static.nutrient_ys[order]
+            keep = self.view.not_ours_mask[ys, xs]
+            ranking.targets = Targets(xs[keep], ys[keep])
+            ranking.version = self.version
+        return ranking.targets
+
+    def enemy_targets(self, origin: Position, xs: np.ndarray, ys: np.ndarray) -> Targets:
+        """Enemy spawners at (xs, ys) ranked like nutrient targets."""
+        if len(xs) == 0:
+            return EMPTY
+        key = (origin.x, origin.y, self.version, xs.tobytes(), ys.tobytes())
+        targets = self._enemies.get(key)
+        if targets is None:
+            costs = self.fields.from_position(origin).costs_at(xs, ys)
+            order = self.view.rank(origin, xs, ys, -costs)
+            targets = Targets(xs[order], ys[order])
+            self._remember(self._enemies, key, targets)
+        else:
+            self._enemies.move_to_end(key)
+        return targets
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        while len(cache) > self.size:
+            cache.popitem(last=False)
+
+    def _costs(self, origin: Position) -> np.ndarray:
+        static = self.static
+        costs = self.fields.from_position(origin).costs_at(static.nutrient_xs, static.nutrient_ys)
+        return np.minimum(costs, static.width * static.height)
+
+    def _pack(self, costs: np.ndarray, distances: np.ndarray, tiles: np.ndarray) -> np.ndarray:
+        static = self.static
+        span = static.width + static.height
+        return (costs * span + distances) * len(static.nutrient_xs) + tiles
+
+    def _rank(self, origin: Position) -> _Ranking:
+        static = self.static
+        costs = self._costs(origin)
+        distances = (np.abs(static.nutrient_xs - origin.x) + np.abs(static.nutrient_ys - origin.y)).astype(np.int64)
+        keys = self._pack(costs, distances, np.arange(len(costs), dtype=np.int64))
+        keys.sort()
+        return _Ranking(costs, distances, keys)
+
+    def _repair(self, ranking: _Ranking, origin: Position):
+        costs = self._costs(origin)
+        changed = np.flatnonzero(costs != ranking.costs)
+        if len(changed) == 0:
+            return
+        if len(changed) > REPAIR_LIMIT * len(costs):
+            fresh = self._rank(origin)
+            ranking.costs, ranking.keys = fresh.costs, fresh.keys
+            return
+        # Take the changed tiles out of the sorted keys and put them back where their new cost belongs
+        old_keys = self._pack(ranking.costs[changed], ranking.distances[changed], changed)
+        keys = np.delete(ranking.keys, np.searchsorted(ranking.keys, old_keys))
+        new_keys = np.sort(self._pack(costs[changed], ranking.distances[changed], changed))
+        ranking.keys = np.insert(keys, np.searchsorted(keys, new_keys), new_keys)
+        ranking.costs = costs
+
+
+_cache = TargetCache()
+
+
+def target_cache(game_message: TeamGameState) -> TargetCache:
+    """The target cache, synced with the current tick."""
+    _cache.sync(world_state(game_message), distance_fields(game_message))
+    return _cache
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+"""Per-tick timings written to a rotating JSONL trace, with a sampling profiler on chosen ticks.
+
+Switched on with environment variables (everything is a no-op otherwise):
+    TELEMETRY_TRACE=trace.jsonl        where to write one line per tick
+    TELEMETRY_MAX_MB=10                size of a trace file before it rotates (trace.jsonl.1, .2, ...)
+    TELEMETRY_BACKUPS=3                rotated files kept
+    TELEMETRY_PROFILE_TICKS=50,200-210 ticks to sample (stacks saved as trace.jsonl.tick<N>.folded)
+    TELEMETRY_SAMPLE_MS=1              time between two samples
+
+The profiler samples the stack on a wall-clock timer (SIGALRM) instead of tracing every call like cProfile
+does, so a profiled tick runs at its usual speed and its timings stay comparable to the others. Wall-clock time,
+like the tick budget: time spent waiting shows up too. Stacks are saved in the collapsed format of flame graph
+tools (flamegraph.pl, speedscope), one "caller;callee;... samples" per line.
+
+Stage names are dotted: "plan.strategie.moves" is a phase of "plan.strategie", itself part of "plan".
+
+    python telemetry.py trace.jsonl [--top 10]                # slowest ticks and what made them slow
+    python telemetry.py trace.jsonl.tick50.folded [--top 10]  # where a profiled tick spent its time
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import statistics
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+
+def parse_ticks(spec: str) -> set[int]:
+    """"50,200-210" -> {50, 200, 201, ..., 210}"""
+    ticks = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        first, _, last = part.partition("-")
+        ticks.update(range(int(first), int(last or first) + 1))
+    return ticks
+
+
+class _Stage:
+    __slots__ = ("telemetry", "name", "start")
+
+    def __init__(self, telemetry: "Telemetry", name: str):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.telemetry.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class StackSampler:
+    """Counts the stacks the main thread is in, one sample every `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._names: dict[CodeType, str] = {}
+        self._previous = None
+
+    def start(self) -> bool:
+        """False where SIGALRM can't be used: off the main thread (EXECUTION_MODE=thread), or on Windows."""
+        if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+            return False
+        self._previous = signal.signal(signal.SIGALRM, self._sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        return True
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self._previous or signal.SIG_DFL)
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            name = self._names.get(code)
+            if name is None:
+                name = self._names[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            names.append(name)
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w") as out:
+            for stack, count in self.stacks.most_common():
+                out.write(f"{stack} {count}\n")
+
+
+class Telemetry:
+    """Collects the stage timings of the current tick and appends them to the trace when the tick ends."""
+
+    def __init__(self, path: Optional[str], max_bytes: int = 10 * 1024 * 1024, backups: int = 3,
+                 profile_ticks: frozenset[int] = frozenset(), sample_interval: float = 0.001):
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.profile_ticks = profile_ticks
+        self.sample_interval = sample_interval
+        self._file = None
+        self._record: Optional[dict] = None
+        self._start = 0.0
+        self._profiler: Optional[StackSampler] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def begin(self):
+        """Starts the record of a new tick (call it before waiting for the frame)."""
+        if self.path is None:
+            return
+        self._record = {"tick": None, "stages": {}}
+        self._start = time.perf_counter()
+
+    def tick(self, tick: int):
+        """Names the current record; the rest of the tick is sampled if it is a chosen tick."""
+        if self._record is None:
+            return
+        self._record["tick"] = tick
+        if tick in self.profile_ticks:
+            profiler = StackSampler(self.sample_interval)
+            if profiler.start():
+                self._profiler = profiler
+            else:
+                log.warning("Tick %d not profiled: the sampler only runs on the main thread", tick)
+
+    def stage(self, name: str):
+        """Context manager timing a stage of the current tick."""
+        if self._record is None:
+            return _NO_STAGE
+        return _Stage(self, name)
+
+    def add(self, name: str, seconds: float):
+        if self._record is not None:
+            stages = self._record["stages"]
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def end(self):
+        """Closes the record of the tick and appends it to the trace."""
+        record = self._record
+        if record is None:
+            return
+        self._record = None
+        # Waiting for the frame is not tick time
+        record["total"] = time.perf_counter() - self._start - record["stages"].get("recv", 0.0)
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler.dump(f"{self.path}.tick{record['tick']}.folded")
+            record["profiled"] = True
+            self._profiler = None
+        self._write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _write(self, line: str):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(line)
+        # One line per tick: flushing keeps the trace complete if the bot gets killed
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            older = Path(f"{self.path}.{i}")
+            if older.exists():
+                older.replace(f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            self.path.replace(f"{self.path}.1")
+        else:
+            self.path.unlink()
+
+    def close(self):
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_telemetry: Optional[Telemetry] = None
+
+
+def telemetry() -> Telemetry:
+    """The process-wide Telemetry, configured from the environment on first use."""
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = Telemetry(
+            os.environ.get("TELEMETRY_TRACE") or None,
+            max_bytes=int(float(os.environ.get("TELEMETRY_MAX_MB", "10")) * 1024 * 1024),
+            backups=int(os.environ.get("TELEMETRY_BACKUPS", "3")),
+            profile_ticks=frozenset(parse_ticks(os.environ.get("TELEMETRY_PROFILE_TICKS", ""))),
+            sample_interval=float(os.environ.get("TELEMETRY_SAMPLE_MS", "1")) / 1000,
+        )
+    return _telemetry
+
+
+def phase(name: str):
+    """Times a phase of the bot: `with phase("plan.strategie.moves"): ...`"""
+    return telemetry().stage(name)
+
+
+def load_trace(path) -> list[dict]:
+    """Records of a trace, rotated files included, oldest first."""
+    path = Path(path)
+    files = sorted(path.parent.glob(f"{path.name}.[0-9]*"), key=lambda p: -int(p.suffix[1:]))
+    records = []
+    for file in [*files, path]:
+        if file.exists():
+            with open(file) as lines:
+                records.extend(json.loads(line) for line in lines if line.strip())
+    return records
+
+
+def _culprit(stages: dict[str, float], parent: str = "") -> list[tuple[str, float]]:
+    """Chain of the slowest stage, then its slowest phase, and so on."""
+    depth = parent.count(".") + 1 if parent else 0
+    children = {name: seconds for name, seconds in stages.items()
+                if name.count(".") == depth and name.startswith(parent) and name != "recv"}
+    if not children:
+        return []
+    name = max(children, key=children.get)
+    return [(name, children[name]), *_culprit(stages, name + ".")]
+
+
+def report(records: list[dict], top: int = 10):
+    if not records:
+        print("empty trace")
+        return
+    totals = [record["total"] for record in records]
+    cuts = statistics.quantiles(totals, n=100, method="inclusive") if len(totals) > 1 else totals * 99
+    print(f"{len(records)} ticks: p50 {cuts[49] * 1e3:.1f} ms, p95 {cuts[94] * 1e3:.1f} ms, "
+          f"p99 {cuts[98] * 1e3:.1f} ms, max {max(totals) * 1e3:.1f} ms")
+
+    names = sorted({name for record in records for name in record["stages"]})
+    print(f"\n{'stage':>32} {'mean ms':>9} {'max ms':>9}")
+    for name in names:
+        values = [record["stages"].get(name, 0.0) for record in records]
+        print(f"{name:>32} {statistics.fmean(values) * 1e3:9.2f} {max(values) * 1e3:9.2f}")
+
+    print(f"\nslowest {top} ticks:")
+    for record in sorted(records, key=lambda r: r["total"], reverse=True)[:top]:
+        chain = " > ".join(f"{name} {seconds * 1e3:.1f} ms" for name, seconds in _culprit(record["stages"]))
+        profiled = "  (profiled)" if record.get("profiled") else ""
+        print(f"  tick {record['tick']}: {record['total'] * 1e3:.1f} ms   {chain}{profiled}")
+
+
+def report_stacks(path, top: int = 10):
+    """Functions of a profiled tick with the most samples: on top of the stack (self) and anywhere in it."""
+    own, anywhere = Counter(), Counter()
+    with open(path) as lines:
+        for line in lines:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            names = stack.split(";")
+            own[names[-1]] += int(count)
+            for name in set(names):
+                anywhere[name] += int(count)
+    total = sum(own.values())
+    if not total:
+        print("no samples")
+        return
+    for title, counter in (("self", own), ("total", anywhere)):
+        print(f"\n{total} samples, {title}:")
+        for name, count in counter.most_common(top):
+            print(f"  {count / total:6.1%}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="a trace, or the stacks of a profiled tick (.folded)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    if args.trace.endswith(".folded"):
+        report_stacks(args.trace, args.top)
+    else:
+        report(load_trace(args.trace), args.top)
+
+
+if __name__ == "__main__":
+    main()
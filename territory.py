@@ -0,0 +1,198 @@
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import GridView, StaticMap
+from pathfinding import neighbours_table
+from world_state import WorldState, world_state
+
+OUTSIDE = -1
+"""Neighbour index of the tiles past the edge of the map. The masks have one more cell for it, always False."""
+
+
+class Territory:
+    """Our territory and its borders, updated from the tiles that changed owner (the WorldDiff) instead of rescanned.
+
+    Tiles are flat indices (y * width + x). Per tile, in O(1):
+      - owned: we own it
+      - frontier: we don't own it, but one of its 4-neighbours is ours (where expansion happens)
+      - contested: we own it and one of its 4-neighbours belongs to another team (where we can lose it)
+    Connected groups of owned tiles are kept in a union-find: gaining a tile merges groups, losing one
+    splits only the group it was in.
+    """
+
+    def __init__(self):
+        self.static: Optional[StaticMap] = None
+        self.view: Optional[GridView] = None
+        self.version = -1
+        """Version of the world state applied last."""
+        self.my_code = -1
+        self.income = 0
+        """Nutrients per tick generated by the tiles we own."""
+        self.owned_count = 0
+        self.owned = np.zeros(1, dtype=bool)
+        self.frontier = np.zeros(1, dtype=bool)
+        self.contested = np.zeros(1, dtype=bool)
+        self._around = np.zeros((0, 4), dtype=np.intp)
+        self._neighbours: list[tuple[int, ...]] = []
+        self._by_value = np.zeros(0, dtype=np.intp)
+        self._value_rank = np.zeros(0, dtype=np.intp)
+        self._frontier_by_value = np.zeros(0, dtype=bool)
+        self._parent: list[int] = []
+        self._members: dict[int, set[int]] = {}
+
+    def sync(self, world: WorldState):
+        if world.version == self.version:
+            return
+        view, diff = world.view, world.diff
+        ownership = view.ownership.ravel()
+        if diff.full_rebuild or diff.base != self.version:
+            self._rebuild(view.static, view.my_code, ownership)
+        elif len(diff.flipped):
+            self._apply(diff.flipped, diff.gained, diff.lost, ownership)
+        self.version = world.version
+        self.view = view
+
+    # --- queries -----------------------------------------------------------------------------------------
+
+    def is_owned(self, x: int, y: int) -> bool:
+        return bool(self.owned[y * self.static.width + x])
+
+    def is_frontier(self, x: int, y: int) -> bool:
+        return bool(self.frontier[y * self.static.width + x])
+
+    def is_contested(self, x: int, y: int) -> bool:
+        return bool(self.contested[y * self.static.width + x])
+
+    def frontier_by_value(self, limit: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """(xs, ys) of the frontier tiles, most nutrients first (row-major order among equals)."""
+        tiles = self._by_value[np.flatnonzero(self._frontier_by_value)[:limit]]
+        return tiles % self.static.width, tiles // self.static.width
+
+    def component(self, x: int, y: int) -> int:
+        """Id of the connected group of owned tiles (x, y) is in, -1 if we don't own it."""
+        tile = y * self.static.width + x
+        return self._find(tile) if self.owned[tile] else -1
+
+    def component_sizes(self) -> dict[int, int]:
+        return {root: len(members) for root, members in self._members.items()}
+
+    # --- updates -----------------------------------------------------------------------------------------
+
+    def _rebuild(self, static: StaticMap, my_code: int, ownership: np.ndarray):
+        self.static = static
+        self.my_code = my_code
+        size = static.width * static.height
+        self._neighbours = neighbours_table(static.width, static.height)
+        tiles = np.arange(size)
+        xs, ys = tiles % static.width, tiles // static.width
+        self._around = np.stack([
+            np.where(xs > 0, tiles - 1, OUTSIDE),
+            np.where(xs < static.width - 1, tiles + 1, OUTSIDE),
+            np.where(ys > 0, tiles - static.width, OUTSIDE),
+            np.where(ys < static.height - 1, tiles + static.width, OUTSIDE),
+        ], axis=1)
+        # Static nutrients: the nutrient tiles come ranked by value from the map analysis, the others follow
+        self._by_value = np.concatenate([static.analysis.by_value, np.flatnonzero(~static.nutrient_mask.ravel())])
+        self._value_rank = np.empty(size, dtype=np.intp)
+        self._value_rank[self._by_value] = np.arange(size)
+
+        self.owned = np.zeros(size + 1, dtype=bool)
+        self.owned[:size] = ownership == my_code
+        self.owned_count = int(self.owned.sum())
+        self.income = int(static.nutrients.ravel()[self.owned[:size]].sum())
+        self.frontier = np.zeros(size + 1, dtype=bool)
+        self.contested = np.zeros(size + 1, dtype=bool)
+        self._frontier_by_value = np.zeros(size, dtype=bool)
+        self._refresh(np.arange(size), ownership)
+
+        self._parent = list(range(size))
+        self._members = {}
+        self._add(np.flatnonzero(self.owned[:size]).tolist())
+
+    def _apply(self, changed: np.ndarray, gained: np.ndarray, lost: np.ndarray, ownership: np.ndarray):
+        if len(gained) or len(lost):
+            nutrients = self.static.nutrients.ravel()
+            self.owned[gained] = True
+            self.owned[lost] = False
+            self.owned_count += len(gained) - len(lost)
+            self.income += int(nutrients[gained].sum()) - int(nutrients[lost].sum())
+        # Any owner change can flip the frontier/contested state of the tile and of its neighbours
+        around = self._around[changed].ravel()
+        self._refresh(np.unique(np.concatenate([changed, around[around != OUTSIDE]])), ownership)
+
+        if len(lost):
+            self._split(lost.tolist())
+        self._add(gained.tolist())
+
+    def _refresh(self, tiles: np.ndarray, ownership: np.ndarray):
+        owned = self.owned
+        around = self._around[tiles]
+        padded = np.append(ownership, self.static.teams.neutral)
+        neighbour_owners = padded[around]
+        enemy_around = ((neighbour_owners != self.my_code) & (neighbour_owners != self.static.teams.neutral)).any(axis=1)
+        mine = owned[tiles]
+        frontier = ~mine & owned[around].any(axis=1)
+        self.frontier[tiles] = frontier
+        self.contested[tiles] = mine & enemy_around
+        self._frontier_by_value[self._value_rank[tiles]] = frontier
+
+    def _find(self, tile: int) -> int:
+        parent = self._parent
+        while parent[tile] != tile:
+            parent[tile] = parent[parent[tile]]
+            tile = parent[tile]
+        return tile
+
+    def _add(self, gained: list[int]):
+        """Newly owned tiles: each starts as its own group, then merges with the groups of its owned neighbours."""
+        for tile in gained:
+            self._parent[tile] = tile
+            self._members[tile] = {tile}
+        owned, parent, members = self.owned, self._parent, self._members
+        for tile in gained:
+            for neighbour in self._neighbours[tile]:
+                if not owned[neighbour]:
+                    continue
+                a, b = self._find(tile), self._find(neighbour)
+                if a == b:
+                    continue
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                parent[b] = a
+                members[a] |= members.pop(b)
+
+    def _split(self, lost: list[int]):
+        """Regroups what is left of every group that lost tiles (only those groups are touched)."""
+        roots = {self._find(tile) for tile in lost}
+        left = set()
+        for root in roots:
+            left |= self._members.pop(root)
+        left.difference_update(lost)
+        for tile in lost:
+            self._parent[tile] = tile
+        for tile in left:
+            self._parent[tile] = tile
+        while left:
+            start = left.pop()
+            group = {start}
+            stack = [start]
+            while stack:
+                tile = stack.pop()
+                for neighbour in self._neighbours[tile]:
+                    if neighbour in left:
+                        left.discard(neighbour)
+                        group.add(neighbour)
+                        self._parent[neighbour] = start
+                        stack.append(neighbour)
+            self._members[start] = group
+
+
+_territory = Territory()
+
+
+def territory(game_message: TeamGameState) -> Territory:
+    """Our territory, synced with the current tick."""
+    _territory.sync(world_state(game_message))
+    return _territory
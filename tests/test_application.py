@@ -0,0 +1,36 @@
+import asyncio
+import functools
+
+from websockets.exceptions import ConnectionClosedOK
+from websockets.frames import Close
+
+import application
+import transport
+from benchmarks.fixtures import synthetic_state_bytes
+from bot import Bot
+
+
+class ClosingTransport:
+    """One frame, then the server closes the connection while the bot is planning."""
+
+    def __init__(self):
+        self.frames = [synthetic_state_bytes(12, 12, teams=2, spores_per_team=3)]
+
+    async def recv(self, decode=False):
+        if not self.frames:
+            raise ConnectionClosedOK(Close(1000, ""), Close(1000, ""), True)
+        return self.frames.pop()
+
+    async def send(self, message, arrival=None):
+        raise ConnectionClosedOK(Close(1000, ""), Close(1000, ""), True)
+
+
+def test_game_loop_ends_when_the_connection_closes_on_send():
+    asyncio.run(application.game_loop(ClosingTransport(), Bot()))
+
+
+def test_run_exits_when_the_server_cannot_be_reached(monkeypatch):
+    monkeypatch.setattr(transport, "RECONNECT_ATTEMPTS", 1)
+    # Nothing listens on the discard port
+    monkeypatch.setattr(application, "Transport", functools.partial(transport.Transport, uri="ws://127.0.0.1:9"))
+    asyncio.run(application.run())
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from assignment import BIOMASS_WEIGHT, assign, greedy, hungarian, travel_costs
+from bot import Bot
+from game_message import Position
+from pathfinding import distance_fields, zero_one_bfs
+from simulator import LocalGame
+
+
+def brute_force(cost: np.ndarray) -> float:
+    """Cheapest total cost of giving min(rows, columns) rows each a column of its own."""
+    n, m = cost.shape
+    if n <= m:
+        return min(cost[np.arange(n), list(columns)].sum() for columns in itertools.permutations(range(m), n))
+    return brute_force(cost.T)
+
+
+def total(cost: np.ndarray, columns: np.ndarray) -> float:
+    rows = np.flatnonzero(columns >= 0)
+    return cost[rows, columns[rows]].sum()
+
+
+def check_valid(cost: np.ndarray, columns: np.ndarray):
+    n, m = cost.shape
+    assert columns.shape == (n,)
+    assigned = columns[columns >= 0]
+    assert len(assigned) == min(n, m)
+    assert len(set(assigned.tolist())) == len(assigned)
+    assert assigned.max(initial=-1) < m
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_hungarian_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n, m = rng.integers(1, 7, size=2)
+    cost = rng.integers(0, 20, size=(n, m)).astype(np.float64)
+    columns = hungarian(cost)
+    check_valid(cost, columns)
+    assert total(cost, columns) == brute_force(cost)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_greedy_is_valid_and_never_beats_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n, m = rng.integers(1, 7, size=2)
+    cost = rng.integers(0, 20, size=(n, m)).astype(np.float64)
+    columns = greedy(cost, candidates=int(rng.integers(1, 4)))
+    check_valid(cost, columns)
+    assert total(cost, columns) >= brute_force(cost)
+
+
+def test_assign_switches_to_greedy_above_the_exact_limit():
+    rng = np.random.default_rng(0)
+    cost = rng.integers(0, 20, size=(6, 5)).astype(np.float64)
+    assert np.array_equal(assign(cost, exact_limit=5), hungarian(cost))
+    assert np.array_equal(assign(cost, exact_limit=4), greedy(cost))
+
+
+def test_assign_goes_greedy_once_the_deadline_has_passed():
+    rng = np.random.default_rng(1)
+    cost = rng.integers(0, 20, size=(6, 5)).astype(np.float64)
+    assert hungarian(cost, deadline=0.0) is None
+    assert hungarian(cost.T, deadline=0.0) is None
+    assert np.array_equal(assign(cost, deadline=0.0), greedy(cost))
+
+
+def test_empty():
+    assert hungarian(np.zeros((0, 3))).shape == (0,)
+    assert np.array_equal(hungarian(np.zeros((2, 0))), [-1, -1])
+    assert np.array_equal(greedy(np.zeros((2, 0))), [-1, -1])
+
+
+
+def test_travel_costs_count_the_cheapest_biomass_path():
+    random.seed(3)
+    game = LocalGame(["us", "them"], 20, 20, seed=3)
+    bot = Bot()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(40):
+            game.step({"us": bot.get_next_move(game.state_for("us")), "them": []})
+    state = game.state_for("us")
+    spores = state.world.teamInfos["us"].spores
+    targets = [Position(x, y) for x in range(0, 20, 3) for y in range(0, 20, 4)]
+    cost = travel_costs(state, spores, targets)
+    fields = distance_fields(state)
+    assert len(spores) > 1
+    for row, spore in enumerate(spores):
+        own = zero_one_bfs(fields.costs, fields.neighbours, (spore.position.y * 20 + spore.position.x,))
+        expected = [abs(spore.position.x - target.x) + abs(spore.position.y - target.y)
+                    + BIOMASS_WEIGHT * own[target.y * 20 + target.x] for target in targets]
+        assert cost[row].tolist() == expected
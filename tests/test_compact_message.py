@@ -0,0 +1,45 @@
+import msgspec
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import synthetic_state, synthetic_state_bytes
+from compact_message import CompactDecoder, _int_grid
+from game_message import TeamGameState
+
+
+def _check_same(compact, state: TeamGameState):
+    assert np.array_equal(compact.world.biomassGrid, np.array(state.world.biomassGrid))
+    assert np.array_equal(compact.world.map.nutrientGrid, np.array(state.world.map.nutrientGrid))
+    codes = compact.world.teamCodes
+    assert [[codes.team_id(code) for code in row] for row in compact.world.ownershipGrid.tolist()] == \
+        state.world.ownershipGrid
+    assert compact.world.spores == state.world.spores
+    assert compact.world.spawners == state.world.spawners
+    assert compact.world.teamInfos == state.world.teamInfos
+    assert (compact.tick, compact.yourTeamId, compact.teamIds) == (state.tick, state.yourTeamId, state.teamIds)
+
+
+@pytest.mark.parametrize("width, height, teams", [(1, 1, 1), (20, 7, 2), (60, 60, 4)])
+def test_compact_decode_matches_the_default_one(width, height, teams):
+    message = synthetic_state_bytes(width, height, teams=teams)
+    _check_same(CompactDecoder().decode(message), msgspec.json.decode(message, type=TeamGameState))
+
+
+def test_ids_that_look_like_the_end_of_the_grid_fall_back_to_a_full_decode():
+    state = synthetic_state(9, 5, teams=2)
+    odd, replaced = "team]]x", state["teamIds"][1]
+    state["teamIds"][1] = odd
+    for row in state["world"]["ownershipGrid"]:
+        row[:] = [odd if owner == replaced else owner for owner in row]
+    # Pretty-printed too: the grid isn't where the fast path looks for it
+    for message in (msgspec.json.encode(state), msgspec.json.format(msgspec.json.encode(state), indent=2)):
+        _check_same(CompactDecoder().decode(message), msgspec.json.decode(message, type=TeamGameState))
+
+
+def test_int_grid_reads_numbers_of_any_length_and_layout():
+    assert _int_grid(b"[[0,7],[12,123456789]]", 2, 2).tolist() == [[0, 7], [12, 123456789]]
+    assert _int_grid(b"[ [ 10 , 2 ] ,\n [3,40] ]", 2, 2).tolist() == [[10, 2], [3, 40]]
+    # Out of the fast path's reach: a sign, more digits than int32 safely holds
+    assert _int_grid(b"[[1,-2],[3,4]]", 2, 2).tolist() == [[1, -2], [3, 4]]
+    assert _int_grid(b"[[1234567890,0],[0,1]]", 2, 2).tolist() == [[1234567890, 0], [0, 1]]
+    assert _int_grid(b"[]", 0, 0).shape == (0, 0)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from map_analysis import CLUSTER_MIN_NUTRIENTS, MapAnalysis, analyse, load
+
+
+def _flood_fill_regions(nutrients: np.ndarray) -> list[set[int]]:
+    height, width = nutrients.shape
+    rich = nutrients.ravel() >= CLUSTER_MIN_NUTRIENTS
+    seen, regions = set(), []
+    for start in np.flatnonzero(rich).tolist():
+        if start in seen:
+            continue
+        region, stack = {start}, [start]
+        seen.add(start)
+        while stack:
+            tile = stack.pop()
+            x, y = tile % width, tile // width
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                neighbour = ny * width + nx
+                if 0 <= nx < width and 0 <= ny < height and rich[neighbour] and neighbour not in seen:
+                    seen.add(neighbour)
+                    region.add(neighbour)
+                    stack.append(neighbour)
+        regions.append(region)
+    return regions
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_regions_match_a_flood_fill(seed):
+    rng = np.random.default_rng(seed)
+    nutrients = rng.choice([0, 0, 1, 5, 10, 25], size=rng.integers(1, 30, size=2)).astype(np.int32)
+    analysis = MapAnalysis.compute(nutrients)
+    regions = _flood_fill_regions(nutrients)
+    labels = analysis.cluster_labels.ravel()
+    found = [set(np.flatnonzero(labels == label).tolist()) for label in range(len(analysis.cluster_sizes))]
+    assert sorted(map(sorted, found)) == sorted(map(sorted, regions))
+    totals = [int(nutrients.ravel()[list(region)].sum()) for region in found]
+    assert totals == analysis.cluster_nutrients.tolist()
+    assert totals == sorted(totals, reverse=True)
+    for label, region in enumerate(found):
+        width = nutrients.shape[1]
+        assert analysis.cluster_ys[label] * width + analysis.cluster_xs[label] in region
+
+
+def test_analysis_is_saved_once_and_loaded_memory_mapped(tmp_path):
+    nutrients = np.random.default_rng(0).choice([0, 1, 5, 25], size=(12, 17)).astype(np.int32)
+    assert load(nutrients, tmp_path) is None
+    computed = analyse(nutrients, tmp_path)
+    loaded = load(nutrients, tmp_path)
+    assert isinstance(loaded.by_value, np.memmap)
+    for name, array in computed.arrays().items():
+        assert np.array_equal(getattr(loaded, name), array)
+    assert load(nutrients + 1, tmp_path) is None
+    assert loaded.rect_sum(2, 3, 9, 7) == int(nutrients[3:8, 2:10].sum())
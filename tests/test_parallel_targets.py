@@ -0,0 +1,25 @@
+import msgspec
+
+from benchmarks.fixtures import synthetic_state_bytes
+from game_message import Position, TeamGameState
+from parallel_targets import ParallelTargets
+from pathfinding import DistanceFieldCache, zero_one_bfs
+from world_state import WorldState
+
+
+def test_pool_fields_match_the_ones_built_in_process():
+    state = msgspec.json.decode(synthetic_state_bytes(30, 20, seed=4), type=TeamGameState)
+    world = WorldState()
+    world.update(state)
+    fields = DistanceFieldCache()
+    fields.sync(world)
+    positions = [Position(0, 0), Position(29, 19), Position(7, 11), Position(7, 11)]
+    pool = ParallelTargets(1)
+    try:
+        pool.build_fields(fields, fields.missing(positions))
+    finally:
+        pool.close()
+    assert fields.missing(positions) == []
+    for position in positions:
+        source = position.y * 30 + position.x
+        assert fields.from_position(position).dist == zero_one_bfs(fields.costs, fields.neighbours, (source,))
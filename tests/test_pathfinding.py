@@ -0,0 +1,60 @@
+import msgspec
+import numpy as np
+import pytest
+
+import pathfinding
+from benchmarks.fixtures import synthetic_state_bytes
+from game_message import TeamGameState
+from pathfinding import DistanceField, DistanceFieldCache, neighbours_table, zero_one_bfs
+from world_state import WorldState
+
+
+@pytest.mark.parametrize("limit", [pathfinding.REPAIR_LIMIT, 1.0])
+@pytest.mark.parametrize("seed", range(30))
+def test_repair_matches_a_full_bfs_after_random_flips(seed, limit, monkeypatch):
+    # With a limit of the whole map every repair is done in place, never by a new search
+    monkeypatch.setattr(pathfinding, "REPAIR_LIMIT", limit)
+    rng = np.random.default_rng(seed)
+    width, height = rng.integers(2, 16, size=2).tolist()
+    size = width * height
+    neighbours = neighbours_table(width, height)
+    costs = (rng.random(size) < rng.random()).astype(int).tolist()
+    sources = tuple(sorted(set(rng.integers(0, size, size=rng.integers(1, 4)).tolist())))
+    field = DistanceField(sources, width, zero_one_bfs(costs, neighbours, sources))
+
+    for _ in range(5):
+        # Ownership flips: some tiles become ours (free to step on), others are lost (cost 1 again)
+        changed = sorted(set(rng.integers(0, size, size=rng.integers(1, max(2, size // 4))).tolist()))
+        new_costs = list(costs)
+        for tile in changed:
+            new_costs[tile] = 1 - new_costs[tile]
+        field.repair(costs, new_costs, neighbours, changed)
+        costs = new_costs
+        assert field.dist == zero_one_bfs(costs, neighbours, sources)
+
+
+def test_zero_one_bfs_walks_free_tiles_for_nothing():
+    # 3 x 1 row: the middle tile is ours (free), the last one isn't
+    neighbours = neighbours_table(3, 1)
+    assert zero_one_bfs([1, 0, 1], neighbours, (0,)) == [0, 0, 1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_team_and_spore_fields_match_their_own_searches(seed):
+    state = msgspec.json.decode(synthetic_state_bytes(30, 20, seed=seed, spawners_per_team=2), type=TeamGameState)
+    world = WorldState()
+    world.update(state)
+    fields = DistanceFieldCache()
+    fields.sync(world)
+    team_id = state.yourTeamId
+    tiles = [thing.position.y * 30 + thing.position.x
+             for thing in state.world.spawners + state.world.spores if thing.teamId == team_id]
+    team = zero_one_bfs(fields.costs, fields.neighbours, tiles)
+    assert fields.from_team(state, team_id).dist == team
+    spores = state.world.teamInfos[team_id].spores
+    for spore, field in zip(spores, fields.from_spores(state, spores)):
+        own = zero_one_bfs(fields.costs, fields.neighbours, (spore.position.y * 30 + spore.position.x,))
+        if field.sources != fields.from_team(state, team_id).sources:
+            assert field.dist == own
+        else:
+            assert all(a <= b for a, b in zip(field.dist, own))
@@ -0,0 +1,12 @@
+import asyncio
+
+from simulator import play_game_loop
+
+
+def test_game_loop_plays_a_local_game_to_the_end():
+    game = asyncio.run(play_game_loop(["us", "them"], 16, 16, max_ticks=20, seed=2))
+    assert game.is_over()
+    assert game.tick == 20
+    # Our COMMANDs went through: the bot starts by building a spawner
+    assert any(spawner.teamId == "us" for spawner in game.spawners.values())
+    assert not game.teams["us"].errors
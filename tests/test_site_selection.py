@@ -0,0 +1,35 @@
+import msgspec
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import synthetic_state_bytes
+from game_message import TeamGameState
+from grid_view import grid_view
+from site_selection import MIN_SPAWNER_DISTANCE, _allowed, _top_sites, site_values
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_sites_are_the_best_of_the_whole_map(seed):
+    state = msgspec.json.decode(synthetic_state_bytes(60, 45, seed=seed, spawners_per_team=seed), type=TeamGameState)
+    my_team = state.world.teamInfos[state.yourTeamId]
+    allowed = _allowed(state, my_team)
+    scored = np.where(allowed, site_values(state), -1).ravel()
+    top = _top_sites(grid_view(state), allowed, 32)
+    assert len(set(top.tolist())) == len(top)
+    expected = np.sort(scored)[::-1][:32]
+    assert np.sort(scored[top])[::-1].tolist() == expected[expected > 0].tolist()
+
+
+def test_spawners_may_stand_exactly_min_spawner_distance_apart():
+    state = msgspec.json.decode(synthetic_state_bytes(30, 30, seed=1, spawners_per_team=1), type=TeamGameState)
+    my_team = state.world.teamInfos[state.yourTeamId]
+    allowed = _allowed(state, my_team)
+    spawner = my_team.spawners[0].position
+    taken = {(other.position.x, other.position.y) for other in state.world.spawners}
+    ys, xs = np.mgrid[0:30, 0:30]
+    squared = (xs - spawner.x) ** 2 + (ys - spawner.y) ** 2
+    assert not allowed[squared < MIN_SPAWNER_DISTANCE ** 2].any()
+    on_ring = squared == MIN_SPAWNER_DISTANCE ** 2
+    ring = list(zip(xs[on_ring].tolist(), ys[on_ring].tolist()))
+    assert ring
+    assert all(allowed[y, x] for x, y in ring if (x, y) not in taken)
@@ -0,0 +1,20 @@
+import random
+
+import pytest
+
+from game_message import Position, Spawner
+from spatial_index import SCAN_LIMIT, Buckets
+
+
+@pytest.mark.parametrize("count", [0, 1, SCAN_LIMIT, SCAN_LIMIT + 1, 200])
+def test_nearest_matches_a_sort_of_every_entity(count):
+    rng = random.Random(count)
+    spawners = [Spawner(f"s{i}", "team", Position(rng.randrange(300), rng.randrange(300))) for i in range(count)]
+    buckets = Buckets(spawners)
+    for _ in range(20):
+        origin = Position(rng.randrange(300), rng.randrange(300))
+        k = rng.randrange(1, 6)
+        # Ties go to the first in the list, like a stable sort
+        expected = sorted(spawners, key=lambda s: abs(s.position.x - origin.x) + abs(s.position.y - origin.y))[:k]
+        assert buckets.nearest(origin, k) == expected
+        assert buckets.closest(origin) == (expected[0] if expected else None)
@@ -0,0 +1,27 @@
+import json
+import time
+
+from telemetry import Telemetry
+
+
+def spin(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profiled_tick_saves_the_sampled_stacks(tmp_path):
+    trace = Telemetry(str(tmp_path / "trace.jsonl"), profile_ticks=frozenset({7}))
+    for tick in (6, 7):
+        trace.begin()
+        trace.tick(tick)
+        spin(0.05)
+        trace.end()
+    trace.close()
+
+    records = [json.loads(line) for line in open(tmp_path / "trace.jsonl")]
+    assert [record.get("profiled", False) for record in records] == [False, True]
+    assert not (tmp_path / "trace.jsonl.tick6.folded").exists()
+    stacks = (tmp_path / "trace.jsonl.tick7.folded").read_text().splitlines()
+    assert stacks
+    assert any(line.rpartition(" ")[0].endswith("test_telemetry.py:spin") for line in stacks)
@@ -0,0 +1,92 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+
+import economy
+import entity_store
+import pathfinding
+import territory
+import world_state
+from bot import Bot
+from economy import Economy
+from entity_store import EntityStore
+from pathfinding import DistanceFieldCache
+from simulator import LocalGame
+from territory import Territory
+from world_state import WorldState
+
+
+def _play(ticks: int, seed: int):
+    """States our team gets in a local game against an idle team, with every per-game cache reset first."""
+    world_state._world = WorldState()
+    territory._territory = Territory()
+    entity_store._store = EntityStore()
+    economy._economy = Economy()
+    pathfinding._cache = DistanceFieldCache()
+    random.seed(seed)
+    game = LocalGame(["us", "them"], 24, 24, seed=seed)
+    bot = Bot()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ticks):
+            state = game.state_for("us")
+            yield state
+            game.step({"us": bot.get_next_move(state), "them": []})
+
+
+def _columns(store: EntityStore) -> dict:
+    table = store.spores
+    return {spore_id: (int(table.x[h]), int(table.y[h]), int(table.team[h]), int(table.biomass[h]))
+            for spore_id, h in table.handles.items()}
+
+
+def test_consumers_of_the_diff_match_a_rebuild():
+    for state in _play(60, seed=3):
+        ours = territory.territory(state)
+        fresh = Territory()
+        fresh.sync(world_state.world_state(state))
+        assert ours.income == fresh.income
+        assert ours.owned_count == fresh.owned_count
+        assert np.array_equal(ours.frontier, fresh.frontier)
+        assert np.array_equal(ours.contested, fresh.contested)
+
+        store = entity_store.entity_store(state)
+        rebuilt = EntityStore()
+        rebuilt.sync(world_state.world_state(state))
+        assert _columns(store) == _columns(rebuilt)
+        assert set(store.spawners.handles) == {spawner.id for spawner in state.world.spawners}
+
+        fields = pathfinding.distance_fields(state)
+        assert fields.costs == pathfinding.step_costs(world_state.world_state(state).view)
+        ours_team = state.world.teamInfos[state.yourTeamId]
+        # Kept from tick to tick, repaired the first time they are asked for
+        for spawner in ours_team.spawners:
+            field = fields.from_position(spawner.position)
+            assert field.dist == pathfinding.zero_one_bfs(fields.costs, fields.neighbours, field.sources)
+
+        if ours_team.spawners:
+            kept = economy.economy(state)
+            other = Economy()
+            other.sync(state)
+            for a, b in zip(kept._surroundings(ours_team.spawners), other._surroundings(ours_team.spawners)):
+                assert np.allclose(a, b)
+
+
+def test_diff_lists_what_changed():
+    previous = None
+    for state in _play(30, seed=5):
+        diff = world_state.world_state(state).diff
+        if previous is None:
+            assert diff.full_rebuild
+        else:
+            before = {spore.id: spore for spore in previous.world.spores}
+            after = {spore.id: spore for spore in state.world.spores}
+            assert {spore.id for spore in diff.spores_appeared} == after.keys() - before.keys()
+            assert {spore.id for spore in diff.spores_disappeared} == before.keys() - after.keys()
+            assert {spore.id for spore, _ in diff.spores_moved} == {
+                spore_id for spore_id in after.keys() & before.keys()
+                if after[spore_id].position != before[spore_id].position}
+            owners = np.array(previous.world.ownershipGrid) != np.array(state.world.ownershipGrid)
+            assert sorted(diff.flipped.tolist()) == np.flatnonzero(owners.ravel()).tolist()
+        previous = state
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""Local tournaments between bot variants, on every core, for tuning the strategy without a server.
+
+A variant is a bot class and environment overrides for it: every tunable of the bot is an environment variable
+(PHASE_SWITCH, SPORE_BIOMASS, PLANNER_NODES, TICK_BUDGET_MS...), read when its module is imported. Every bot
+plays in its own spawned process, which gets the variant's environment before it imports anything, so two
+variants in the same match never share module-level state (entity store, caches, settings).
+
+Each pair of variants plays every seed twice, once from each seat: the map and start positions are the same,
+so neither variant gets the better side of a seed. Matches run in parallel, one per worker process, and every
+finished match is appended to the --out file (JSON lines) as soon as it is done, for runs left overnight.
+
+    python tournament.py --variant base --variant late PHASE_SWITCH=110 --seeds 20
+    python tournament.py --sweep PRODUCTION_MODE=fixed --sweep SPORE_BIOMASS=5,10,20 \
+        --sweep PRODUCTION_THRESHOLD=10,15 --out sweep.jsonl
+    python tournament.py --variant base --variant raw BOT=my_bot:OtherBot --size 30 --ticks 500
+
+A variant is NAME followed by KEY=VALUE overrides; BOT=module:Class picks another bot class (bot:Bot by
+default). --sweep adds one variant per combination of the values; the default configuration is always in.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import msgspec
+
+from game_message import *
+from simulator import LocalGame, action_from_dict
+
+DEFAULT_BOT = "bot:Bot"
+# Every bot runs single-threaded: the cores go to matches, not to NumPy's thread pools
+SEAT_ENVIRONMENT = {"OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+
+
+@dataclass(slots=True)
+class Variant:
+    name: str
+    environment: dict[str, str] = field(default_factory=dict)
+    """Environment overrides the bot's process starts with."""
+    bot: str = DEFAULT_BOT
+    """Bot class, as module:Class."""
+
+
+@dataclass(slots=True)
+class MatchReport:
+    seed: int
+    seats: list[str]
+    """Variant names in seat order (team ids are the seats, so a variant can play itself)."""
+    ranking: list[str]
+    """Variant names, winner first."""
+    ticks: int
+    tiles: dict[str, int]
+    tick_times: dict[str, list[float]]
+    """Seconds each bot took per tick, from frame to encoded COMMAND, by variant name."""
+    rejected: dict[str, int]
+    """Actions the game refused over the match, by variant name."""
+    failures: dict[str, list[str]]
+    """Why a bot stopped playing (its process died, or it sent something that isn't a COMMAND)."""
+    seconds: float
+
+
+def parse_variant(words: list[str]) -> Variant:
+    """`NAME KEY=VALUE ...`, with BOT=module:Class picking the bot class."""
+    name, *overrides = words
+    environment = {}
+    for override in overrides:
+        key, separator, value = override.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"{override!r} is not KEY=VALUE")
+        environment[key] = value
+    bot = environment.pop("BOT", DEFAULT_BOT)
+    return Variant(name, environment, bot)
+
+
+def sweep_variants(sweeps: list[str]) -> list[Variant]:
+    """One variant per combination of the `KEY=V1,V2,...` sweeps, named after its values."""
+    axes = []
+    for sweep in sweeps:
+        key, _, values = sweep.partition("=")
+        axes.append([(key, value) for value in values.split(",") if value])
+    return [Variant(" ".join(f"{key}={value}" for key, value in combination), dict(combination))
+            for combination in itertools.product(*axes)]
+
+
+def schedule(variants: list[Variant], seeds: range) -> list[tuple[int, Variant, Variant]]:
+    """(seed, first seat, second seat): every pair of variants on every seed, from both seats."""
+    return [(seed, first, second)
+            for one, other in itertools.combinations(variants, 2)
+            for seed in seeds
+            for first, second in ((one, other), (other, one))]
+
+
+# --- seats ----------------------------------------------------------------------------------------------
+
+
+def _seat(connection, variant: Variant):
+    """A bot's process: plans every frame it is sent and answers with the COMMAND and the time it took."""
+    # Before any import of the bot: its settings are read from the environment when its modules load
+    os.environ.update(SEAT_ENVIRONMENT)
+    os.environ.update(variant.environment)
+    import importlib
+    import random
+
+    from worker import _Planner
+
+    module, _, name = variant.bot.partition(":")
+    bot_class = getattr(importlib.import_module(module), name)
+    random.seed(connection.recv())
+    planner = _Planner(bot_class())
+    while (message := connection.recv_bytes()) != b"":
+        start = time.perf_counter()
+        payload = planner.plan(message, 0.0)
+        connection.send((payload, time.perf_counter() - start))
+
+
+class _Seats:
+    """The bot processes of one match, asked to plan their frames all at once."""
+
+    def __init__(self, teams: dict[str, Variant], seed: int):
+        context = multiprocessing.get_context("spawn")
+        self.connections = {}
+        self.processes = []
+        self.failures: dict[str, list[str]] = {team_id: [] for team_id in teams}
+        for team_id, variant in teams.items():
+            ours, theirs = context.Pipe()
+            process = context.Process(target=_seat, args=(theirs, variant), name=f"seat-{team_id}", daemon=True)
+            process.start()
+            theirs.close()
+            ours.send(seed)
+            self.connections[team_id] = ours
+            self.processes.append(process)
+
+    def plan(self, states: dict[str, TeamGameState]) -> tuple[dict[str, list[Action]], dict[str, float]]:
+        """Actions and seconds per team; a bot that died plays nothing from then on."""
+        encoder = msgspec.json.Encoder()
+        asked = []
+        for team_id, game_message in states.items():
+            connection = self.connections.get(team_id)
+            if connection is None:
+                continue
+            try:
+                connection.send_bytes(encoder.encode(game_message))
+                asked.append(team_id)
+            except OSError as e:
+                self._lost(team_id, f"bot process gone: {e!r}")
+        actions, seconds = {}, {}
+        for team_id in asked:
+            try:
+                payload, seconds[team_id] = self.connections[team_id].recv()
+                actions[team_id] = [action_from_dict(action) for action in msgspec.json.decode(payload)["actions"]]
+            except (EOFError, OSError) as e:
+                self._lost(team_id, f"bot process gone: {e!r}")
+            except (msgspec.DecodeError, msgspec.ValidationError, KeyError) as e:
+                self.failures[team_id].append(f"bad COMMAND: {e!r}")
+        return actions, seconds
+
+    def _lost(self, team_id: str, error: str):
+        self.failures[team_id].append(error)
+        self.connections.pop(team_id).close()
+
+    def close(self):
+        for connection in self.connections.values():
+            try:
+                connection.send_bytes(b"")
+            except OSError:
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+
+
+def play_match(seed: int, seats: list[Variant], width: int, height: int, max_ticks: int) -> MatchReport:
+    """One match, each bot in its own process. Runs in a tournament worker."""
+    start = time.perf_counter()
+    team_ids = [f"seat-{i}" for i in range(len(seats))]
+    game = LocalGame(team_ids, width, height, max_ticks, seed)
+    bots = _Seats(dict(zip(team_ids, seats)), seed)
+    tick_times = {team_id: [] for team_id in team_ids}
+    rejected = dict.fromkeys(team_ids, 0)
+    try:
+        while not game.is_over():
+            actions, seconds = bots.plan(game.states())
+            for team_id, spent in seconds.items():
+                tick_times[team_id].append(spent)
+            game.step({team_id: actions.get(team_id, []) for team_id in team_ids})
+            # The game only keeps the errors of the last tick
+            for team_id in team_ids:
+                rejected[team_id] += len(game.teams[team_id].errors)
+    finally:
+        bots.close()
+    names = dict(zip(team_ids, (variant.name for variant in seats)))
+    tiles = game.tiles_controlled()
+    return MatchReport(
+        seed, [variant.name for variant in seats], [names[team_id] for team_id in game.ranking()], game.tick,
+        {names[team_id]: tiles[team_id] for team_id in team_ids},
+        {names[team_id]: tick_times[team_id] for team_id in team_ids},
+        {names[team_id]: rejected[team_id] for team_id in team_ids},
+        {names[team_id]: bots.failures[team_id] for team_id in team_ids if bots.failures[team_id]},
+        time.perf_counter() - start,
+    )
+
+
+# --- tournament -----------------------------------------------------------------------------------------
+
+
+def run_tournament(variants: list[Variant], seeds: range, width: int = 40, height: int = 40, max_ticks: int = 1000,
+                   workers: Optional[int] = None, out: Optional[str] = None) -> list[MatchReport]:
+    """Plays the whole schedule on `workers` processes (all cores by default), reporting matches as they end."""
+    names = [variant.name for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"variant names must be unique: {names}")
+    matches = schedule(variants, seeds)
+    reports = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as executor, \
+            open(out or os.devnull, "a") as file:
+        futures = [executor.submit(play_match, seed, [first, second], width, height, max_ticks)
+                   for seed, first, second in matches]
+        for done, future in enumerate(as_completed(futures), 1):
+            report = future.result()
+            reports.append(report)
+            file.write(json.dumps(asdict(report)) + "\n")
+            file.flush()
+            print(f"[{done}/{len(matches)}] seed {report.seed}: {' vs '.join(report.seats)} -> {report.ranking[0]} "
+                  f"({report.ticks} ticks, {report.seconds:.0f} s)", flush=True)
+    return reports
+
+
+@dataclass(slots=True)
+class Standing:
+    name: str
+    games: int = 0
+    wins: int = 0
+    tiles: int = 0
+    tick_times: list[float] = field(default_factory=list)
+    rejected: int = 0
+    failures: int = 0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+
+def standings(reports: list[MatchReport]) -> list[Standing]:
+    """Per variant, best win rate first."""
+    table: dict[str, Standing] = {}
+    for report in reports:
+        for name in report.seats:
+            standing = table.setdefault(name, Standing(name))
+            standing.games += 1
+            standing.wins += report.ranking[0] == name
+            standing.tiles += report.tiles[name]
+            standing.tick_times.extend(report.tick_times[name])
+            standing.rejected += report.rejected[name]
+            standing.failures += name in report.failures
+    return sorted(table.values(), key=lambda standing: (-standing.win_rate, -standing.tiles))
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def print_standings(reports: list[MatchReport]):
+    print(f"\n{'variant':<40} {'games':>5} {'win %':>6} {'tiles':>7} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}"
+          f" {'rejected':>8} {'failed':>6}")
+    for standing in standings(reports):
+        times = sorted(standing.tick_times)
+        print(f"{standing.name:<40} {standing.games:5d} {standing.win_rate * 100:6.1f} "
+              f"{standing.tiles / max(standing.games, 1):7.0f} {_percentile(times, 0.5) * 1e3:7.1f} "
+              f"{_percentile(times, 0.95) * 1e3:7.1f} {_percentile(times, 1.0) * 1e3:7.1f} "
+              f"{standing.rejected / max(standing.games, 1):8.1f} {standing.failures:6d}")
+
+    pairs: dict[tuple[str, str], list[int]] = {}
+    for report in reports:
+        one, other = sorted(report.seats)
+        pairs.setdefault((one, other), [0, 0])[report.ranking[0] != one] += 1
+    if len(pairs) > 1:
+        print("\nhead to head:")
+        for (one, other), (won, lost) in sorted(pairs.items()):
+            print(f"  {one} {won} - {lost} {other}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variant", nargs="+", action="append", default=[], metavar="NAME [KEY=VALUE ...]")
+    parser.add_argument("--sweep", action="append", default=[], metavar="KEY=V1,V2,...")
+    parser.add_argument("--seeds", type=int, default=10, help="maps per pair of variants (each played twice)")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=40)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="matches at once (default: all cores)")
+    parser.add_argument("--out", help="append every match to this JSON lines file as it ends")
+    args = parser.parse_args()
+
+    variants = [parse_variant(words) for words in args.variant]
+    if args.sweep:
+        variants += sweep_variants(args.sweep)
+        if not any(not variant.environment and variant.bot == DEFAULT_BOT for variant in variants):
+            variants.insert(0, Variant("default"))
+    if len(variants) < 2:
+        parser.error("needs at least two variants (--variant, --sweep)")
+
+    start = time.perf_counter()
+    reports = run_tournament(variants, range(args.first_seed, args.first_seed + args.seeds), args.size, args.size,
+                             args.ticks, args.workers, args.out)
+    print_standings(reports)
+    print(f"\n{len(reports)} matches in {time.perf_counter() - start:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
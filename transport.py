@@ -0,0 +1,152 @@
+"""Connection to the game server: raw frames, bounded memory, reconnection, and latency of every tick.
+
+Frames are received as bytes (never decoded to str) and handed to msgspec as they are. Frames bigger than
+MAX_FRAME_MB close the connection instead of being buffered, and at most MAX_QUEUE frames wait for the bot:
+past that, websockets stops reading the socket and the server waits on TCP.
+
+A connection dropped mid-game (anything but a normal close, which is how the server ends a game) is opened
+again and the bot registered again, after an exponential backoff with jitter. So is a first connection the
+server refuses, e.g. when the bot starts before it.
+
+    SERVER_URI=ws://127.0.0.1:8765
+    MAX_FRAME_MB=16          largest frame accepted
+    MAX_QUEUE=4              frames received ahead of the bot
+    RECONNECT_ATTEMPTS=8     attempts in a row before giving up
+    RECONNECT_BASE_MS=100    first backoff, doubled on every attempt up to RECONNECT_MAX_MS=5000
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Optional
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, ConnectionClosedError, ConnectionClosedOK, InvalidHandshake
+from websockets.frames import CloseCode
+
+log = logging.getLogger(__name__)
+
+SERVER_URI = os.environ.get("SERVER_URI", "ws://127.0.0.1:8765")
+MAX_FRAME_BYTES = int(float(os.environ.get("MAX_FRAME_MB", "16")) * 1024 * 1024)
+MAX_QUEUE = int(os.environ.get("MAX_QUEUE", "4"))
+RECONNECT_ATTEMPTS = int(os.environ.get("RECONNECT_ATTEMPTS", "8"))
+RECONNECT_BASE_S = float(os.environ.get("RECONNECT_BASE_MS", "100")) / 1000
+RECONNECT_MAX_S = float(os.environ.get("RECONNECT_MAX_MS", "5000")) / 1000
+# Ticks the latency percentiles are computed over
+LATENCY_WINDOW = 1000
+
+
+class TickLatency:
+    """Time from a frame's arrival to the COMMAND answering it being sent."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.ticks = 0
+        self.worst = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.ticks += 1
+        self.worst = max(self.worst, seconds)
+        self.recent.append(seconds)
+
+    def report(self) -> str:
+        if not self.recent:
+            return "no ticks"
+        recent = sorted(self.recent)
+        p50, p95 = recent[len(recent) // 2], recent[min(int(len(recent) * 0.95), len(recent) - 1)]
+        return (f"recv to send over {self.ticks} ticks: p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+                f"worst {self.worst * 1000:.1f} ms")
+
+
+class Transport:
+    """The websocket to the server, opened (and opened again) on demand.
+
+    Has the `recv` / `send` of a websocket, so the game loop can use it like one: `recv` raises
+    ConnectionClosed only once the game is over, or once the server can't be reached any more.
+    """
+
+    def __init__(self, uri: str = SERVER_URI, token: Optional[str] = None, team_name: str = "MyPythonicBot"):
+        self.uri = uri
+        self.token = token
+        self.team_name = team_name
+        self.latency = TickLatency()
+        self.reconnects = 0
+        self._websocket: Optional[ClientConnection] = None
+        # Receiving and sending can both find the connection lost: only one of them opens the next one
+        self._connecting = asyncio.Lock()
+        # Jitter has its own RNG: the bot's is seeded for replays
+        self._rng = random.Random()
+
+    async def __aenter__(self) -> "Transport":
+        await self._connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def recv(self, decode: Optional[bool] = False) -> bytes:
+        """Next frame, as the bytes received."""
+        while True:
+            websocket = self._websocket
+            try:
+                return await websocket.recv(decode=decode)
+            except ConnectionClosedOK:
+                raise
+            except ConnectionClosedError as e:
+                if e.sent is not None and e.sent.code == CloseCode.MESSAGE_TOO_BIG:
+                    # The server would only send it again
+                    log.error("Frame bigger than %d bytes, giving up (raise MAX_FRAME_MB)", MAX_FRAME_BYTES)
+                    raise
+                log.warning("Connection lost (%s), reconnecting", e)
+                await self._reconnect(websocket)
+
+    async def send(self, message, arrival: Optional[float] = None):
+        """Sends a COMMAND; `arrival` (perf_counter) of the frame it answers counts it in the latency."""
+        websocket = self._websocket
+        try:
+            await websocket.send(message)
+        except ConnectionClosedOK:
+            raise
+        except ConnectionClosedError as e:
+            # That tick is lost; the next frame comes from the new connection
+            log.warning("Connection lost while sending (%s), reconnecting", e)
+            await self._reconnect(websocket)
+            return
+        if arrival is not None:
+            self.latency.add(time.perf_counter() - arrival)
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        log.info("Tick latency: %s (%d reconnects)", self.latency.report(), self.reconnects)
+
+    async def _reconnect(self, lost: ClientConnection):
+        async with self._connecting:
+            if self._websocket is lost:
+                self.reconnects += 1
+                await self._connect()
+
+    async def _connect(self):
+        """Opens the connection and registers, retrying with exponential backoff."""
+        attempts = max(RECONNECT_ATTEMPTS, 1)
+        for attempt in range(attempts):
+            try:
+                self._websocket = await connect(self.uri, max_size=MAX_FRAME_BYTES, max_queue=MAX_QUEUE)
+                await self._websocket.send(json.dumps(self._registration()))
+                return
+            except (OSError, asyncio.TimeoutError, InvalidHandshake, ConnectionClosed) as e:
+                if attempt == attempts - 1:
+                    log.error("Could not connect to %s after %d attempts (%s), giving up", self.uri, attempt + 1, e)
+                    raise ConnectionClosed(None, None) from e
+                delay = min(RECONNECT_BASE_S * 2 ** attempt, RECONNECT_MAX_S) * self._rng.uniform(0.5, 1.0)
+                log.warning("Could not connect to %s (%s), attempt %d/%d, retrying in %.2f s",
+                            self.uri, e, attempt + 1, attempts, delay)
+                await asyncio.sleep(delay)
+
+    def _registration(self) -> dict:
+        if self.token is not None:
+            return {"type": "REGISTER", "token": self.token}
+        return {"type": "REGISTER", "teamName": self.team_name}
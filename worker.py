@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+from bot_logging import setup_logging
+from protocol import encode_command, make_decoder
+from scheduler import TickScheduler
+from telemetry import telemetry
+
+log = logging.getLogger(__name__)
+
+INITIAL_FRAME_BUFFER = 4 * 1024 * 1024
+
+
+class _Planner:
+    """Bot, decoder and scheduler living in the worker (thread or process)."""
+
+    def __init__(self, bot=None):
+        if bot is None:
+            from bot import Bot
+            bot = Bot()
+        self.bot = bot
+        self.decode = make_decoder()
+        self.scheduler = TickScheduler()
+        self.trace = telemetry()
+
+    def plan(self, message, waited: float) -> bytes:
+        # Time already spent since the frame arrived (queueing, IPC) counts against the budget
+        arrival = time.perf_counter() - waited
+        self.trace.begin()
+        self.trace.add("queue", waited)
+        with self.trace.stage("decode"):
+            game_message = self.decode(message)
+        self.trace.tick(game_message.tick)
+        log.info("Playing tick %d", game_message.tick)
+        with self.trace.stage("plan"):
+            actions = self.scheduler.plan(self.bot, game_message, arrival)
+        with self.trace.stage("encode"):
+            payload = encode_command(game_message.tick, actions)
+        self.scheduler.sent(arrival)
+        self.trace.end()
+        if game_message.tick % 100 == 0:
+            log.info("Tick timings: %s", self.scheduler.report())
+        return payload
+
+
+_planner: Optional[_Planner] = None
+_frames: Optional[SharedMemory] = None
+
+
+def _init_planner(bot=None, seed: Optional[int] = None):
+    global _planner
+    # A spawned worker process starts without any logging set up (no-op in the bot's own process)
+    setup_logging()
+    if seed is not None:
+        # Its RNG too (the match recording has the seed)
+        random.seed(seed)
+    _planner = _Planner(bot)
+
+
+def _plan_bytes(message, waited: float) -> bytes:
+    return _planner.plan(message, waited)
+
+
+def _plan_shared(name: str, size: int, waited: float) -> bytes:
+    """Runs in the worker process: decodes the frame straight from the shared memory segment."""
+    global _frames
+    if _frames is None or _frames.name != name:
+        if _frames is not None:
+            _frames.close()
+        # Spawned workers share the parent's resource tracker, the parent unlinks the segment
+        _frames = SharedMemory(name=name)
+    with _frames.buf[:size] as message:
+        return _planner.plan(message, waited)
+
+
+class PlannerWorker:
+    """Runs the bot away from the event loop thread.
+
+    "process": persistent worker process with its own Bot; frames are handed over through shared memory.
+    "thread": a single planner thread using the given Bot (useful when NumPy releases the GIL).
+    One plan is in flight at a time, so the caller decides which frame to plan next (the newest one).
+    """
+
+    def __init__(self, mode: str, bot=None, seed: Optional[int] = None):
+        self.mode = mode
+        self._frames: Optional[SharedMemory] = None
+        self._executor: Executor
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_init_planner,
+                initargs=(None, seed),
+            )
+            self._frames = SharedMemory(create=True, size=INITIAL_FRAME_BUFFER)
+        elif mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+            self._executor.submit(_init_planner, bot).result()
+        else:
+            raise ValueError(f"Unknown execution mode: {mode}")
+
+    async def plan(self, message, waited: float) -> bytes:
+        """Encoded COMMAND payload for this frame."""
+        loop = asyncio.get_running_loop()
+        if self._frames is None:
+            return await loop.run_in_executor(self._executor, _plan_bytes, message, waited)
+
+        if isinstance(message, str):
+            message = message.encode()
+        if len(message) > self._frames.size:
+            self._frames.close()
+            self._frames.unlink()
+            self._frames = SharedMemory(create=True, size=2 * len(message))
+        self._frames.buf[:len(message)] = message
+        return await loop.run_in_executor(self._executor, _plan_shared, self._frames.name, len(message), waited)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._frames is not None:
+            self._frames.close()
+            self._frames.unlink()
+            self._frames = None
@@ -0,0 +1,147 @@
+import itertools
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from game_message import *
+from grid_view import GridView, StaticMap, grid_view
+
+_versions = itertools.count()
+"""Versions of the world, unique across WorldState instances so a stale consumer never matches a fresh one."""
+
+_NO_TILES = np.zeros(0, dtype=np.intp)
+
+
+@dataclass(slots=True)
+class WorldDiff:
+    """What changed between the previous tick and this one."""
+
+    tick: int
+    """Tick of the new state."""
+    base: int = -1
+    """Version of the world this diff applies to (-1 on a full rebuild)."""
+    full_rebuild: bool = False
+    """True on the first tick of a game: everything was (re)built, the fields below are empty."""
+    flipped: np.ndarray = field(default_factory=lambda: _NO_TILES)
+    """Flat indices (y * width + x) of the tiles that changed owner."""
+    owners_before: np.ndarray = field(default_factory=lambda: _NO_TILES)
+    """Team code of each flipped tile last tick."""
+    owners_after: np.ndarray = field(default_factory=lambda: _NO_TILES)
+    """Team code of each flipped tile now."""
+    gained: np.ndarray = field(default_factory=lambda: _NO_TILES)
+    """Flipped tiles that became ours."""
+    lost: np.ndarray = field(default_factory=lambda: _NO_TILES)
+    """Flipped tiles that were ours."""
+    spores_appeared: list[Spore] = field(default_factory=list)
+    """Spores that were not there last tick."""
+    spores_disappeared: list[Spore] = field(default_factory=list)
+    """Spores from last tick that are gone (dead, merged or turned into a spawner)."""
+    spores_moved: list[tuple[Spore, Position]] = field(default_factory=list)
+    """(spore, previous position) for spores that changed tile."""
+    spores_resized: list[tuple[Spore, int]] = field(default_factory=list)
+    """(spore, previous biomass) for spores that stayed on their tile but changed biomass."""
+    spawners_new: list[Spawner] = field(default_factory=list)
+    """Spawners that were not there last tick."""
+    spawners_lost: list[Spawner] = field(default_factory=list)
+    """Spawners from last tick that are gone."""
+
+    def ours_changed(self) -> np.ndarray:
+        """Tiles that became ours or stopped being ours (what changes the step costs)."""
+        if not len(self.gained):
+            return self.lost
+        if not len(self.lost):
+            return self.gained
+        return np.concatenate([self.gained, self.lost])
+
+    def is_empty(self) -> bool:
+        return not (self.full_rebuild or len(self.flipped) or self.spores_appeared or self.spores_disappeared
+                    or self.spores_moved or self.spores_resized or self.spawners_new or self.spawners_lost)
+
+
+class WorldState:
+    """Persistent view of the game, updated from each new TeamGameState with the diff since last tick.
+
+    The ownership grids are compared once, as whole arrays, and the entity lists once, by id; consumers
+    (territory, economy, entity store, distance fields, target cache) apply `diff` instead of rescanning
+    the message. Each of them remembers the `version` it applied last: a diff whose `base` isn't that
+    version skipped a tick for it, and it rebuilds.
+    """
+
+    def __init__(self):
+        self.version = -1
+        self.tick = -1
+        self.game_message: Optional[TeamGameState] = None
+        self.static: Optional[StaticMap] = None
+        self.view: Optional[GridView] = None
+        self.my_code = -1
+        self.spores: dict[str, Spore] = {}
+        self.spawners: dict[str, Spawner] = {}
+        self.diff = WorldDiff(tick=-1, full_rebuild=True)
+
+    def update(self, game_message: TeamGameState) -> WorldDiff:
+        if game_message is self.game_message:
+            return self.diff
+        view = grid_view(game_message)
+        if view.static is not self.static or view.my_code != self.my_code:
+            diff = self._rebuild(game_message, view)
+        else:
+            diff = WorldDiff(tick=game_message.tick, base=self.version)
+            self._diff_ownership(diff, view)
+            self._diff_entities(diff, game_message)
+        self.version = next(_versions)
+        self.tick = game_message.tick
+        self.game_message = game_message
+        self.view = view
+        self.diff = diff
+        return diff
+
+    def _rebuild(self, game_message: TeamGameState, view: GridView) -> WorldDiff:
+        self.static = view.static
+        self.my_code = view.my_code
+        self.spores = {spore.id: spore for spore in game_message.world.spores}
+        self.spawners = {spawner.id: spawner for spawner in game_message.world.spawners}
+        return WorldDiff(tick=game_message.tick, full_rebuild=True)
+
+    def _diff_ownership(self, diff: WorldDiff, view: GridView):
+        before, after = self.view.ownership.ravel(), view.ownership.ravel()
+        flipped = np.flatnonzero(before != after)
+        if not len(flipped):
+            return
+        diff.flipped = flipped
+        diff.owners_before = before[flipped]
+        diff.owners_after = after[flipped]
+        me = self.my_code
+        diff.gained = flipped[diff.owners_after == me]
+        diff.lost = flipped[diff.owners_before == me]
+
+    def _diff_entities(self, diff: WorldDiff, game_message: TeamGameState):
+        previous = self.spores
+        spores = {spore.id: spore for spore in game_message.world.spores}
+        for spore_id, spore in spores.items():
+            before = previous.get(spore_id)
+            if before is None:
+                diff.spores_appeared.append(spore)
+            elif before.position != spore.position:
+                diff.spores_moved.append((spore, before.position))
+            elif before.biomass != spore.biomass:
+                diff.spores_resized.append((spore, before.biomass))
+        if len(previous) + len(diff.spores_appeared) != len(spores):
+            diff.spores_disappeared = [spore for spore_id, spore in previous.items() if spore_id not in spores]
+        self.spores = spores
+
+        spawners = {spawner.id: spawner for spawner in game_message.world.spawners}
+        diff.spawners_new = [spawner for spawner_id, spawner in spawners.items() if spawner_id not in self.spawners]
+        if len(self.spawners) + len(diff.spawners_new) != len(spawners):
+            diff.spawners_lost = [spawner for spawner_id, spawner in self.spawners.items()
+                                  if spawner_id not in spawners]
+        self.spawners = spawners
+
+
+_world = WorldState()
+
+
+def world_state(game_message: TeamGameState) -> WorldState:
+    """The world state, updated with the current tick (once per message, whoever asks first)."""
+    _world.update(game_message)
+    return _world